@@ -1,38 +1,164 @@
 import pandas as pd
-from selenium import webdriver
-from selenium.webdriver.chrome.options import Options
-from selenium.webdriver.common.by import By
-from selenium.webdriver.support.ui import WebDriverWait
-from selenium.webdriver.support import expected_conditions as EC
-from selenium.common.exceptions import TimeoutException
-from selenium.webdriver.chrome.service import Service
+import numpy as np
 import shutil
 import time
 import re
 import unidecode
 import requests
-import gradio as gr
 import tempfile
 from dateutil import parser as du
 import urllib.parse
+from html.parser import HTMLParser
 import traceback
 import openpyxl
-from openpyxl.styles import Border, Side, PatternFill
+from openpyxl.styles import Alignment, Border, Font, Side, PatternFill
+from openpyxl.cell import WriteOnlyCell
 import os
+import sys
+import argparse
+import csv
+import random
+import email.utils
+import hashlib
+import json
+import socket
+import sqlite3
+import subprocess
+import threading
+from functools import lru_cache
+from collections import OrderedDict, deque
+from contextlib import contextmanager
+from concurrent.futures import Future, ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from requests.adapters import HTTPAdapter
+from ol_index import OLLocalIndex
 
 # --- Constantes y Globales ---
 STOPWORDS = {"y", "de", "la", "el", "los", "las", "en", "del", "un", "una", "unos", "unas", "por", "para"}
-PAUSE_OPENLIBRARY = 0.8
-
-log_messages = [] # Se mantiene como un acumulador global
-driver_cultura_global = None
-cultura_cookies_accepted_global = False
+# Presupuesto de cortesía con Open Library: un único cubo de fichas compartido por todos los hilos
+OL_REQUESTS_PER_SECOND = float(os.environ.get("OL_REQUESTS_PER_SECOND", "3"))
+OL_RATE_BURST = int(os.environ.get("OL_RATE_BURST", "3"))
+OL_MAX_WORKERS = int(os.environ.get("OL_MAX_WORKERS", "8"))
+OL_PREFETCH_FACTOR = 4 # Filas 'no-es' en vuelo por hilo, por delante de la fila actual
+OL_MIN_REQUESTS_PER_SECOND = 0.2 # Suelo de la tasa adaptativa
+OL_LATENCY_TARGET = float(os.environ.get("OL_LATENCY_TARGET", "3.0")) # Latencia media (s) a partir de la cual se frena
+OL_HTTP_TIMEOUT = (5, 20) # (conexión, lectura)
+
+# Ediciones de una obra: páginas de OL_EDITIONS_PAGE_SIZE, hasta OL_MAX_EDITIONS, pedidas a la vez tras la primera
+OL_EDITIONS_PAGE_SIZE = 50
+OL_MAX_EDITIONS = int(os.environ.get("OL_MAX_EDITIONS", "150"))
+OL_EDITIONS_PAGE_WORKERS = int(os.environ.get("OL_EDITIONS_PAGE_WORKERS", "4"))
+# Parada anticipada: con N, basta una edición N años o más posterior a la del Excel (vacío = buscar siempre la más reciente)
+OL_EARLY_STOP_YEARS = int(os.environ.get("OL_EARLY_STOP_YEARS", "") or 0) or None
+
+# Resiliencia frente a los backends remotos: reintentos con espera exponencial y cortacircuitos
+BACKEND_MAX_RETRIES = int(os.environ.get("BACKEND_MAX_RETRIES", "3"))
+RETRY_BASE_DELAY = 0.5
+RETRY_MAX_DELAY = 30.0
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+CIRCUIT_FAILURE_THRESHOLD = int(os.environ.get("CIRCUIT_FAILURE_THRESHOLD", "5")) # Fallos seguidos que abren el circuito
+CIRCUIT_RESET_SECONDS = float(os.environ.get("CIRCUIT_RESET_SECONDS", "60")) # Tiempo abierto antes de dejar pasar una prueba
+CIRCUIT_OPEN_STATUS = "Circuito abierto"
+
+# Diario de filas completadas para poder reanudar tras una caída (conviene un disco persistente, p. ej. /data)
+JOURNAL_DIR = os.environ.get("JOURNAL_DIR", "journals")
+JOURNAL_FSYNC_EVERY = 50
+
+# Modo delta: con un Resultados_*.xlsx anterior se reutilizan sus éxitos de menos de DELTA_MAX_AGE_DAYS días
+DELTA_MAX_AGE_DAYS = float(os.environ.get("DELTA_MAX_AGE_DAYS", "30"))
+
+# Trabajos simultáneos (varios usuarios): cuántos se procesan a la vez y cuántos se recuerdan para consultarlos por id
+JOB_MAX_RUNNING = int(os.environ.get("JOB_MAX_RUNNING", "2"))
+JOB_HISTORY = int(os.environ.get("JOB_HISTORY", "50"))
+
+# Log de la interfaz: últimas líneas visibles y frecuencia máxima de refresco (el log completo va a fichero)
+LOG_UI_MAX_LINES = int(os.environ.get("LOG_UI_MAX_LINES", "500"))
+LOG_UI_MIN_INTERVAL = float(os.environ.get("LOG_UI_MIN_INTERVAL", "1.0"))
+
+# Métricas de rendimiento por etapa (fichero JSON + hoja "Rendimiento") y columna opcional de tiempo por fila
+PERF_METRICS = os.environ.get("PERF_METRICS", "").strip().lower() in ("1", "true", "si", "sí", "yes")
+PERF_ROW_TIMINGS = os.environ.get("PERF_ROW_TIMINGS", "").strip().lower() in ("1", "true", "si", "sí", "yes")
+PERF_MAX_SAMPLES = 5000 # Muestras guardadas por etapa para los percentiles
+
+# Memoria en proceso de metadatos de Open Library (entradas máximas, descarte LRU)
+OL_AUTHOR_MEMO_SIZE = int(os.environ.get("OL_AUTHOR_MEMO_SIZE", "20000"))
+OL_WORK_MEMO_SIZE = int(os.environ.get("OL_WORK_MEMO_SIZE", "2000"))
+
+# Pool de navegadores headless para Cultura.gob
+CULTURA_POOL_SIZE = int(os.environ.get("CULTURA_POOL_SIZE", "2"))
+CULTURA_DRIVER_MAX_SEARCHES = int(os.environ.get("CULTURA_DRIVER_MAX_SEARCHES", "150")) # Reciclado para acotar la memoria de Chromium
+
+# Búsqueda en Cultura.gob: "auto" (HTTP y Selenium solo si falla), "http" o "selenium"
+CULTURA_BACKEND = os.environ.get("CULTURA_BACKEND", "auto").strip().lower()
+CULTURA_BASE_URL = os.environ.get("CULTURA_BASE_URL", "https://www.cultura.gob.es/webISBN").rstrip("/")
+CULTURA_SEARCH_URL = CULTURA_BASE_URL + "/tituloSimpleFilter.do"
+CULTURA_SEARCH_INIT_QUERY = "?cache=init&prev_layout=busquedaisbn&layout=busquedaisbn&language=es"
+CULTURA_QUERY_FIELD = "params.liConceptosExt[0].texto"
+CULTURA_HTTP_WORKERS = int(os.environ.get("CULTURA_HTTP_WORKERS", "4"))
+CULTURA_HTTP_TIMEOUT = 20
+CULTURA_REQUESTS_PER_SECOND = float(os.environ.get("CULTURA_REQUESTS_PER_SECOND", "10")) # Techo de la tasa adaptativa
+# Búsqueda especulativa en las filas 'es': Open Library se consulta a la vez que Cultura.gob, en lugar de
+# después de su fallo; si Cultura.gob encuentra la edición, la consulta de Open Library se cancela o se descarta
+ES_SPECULATIVE_OL = os.environ.get("ES_SPECULATIVE_OL", "").strip().lower() in ("1", "true", "si", "sí", "yes")
+# Segundos que se da a Cultura.gob antes de lanzar Open Library (0 = a la vez); limita las consultas de más a OL
+ES_SPECULATIVE_DELAY = float(os.environ.get("ES_SPECULATIVE_DELAY", "0"))
+# Navegador ligero: carga 'eager' y sin imágenes, fuentes, hojas de estilo ni scripts de terceros (bloqueados por CDP)
+CULTURA_LEAN_BROWSER = os.environ.get("CULTURA_LEAN_BROWSER", "1").strip().lower() in ("1", "true", "si", "sí", "yes")
+CULTURA_BLOCKED_URLS = [u.strip() for u in os.environ.get("CULTURA_BLOCKED_URLS", ",".join([
+    "*.png", "*.jpg", "*.jpeg", "*.gif", "*.svg", "*.webp", "*.ico", "*.woff", "*.woff2", "*.ttf", "*.otf", "*.eot", "*.css",
+    "*googletagmanager.com*", "*google-analytics.com*", "*doubleclick.net*", "*facebook.net*", "*hotjar.com*", "*youtube.com*"])).split(",") if u.strip()]
+CULTURA_COOKIE_WAIT = 2.0 # Segundos que se espera el banner de cookies (solo en la primera búsqueda de cada driver)
+CULTURA_COOKIE_XPATH = " | ".join(["//button[contains(translate(normalize-space(.), 'ACEPTAR', 'aceptar'), 'aceptar')]",
+                                   "//button[contains(translate(text(), 'ACEPTAR', 'aceptar'), 'Aceptar')]",
+                                   "//a[contains(translate(normalize-space(.), 'ACEPTAR', 'aceptar'), 'aceptar')]"])
+# Extracción de resultados en Selenium en un solo viaje: "script" (execute_script) o "page_source" (HTML analizado en Python)
+CULTURA_SELENIUM_EXTRACTION = os.environ.get("CULTURA_SELENIUM_EXTRACTION", "script").strip().lower()
+CULTURA_YEAR_PATTERNS = [re.compile(p, re.IGNORECASE) for p in (r'\((\d{4})\)', r'F\.\s*Edición:\s*\D*(\d{4})\b', r'F\.\s*Publicación:\s*\D*(\d{4})\b', r'\b(1[89]\d{2}|20\d{2})\b')]
+CULTURA_AUTHOR_PATTERN = re.compile(r'Autor/es:\s*(.*?)(?:\n|$|F\. Edición:|ISBN:)', re.DOTALL)
+
+OL_BASE_URL = os.environ.get("OL_BASE_URL", "https://openlibrary.org").rstrip("/")
+OL_ISBN_BATCH_SIZE = int(os.environ.get("OL_ISBN_BATCH_SIZE", "100")) # ISBN por petición a /api/books
+OL_ISBN_MEMO_SIZE = int(os.environ.get("OL_ISBN_MEMO_SIZE", "100000"))
+# Origen de los datos de Open Library: "api" (en línea) o "local" (índice generado con ol_index.py)
+OL_BACKEND = os.environ.get("OL_BACKEND", "api").strip().lower()
+OL_LOCAL_INDEX_PATH = os.environ.get("OL_LOCAL_INDEX_PATH", "ol_index.sqlite3")
+
+# Caché persistente de respuestas de Open Library (SQLite)
+OL_CACHE_PATH = os.environ.get("OL_CACHE_PATH", "ol_cache.sqlite3")
+OL_CACHE_MAX_BYTES = int(os.environ.get("OL_CACHE_MAX_BYTES", str(512 * 1024 * 1024)))
+OL_CACHE_OFFLINE = os.environ.get("OL_CACHE_OFFLINE", "").strip().lower() in ("1", "true", "si", "sí", "yes")
+OL_CACHE_NEGATIVE_TTL = 3 * 86400 # Los 404 (ISBN desconocido, etc.) caducan antes
+OL_CACHE_DEFAULT_TTL = 7 * 86400
+OL_CACHE_TTLS = [ # (fragmento de la URL, segundos); gana la primera coincidencia
+    ("/editions.json", 7 * 86400),
+    ("/search.json", 7 * 86400),
+    ("/isbn/", 90 * 86400),
+    ("/api/books", 30 * 86400),
+    ("/authors/", 90 * 86400),
+    ("/works/", 30 * 86400),
+]
+
+cultura_driver_pool_global = None
+_cultura_http_local = threading.local() # Una sesión HTTP (y su formulario) por hilo
+ol_cache_global = None
+ol_session_global = None
+ol_local_index_global = None
+ol_editions_executor_global = None
+ol_speculative_executor_global = None
+_log_local = threading.local() # Destino de log() en el hilo actual: el log de la fila en curso o el del trabajo
+_job_local = threading.local() # Contexto del trabajo en el hilo actual (métricas); lo propagan los ejecutores de filas
+_lazy_init_lock = threading.Lock()
+_cultura_pool_lock = threading.Lock() # Dos trabajos que arrancan a la vez no crean dos pools
+row_executors_global = {} # Carril de idioma -> FairExecutor compartido por todos los trabajos
 
 def _init_cultura_driver_for_spaces():
     """
     Inicializa un Chrome/Chromium headless compatible con Hugging Face Spaces.
     Detecta binarios y rutas típicas de Debian/Ubuntu (chromium/chromedriver).
     """
+    # Selenium se importa solo cuando hace falta un navegador (el modo por lotes sin filas 'es' no lo carga)
+    from selenium import webdriver
+    from selenium.webdriver.chrome.options import Options
+    from selenium.webdriver.chrome.service import Service
     chrome_options = Options()
     # Headless moderno y flags recomendados para contenedores/CI
     chrome_options.add_argument("--headless=new")
@@ -41,6 +167,12 @@ def _init_cultura_driver_for_spaces():
     chrome_options.add_argument("--window-size=1920,1080")
     chrome_options.add_argument("--disable-gpu")
     chrome_options.add_argument("--log-level=3")
+    if CULTURA_LEAN_BROWSER:
+        chrome_options.page_load_strategy = "eager" # Basta con el DOM; no se espera a recursos ni scripts diferidos
+        chrome_options.add_argument("--blink-settings=imagesEnabled=false")
+        for flag in ("--disable-extensions", "--disable-background-networking", "--disable-component-update", "--disable-default-apps",
+                     "--disable-sync", "--no-first-run", "--mute-audio", "--disable-features=Translate,MediaRouter,OptimizationHints"):
+            chrome_options.add_argument(flag)
 
     # Localiza binario de Chromium en el Space
     chromium_candidates = [
@@ -66,24 +198,325 @@ def _init_cultura_driver_for_spaces():
         raise RuntimeError("No se encontró chromedriver en el sistema.")
 
     service = Service(chromedriver_path)
-    return webdriver.Chrome(service=service, options=chrome_options)
+    with perf_stage("cultura.selenium.arranque_driver"):
+        driver = webdriver.Chrome(service=service, options=chrome_options)
+    if CULTURA_LEAN_BROWSER:
+        try:
+            driver.execute_cdp_cmd("Network.enable", {})
+            driver.execute_cdp_cmd("Network.setBlockedURLs", {"urls": CULTURA_BLOCKED_URLS})
+        except Exception as e_cdp:
+            log(f"Cultura.gob: No se pudieron bloquear recursos por CDP, se cargan completos: {e_cdp}")
+    return driver
+
+
+class CulturaDriverLease:
+    """Un driver del pool junto con su propio estado (cookies aceptadas, búsquedas hechas)."""
+    def __init__(self, driver):
+        self.driver = driver
+        self.cookies_accepted = False
+        self.searches = 0
+        self.broken = False # Si se marca, el pool lo cierra y lo sustituye al devolverlo
+
+
+class CulturaDriverPool:
+    """
+    Pool de hasta `size` navegadores headless reutilizables para Cultura.gob.
+    Cada búsqueda toma un driver con lease() y lo devuelve al terminar; los drivers que fallan
+    la comprobación de salud, se marcan como rotos o superan `max_searches` se cierran y se recrean.
+    """
+    def __init__(self, size, max_searches, factory=_init_cultura_driver_for_spaces):
+        self.size, self.max_searches, self.factory = max(1, size), max_searches, factory
+        self._idle, self._created, self._closed = [], 0, False
+        self._cond = threading.Condition()
+
+    def prewarm(self):
+        """Arranca los drivers que falten hasta `size`. Lanza la excepción si no se puede crear ninguno."""
+        started = []
+        try:
+            while self._created + len(started) < self.size:
+                started.append(CulturaDriverLease(self.factory()))
+        except Exception:
+            if not started and not self._created: raise
+        with self._cond:
+            self._idle.extend(started); self._created += len(started)
+            self._cond.notify_all()
+        return len(started)
+
+    @contextmanager
+    def lease(self):
+        with perf_stage("cultura.selenium.espera_driver"): item = self._acquire()
+        try:
+            yield item
+        finally:
+            self._release(item)
+
+    def _acquire(self):
+        while True:
+            with self._cond:
+                while not self._idle and self._created >= self.size and not self._closed:
+                    self._cond.wait()
+                if self._closed: raise RuntimeError("El pool de drivers de Cultura.gob está cerrado.")
+                item = self._idle.pop() if self._idle else None
+                if item is None: self._created += 1 # Se reserva el hueco antes de arrancar Chromium
+            if item is None:
+                try:
+                    return CulturaDriverLease(self.factory())
+                except Exception:
+                    with self._cond:
+                        self._created -= 1; self._cond.notify()
+                    raise
+            if self._healthy(item): return item
+            log("Cultura.gob: Driver del pool no responde, se recicla.")
+            perf_count("cultura.selenium.drivers_reciclados")
+            self._discard(item)
+
+    def _release(self, item):
+        item.searches += 1
+        if item.broken or item.searches >= self.max_searches or self._closed:
+            if not item.broken and not self._closed: log(f"Cultura.gob: Reciclando driver tras {item.searches} búsquedas.")
+            perf_count("cultura.selenium.drivers_reciclados")
+            self._discard(item)
+            return
+        with self._cond:
+            self._idle.append(item); self._cond.notify()
+
+    @staticmethod
+    def _healthy(item):
+        try:
+            item.driver.current_url
+            return True
+        except Exception:
+            return False
+
+    def _discard(self, item):
+        try: item.driver.quit()
+        except Exception as e_quit: log(f"Cultura.gob: Error al cerrar un driver del pool: {e_quit}")
+        with self._cond:
+            self._created -= 1; self._cond.notify()
+
+    def close(self):
+        with self._cond:
+            self._closed = True
+            idle, self._idle = self._idle, []
+            self._cond.notify_all()
+        for item in idle: self._discard(item)
 
 
 # --- Funciones de Logging ---
 def log(message):
     print(message)
-    log_messages.append(str(message))
+    buffer = getattr(_log_local, "buffer", None)
+    if buffer is not None: buffer.append(str(message)); return
+    job_log = getattr(_log_local, "job_log", None) # Fuera de una fila (p. ej. el prefetch de ISBN): al log del trabajo
+    if job_log is not None: job_log.extend([str(message)])
+
+class JobLog:
+    """
+    Log de un trabajo. El texto completo se escribe en `path` (si se indica) y la interfaz
+    solo recibe las últimas `ui_lines` líneas, como mucho una vez cada `min_interval` segundos.
+    """
+    def __init__(self, path=None, ui_lines=LOG_UI_MAX_LINES, min_interval=LOG_UI_MIN_INTERVAL):
+        self.path, self.min_interval = path, min_interval
+        self._ring = deque(maxlen=ui_lines)
+        self._file = open(path, "w", encoding="utf-8") if path else None
+        self._lock = threading.Lock()
+        self._last_ui = 0.0
+
+    def write(self, message):
+        print(message)
+        self.extend([str(message)])
+
+    def extend(self, messages):
+        """Añade mensajes ya impresos (p. ej. el log de una fila procesada en otro hilo)."""
+        with self._lock:
+            for message in messages:
+                self._ring.extend(message.split("\n"))
+                if self._file: self._file.write(message + "\n")
+
+    def due(self):
+        return time.monotonic() - self._last_ui >= self.min_interval
+
+    def text(self):
+        with self._lock:
+            self._last_ui = time.monotonic()
+            if self._file: self._file.flush()
+            return "\n".join(self._ring)
+
+    def close(self):
+        with self._lock:
+            if self._file: self._file.close(); self._file = None
+
+def _run_with_log_buffer(fn, *args):
+    """Ejecuta fn en un hilo de trabajo guardando su log aparte, para volcarlo luego en orden. Devuelve (resultado, log, segundos)."""
+    previous, _log_local.buffer = getattr(_log_local, "buffer", None), []
+    start = time.perf_counter()
+    try:
+        result = fn(*args)
+    finally:
+        buffer, _log_local.buffer = _log_local.buffer, previous
+    return result, buffer, time.perf_counter() - start
+
+# --- Métricas de rendimiento ---
+class _PerfTimer:
+    __slots__ = ("metrics", "name", "start")
+
+    def __init__(self, metrics, name):
+        self.metrics, self.name = metrics, name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.metrics.add(self.name, time.perf_counter() - self.start)
+        return False
+
+class _NoPerfTimer:
+    __slots__ = ()
+    def __enter__(self): return self
+    def __exit__(self, *exc): return False
+
+_NO_PERF_TIMER = _NoPerfTimer()
+
+class PerfMetrics:
+    """Tiempos (número, total, máximo y una muestra para percentiles) y contadores por etapa, seguros entre hilos."""
+    def __init__(self, max_samples=PERF_MAX_SAMPLES):
+        self.max_samples = max_samples
+        self._timings, self._counters = {}, {}
+        self._lock = threading.Lock()
+        self.started = time.time()
+
+    def add(self, name, seconds):
+        with self._lock:
+            stat = self._timings.get(name)
+            if stat is None: stat = self._timings[name] = [0, 0.0, 0.0, []]
+            stat[0] += 1; stat[1] += seconds
+            if seconds > stat[2]: stat[2] = seconds
+            if len(stat[3]) < self.max_samples: stat[3].append(seconds)
+            else: stat[3][stat[0] % self.max_samples] = seconds
+
+    def count(self, name, n=1):
+        with self._lock: self._counters[name] = self._counters.get(name, 0) + n
+
+    def stage(self, name):
+        return _PerfTimer(self, name)
+
+    def rows(self):
+        """Filas (etapa, llamadas, total s, media ms, p50 ms, p95 ms, máx ms), de mayor a menor tiempo total."""
+        with self._lock: timings = {name: (c, t, m, sorted(samples)) for name, (c, t, m, samples) in self._timings.items()}
+        out = []
+        for name, (count, total, maximum, samples) in sorted(timings.items(), key=lambda item: -item[1][1]):
+            pct = lambda p: samples[min(len(samples) - 1, int(len(samples) * p))] * 1000 if samples else 0.0
+            out.append((name, count, round(total, 3), round(total / count * 1000, 2), round(pct(0.5), 2), round(pct(0.95), 2), round(maximum * 1000, 2)))
+        return out
+
+    def counters(self):
+        with self._lock: return dict(sorted(self._counters.items()))
+
+    def to_dict(self):
+        columns = ["etapa", "llamadas", "total_s", "media_ms", "p50_ms", "p95_ms", "max_ms"]
+        return {"inicio": self.started, "duracion_s": round(time.time() - self.started, 3),
+                "etapas": [dict(zip(columns, row)) for row in self.rows()], "contadores": self.counters()}
+
+    def write_json(self, path):
+        with open(path, "w", encoding="utf-8") as f: json.dump(self.to_dict(), f, ensure_ascii=False, indent=1)
+
+def current_perf():
+    """PerfMetrics del trabajo que se ejecuta en este hilo, o None si las métricas están desactivadas."""
+    return getattr(_job_local, "perf", None)
+
+def _job_context():
+    return current_perf(), getattr(_log_local, "job_log", None), getattr(_log_local, "buffer", None)
+
+def _set_job_context(perf, job_log=None, buffer=None):
+    _job_local.perf = perf
+    _log_local.job_log, _log_local.buffer = job_log, buffer
+
+def bind_job_context(fn):
+    """
+    Envuelve fn para que, ejecutada en otro hilo, cuente en las métricas del trabajo actual y su
+    log() vaya al mismo sitio que el del hilo que la lanza (el log de la fila o el del trabajo).
+    """
+    context = _job_context()
+    def bound(*args):
+        previous = _job_context(); _set_job_context(*context)
+        try: return fn(*args)
+        finally: _set_job_context(*previous)
+    return bound
+
+class FairExecutor:
+    """
+    Hilos compartidos por todos los trabajos en curso. Cada trabajo tiene su propia cola y los
+    hilos las atienden por turnos, así un Excel enorme no deja esperando a los demás usuarios.
+    """
+    def __init__(self, workers, name):
+        self.workers, self.name = workers, name
+        self._queues = OrderedDict() # clave del trabajo -> deque de (futuro, función, argumentos)
+        self._cond = threading.Condition()
+        self._threads = []
+
+    def submit(self, job_key, fn, *args):
+        future = Future()
+        with self._cond:
+            self._queues.setdefault(job_key, deque()).append((future, bind_job_context(fn), args))
+            if len(self._threads) < self.workers: # Los hilos se arrancan a medida que hacen falta
+                thread = threading.Thread(target=self._worker, name=f"{self.name}-{len(self._threads)}", daemon=True)
+                self._threads.append(thread); thread.start()
+            self._cond.notify()
+        return future
+
+    def cancel_job(self, job_key):
+        """Descarta las tareas de un trabajo que aún no han empezado."""
+        with self._cond: queue = self._queues.pop(job_key, None)
+        for future, _, _ in queue or (): future.cancel()
+
+    def _next_task(self):
+        with self._cond:
+            while not self._queues: self._cond.wait()
+            job_key, queue = next(iter(self._queues.items()))
+            task = queue.popleft()
+            if queue: self._queues.move_to_end(job_key) # El siguiente turno es para otro trabajo
+            else: del self._queues[job_key]
+            return task
+
+    def _worker(self):
+        while True:
+            future, fn, args = self._next_task()
+            if not future.set_running_or_notify_cancel(): continue
+            try: future.set_result(fn(*args))
+            except BaseException as e: future.set_exception(e)
+
+def perf_stage(name):
+    """Cronómetro de una etapa (with perf_stage("..."): ...); sin coste apreciable si las métricas están desactivadas."""
+    metrics = getattr(_job_local, "perf", None)
+    return metrics.stage(name) if metrics is not None else _NO_PERF_TIMER
+
+def perf_count(name, n=1):
+    metrics = getattr(_job_local, "perf", None)
+    if metrics is not None: metrics.count(name, n)
+
+def perf_sleep(seconds, name):
+    with perf_stage("espera." + name): time.sleep(seconds)
 
 # --- [EL RESTO DE FUNCIONES DE LIMPIEZA Y BÚSQUEDA PERMANECEN EXACTAMENTE IGUAL] ---
+# Patrones de limpieza precompilados, compartidos por las versiones escalar y vectorizada
+YEAR_BRACKET_PATTERN = re.compile(r'[\[\(](\d{4})[\]\)]')
+YEAR_PATTERN = re.compile(r'\b(1[7-9]\d{2}|20\d{2}|2100)\b')
+ISBN_SPLIT_PATTERN = re.compile(r'[;\s,]+')
+ISBN_PREFIX_PATTERN = re.compile(r'^(ISBN|isbn)\s*:\s*', re.IGNORECASE)
+TITLE_STRIP_PATTERN = re.compile(r'[^a-zA-Z0-9\s]')
+AUTHOR_STRIP_PATTERN = re.compile(r'[^a-zA-Z\s]')
+STOPWORDS_PATTERN = re.compile(r'(?<!\S)(?:' + '|'.join(sorted(STOPWORDS)) + r')(?!\S)', re.IGNORECASE)
+
 def clean_year_value(year_str):
     if pd.isnull(year_str) or not isinstance(year_str, str): return None
-    match_bracket_paren = re.search(r'[\[\(](\d{4})[\]\)]', year_str)
+    match_bracket_paren = YEAR_BRACKET_PATTERN.search(year_str)
     if match_bracket_paren:
         try:
             year_cand = int(match_bracket_paren.group(1))
             if 1700 <= year_cand <= 2100: return year_cand
         except ValueError: pass
-    match = re.search(r'\b(1[7-9]\d{2}|20\d{2}|2100)\b', year_str)
+    match = YEAR_PATTERN.search(year_str)
     if match:
         try: return int(match.group(1))
         except ValueError: pass
@@ -91,10 +524,10 @@ def clean_year_value(year_str):
 
 def select_priority_isbn(isbn_field_str):
     if pd.isnull(isbn_field_str) or not isinstance(isbn_field_str, str) or not isbn_field_str.strip(): return ""
-    potential_isbns = [s.strip() for s in re.split(r'[;\s,]+', isbn_field_str) if s.strip()]
+    potential_isbns = [s.strip() for s in ISBN_SPLIT_PATTERN.split(isbn_field_str) if s.strip()]
     isbn13_starts_with_9_strict, isbn13_general, isbn10_valid = [], [], []
     for isbn in potential_isbns:
-        cleaned_isbn_text = re.sub(r'^(ISBN|isbn)\s*:\s*', '', isbn, flags=re.IGNORECASE)
+        cleaned_isbn_text = ISBN_PREFIX_PATTERN.sub('', isbn)
         cleaned_isbn_digits = cleaned_isbn_text.replace('-', '').replace(' ', '').strip()
         if cleaned_isbn_digits.isdigit():
             if len(cleaned_isbn_digits) == 13:
@@ -106,31 +539,21 @@ def select_priority_isbn(isbn_field_str):
     if isbn10_valid: return isbn10_valid[0]
     return ""
 
+def clean_title_general(title_input):
+    if pd.isnull(title_input) or str(title_input).strip() == "": return "No disponible"
+    title = TITLE_STRIP_PATTERN.sub('', unidecode.unidecode(str(title_input)))
+    title_clean = ' '.join([word for word in title.split() if word.lower() not in STOPWORDS][:5])
+    return title_clean if title_clean.strip() else "No disponible"
+
+def clean_author_general(author_input):
+    if pd.isnull(author_input) or str(author_input).strip() == "": return "No disponible"
+    author = AUTHOR_STRIP_PATTERN.sub('', unidecode.unidecode(str(author_input)))
+    author_clean = ' '.join(author.split()[:2])
+    return author_clean if author_clean.strip() else "No disponible"
+
 def clean_title_and_author_general(row_series):
     try:
-        title_input = row_series.get('Title')
-        if pd.isnull(title_input) or str(title_input).strip() == "":
-            title_clean = "No disponible"
-        else:
-            title = unidecode.unidecode(str(title_input))
-            title = re.sub(r'[^a-zA-Z0-9\s]', '', title)
-            title_words = [word for word in title.split() if word.lower() not in STOPWORDS]
-            title_clean = ' '.join(title_words[:5])
-            if not title_clean.strip():
-                title_clean = "No disponible"
-
-        author_input = row_series.get('Author')
-        if pd.isnull(author_input) or str(author_input).strip() == "":
-            author_clean = "No disponible"
-        else:
-            author = unidecode.unidecode(str(author_input))
-            author = re.sub(r'[^a-zA-Z\s]', '', author)
-            author_parts = author.split()
-            author_clean = ' '.join(author_parts[:2])
-            if not author_clean.strip():
-                author_clean = "No disponible"
-
-        return title_clean, author_clean
+        return clean_title_general(row_series.get('Title')), clean_author_general(row_series.get('Author'))
     except Exception as e:
         log(f"Error en clean_title_and_author_general: {str(e)}")
         return "Error Limpieza", "Error Limpieza"
@@ -140,7 +563,7 @@ def clean_title_for_cultura_gob_search(original_title):
         return "No disponible"
     try:
         title = unidecode.unidecode(str(original_title).lower())
-        title = re.sub(r'[^a-zA-Z0-9\s]', '', title)
+        title = TITLE_STRIP_PATTERN.sub('', title)
         title_words = title.split()
         title_clean_cultura = ' '.join(title_words[:5])
         if not title_clean_cultura.strip():
@@ -150,98 +573,379 @@ def clean_title_for_cultura_gob_search(original_title):
         log(f"Error en clean_title_for_cultura_gob_search: {str(e)}")
         return "Error Limpieza Titulo CG"
 
-def search_book_cultura_gob(driver, title_for_search, author_for_search, cookies_already_accepted):
-    global cultura_cookies_accepted_global
+# --- Normalización vectorizada de la entrada (toda la hoja de una vez) ---
+def _map_unique(series, fn):
+    # Las funciones sin equivalente en pandas (unidecode) se aplican una vez por valor distinto
+    uniques = series.unique()
+    return series.map(dict(zip(uniques, map(fn, uniques)))).astype(object)
+
+def _first_words(series, n):
+    words = series.str.split().str[:n].str.join(' ')
+    return words.where(words.str.strip() != "", "No disponible")
+
+def clean_year_column(years):
+    """Versión vectorizada de clean_year_value sobre la columna 'year'."""
+    texts = years.map(str).astype(object).where(years.notna())
+    bracket = pd.to_numeric(texts.str.extract(YEAR_BRACKET_PATTERN, expand=False), errors='coerce')
+    general = pd.to_numeric(texts.str.extract(YEAR_PATTERN, expand=False), errors='coerce')
+    cleaned = bracket.where(bracket.between(1700, 2100), general)
+    if cleaned.isna().all(): return pd.Series([None] * len(years), index=years.index, dtype=object)
+    return cleaned if cleaned.isna().any() else cleaned.astype('int64')
+
+def priority_isbn_column(isbn_fields):
+    """Versión vectorizada de select_priority_isbn: ISBN-13 que empiece por 9, si no el primer ISBN-10."""
+    # Una columna de ISBN numérica con celdas vacías llega como float (9788401234567.0)
+    texts = isbn_fields.map(lambda v: str(int(v)) if isinstance(v, float) and v.is_integer() else str(v)).astype(object).where(isbn_fields.notna(), "")
+    tokens = texts.str.split(ISBN_SPLIT_PATTERN, regex=True).explode()
+    tokens = tokens[tokens.notna() & (tokens.str.strip() != "")]
+    digits = tokens.str.strip().str.replace(ISBN_PREFIX_PATTERN, '', regex=True).str.replace('-', '', regex=False).str.replace(' ', '', regex=False).str.strip()
+    is_digit, length = digits.str.isdigit(), digits.str.len()
+    rank = pd.Series(pd.NA, index=digits.index, dtype='Int64')
+    rank[is_digit & (length == 10)] = 1
+    rank[is_digit & (length == 13) & digits.str.startswith('9')] = 0
+    candidates = pd.DataFrame({'isbn': digits, 'rank': rank, 'pos': range(len(digits))}).dropna(subset=['rank'])
+    best = candidates.sort_values(['rank', 'pos'], kind='stable').groupby(level=0, sort=False)['isbn'].first()
+    return best.reindex(isbn_fields.index, fill_value="").astype(object)
+
+def clean_title_general_column(titles):
+    """Versión vectorizada de clean_title_general (título para Open Library y para comparar resultados)."""
+    cleaned = _map_unique(titles, unidecode.unidecode).str.replace(TITLE_STRIP_PATTERN, '', regex=True).str.replace(STOPWORDS_PATTERN, ' ', regex=True)
+    return _first_words(cleaned, 5).where(titles.str.strip() != "", "No disponible")
+
+def clean_author_general_column(authors):
+    """Versión vectorizada de clean_author_general; admite nulos."""
+    texts = authors.map(str).astype(object).where(authors.notna(), "")
+    cleaned = _map_unique(texts, unidecode.unidecode).str.replace(AUTHOR_STRIP_PATTERN, '', regex=True)
+    return _first_words(cleaned, 2).where(texts.str.strip() != "", "No disponible")
+
+def clean_title_cultura_column(titles):
+    """Versión vectorizada de clean_title_for_cultura_gob_search."""
+    cleaned = _map_unique(titles.str.lower(), unidecode.unidecode).str.replace(TITLE_STRIP_PATTERN, '', regex=True)
+    return _first_words(cleaned, 5).where(titles.str.strip() != "", "No disponible")
+
+def _cultura_search_query(title_for_search, author_for_search):
+    return " ".join([part for part in [title_for_search, author_for_search] if part and part.strip()]) or title_for_search
+
+def _select_latest_cultura(registros):
+    """
+    A partir de los resultados de Cultura.gob ({'titulo', 'isbn', 'parrafos'}) extrae autor y año
+    de edición y devuelve la tupla de búsqueda con la edición más reciente.
+    """
+    libros = []
+    for registro in registros:
+        autor_text, ano_val = "No disponible", None
+        autor_p = next((p for p in registro['parrafos'] if 'Autor/es:' in p), None)
+        if autor_p:
+            autor_match = CULTURA_AUTHOR_PATTERN.search(autor_p)
+            if autor_match: autor_text = re.sub(r'\s+', ' ', autor_match.group(1).strip())
+        full_desc_text = " ".join(registro['parrafos'])
+        for pattern in CULTURA_YEAR_PATTERNS:
+            match = pattern.search(full_desc_text)
+            if match:
+                potential_year = int(match.group(1))
+                if 1800 <= potential_year <= 2100: ano_val = potential_year; break
+        if ano_val: libros.append({'titulo': registro['titulo'], 'autor': autor_text, 'isbn': registro['isbn'] or "No disponible", 'ano_edicion': ano_val})
+
+    if libros:
+        libros.sort(key=lambda x: x.get('ano_edicion', 0), reverse=True)
+        lr = libros[0]
+        return "OK", lr['titulo'], lr['autor'], lr['isbn'], str(lr['ano_edicion'])
+    return "No hallado (s/año)", None, None, None, None
+
+def _texto_visible(chunks):
+    # Aproxima el .text de Selenium: espacios colapsados y un salto de línea por cada <br>
+    return "\n".join(" ".join(line.split()) for line in "".join(chunks).split("\x00")).strip()
+
+class _CulturaResultsParser(HTMLParser):
+    """Extrae de la página de resultados los bloques div.isbnResultado y si hay div#aviso."""
+    _VOID = {"area", "base", "br", "col", "embed", "hr", "img", "input", "link", "meta", "param", "source", "track", "wbr"}
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.registros, self.aviso = [], False
+        self._stack = [] # (tag, rol)
+        self._registro, self._parrafo, self._captura = None, None, None
+
+    def _roles(self):
+        return {rol for _, rol in self._stack if rol}
+
+    def handle_starttag(self, tag, attrs):
+        attrs = dict(attrs); cls = attrs.get("class") or ""
+        if tag == "br":
+            for chunks in (self._parrafo, self._captura and self._captura[1]):
+                if chunks is not None: chunks.append("\x00")
+            return
+        if tag in self._VOID: return
+        rol = None
+        if tag == "div":
+            if attrs.get("id") == "aviso": self.aviso = True
+            if cls == "isbnResultado" and self._registro is None:
+                self._registro, rol = {'titulo': None, 'isbn': None, 'parrafos': []}, "resultado"
+            elif self._registro is not None:
+                rol = {"isbnResDescripcion": "descripcion", "camposCheck": "check"}.get(cls) or ("camposisbn" if "camposIsbnRes" in cls else None)
+        elif self._registro is not None:
+            roles = self._roles()
+            if tag == "p" and "descripcion" in roles and self._parrafo is None:
+                self._parrafo, rol = [], "parrafo"
+            elif tag == "a" and "tituloDetalle" in (attrs.get("href") or "") and self._captura is None:
+                if "descripcion" in roles and self._registro['titulo'] is None: self._captura, rol = ('titulo', []), "captura"
+                elif "check" in roles and self._registro['isbn'] is None: self._captura, rol = ('isbn', []), "captura"
+            elif tag == "span" and cls == "isbn" and "camposisbn" in roles:
+                rol = "spanisbn"
+            elif tag == "strong" and "spanisbn" in roles and self._registro['isbn'] is None and self._captura is None:
+                self._captura, rol = ('isbn', []), "captura"
+        self._stack.append((tag, rol))
+
+    def handle_endtag(self, tag):
+        if tag in self._VOID: return
+        for pos in range(len(self._stack) - 1, -1, -1):
+            if self._stack[pos][0] == tag: break
+        else: return
+        while len(self._stack) > pos: self._cerrar(self._stack.pop()[1])
+
+    def handle_data(self, data):
+        if self._parrafo is not None: self._parrafo.append(data)
+        if self._captura is not None: self._captura[1].append(data)
+
+    def _cerrar(self, rol):
+        if rol == "captura":
+            campo, chunks = self._captura; self._captura = None
+            self._registro[campo] = _texto_visible(chunks)
+        elif rol == "parrafo":
+            self._registro['parrafos'].append(_texto_visible(self._parrafo)); self._parrafo = None
+        elif rol == "resultado":
+            if self._registro['titulo'] is not None: self.registros.append(self._registro) # Igual que Selenium: sin título se descarta
+            self._registro = None
+
+    def close(self):
+        super().close()
+        while self._stack: self._cerrar(self._stack.pop()[1])
+
+def parse_cultura_results_html(html):
+    """Devuelve (registros, hay_aviso) a partir del HTML de una página de resultados de Cultura.gob."""
+    parser = _CulturaResultsParser()
+    parser.feed(html); parser.close()
+    return parser.registros, parser.aviso
+
+class _CulturaFormParser(HTMLParser):
+    """Localiza el formulario de búsqueda simple y los valores que enviaría el navegador."""
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.forms, self._form, self._select = [], None, None
+
+    def handle_starttag(self, tag, attrs):
+        attrs = dict(attrs)
+        if tag == "form":
+            self._form = {'action': attrs.get("action") or "", 'method': (attrs.get("method") or "get").lower(), 'fields': []}
+            self.forms.append(self._form)
+        elif self._form is None:
+            return
+        elif tag == "input" and attrs.get("name"):
+            tipo = (attrs.get("type") or "text").lower()
+            if tipo in ("checkbox", "radio") and "checked" not in attrs: return
+            if tipo in ("submit", "image", "button", "reset") and attrs.get("value") != "Buscar": return
+            self._form['fields'].append((attrs["name"], attrs.get("value") or "", attrs.get("id")))
+        elif tag == "select" and attrs.get("name"):
+            self._select = [attrs["name"], None, False]
+        elif tag == "option" and self._select is not None:
+            if self._select[1] is None or ("selected" in attrs and not self._select[2]):
+                self._select[1], self._select[2] = attrs.get("value") or "", "selected" in attrs
+
+    def handle_endtag(self, tag):
+        if tag == "select" and self._select is not None:
+            if self._form is not None: self._form['fields'].append((self._select[0], self._select[1] or "", None))
+            self._select = None
+        elif tag == "form":
+            self._form = None
+
+def _parse_cultura_search_form(html, page_url):
+    parser = _CulturaFormParser()
+    parser.feed(html); parser.close()
+    for form in parser.forms:
+        if any(CULTURA_QUERY_FIELD in (name, field_id) for name, _, field_id in form['fields']):
+            return {'action': urllib.parse.urljoin(page_url, form['action'] or page_url), 'method': form['method'], 'fields': [(n, v) for n, v, _ in form['fields']]}
+    return None
+
+def _get_cultura_session():
+    session = getattr(_cultura_http_local, "session", None)
+    if session is None:
+        session = requests.Session()
+        session.headers["User-Agent"] = "Mozilla/5.0 (X11; Linux x86_64) BuscadorNuevasEdiciones"
+        _cultura_http_local.session, _cultura_http_local.form = session, None
+    return session
+
+def search_book_cultura_http(title_for_search, author_for_search):
+    """Misma búsqueda que search_book_cultura_gob, enviando el formulario por HTTP sin navegador."""
+    log(f"Cultura.gob (HTTP): Buscando T='{title_for_search}', A='{author_for_search}'")
+    search_query = _cultura_search_query(title_for_search, author_for_search)
+    if not search_query.strip(): return "Query Vacía", None, None, None, None
+    session = _get_cultura_session()
+    try:
+        form = _cultura_http_local.form
+        if form is None:
+            r = request_with_retries(cultura_http_backend_global, lambda: session.get(CULTURA_SEARCH_URL + CULTURA_SEARCH_INIT_QUERY, timeout=CULTURA_HTTP_TIMEOUT), stage="cultura.http.carga_formulario")
+            r.raise_for_status()
+            form = _parse_cultura_search_form(r.text, r.url)
+            if form is None:
+                log("Cultura.gob (HTTP): No se encontró el formulario de búsqueda.")
+                return "Error HTTP", None, None, None, None
+            _cultura_http_local.form = form
+        data = [(name, search_query if name == CULTURA_QUERY_FIELD else value) for name, value in form['fields']]
+        if form['method'] == "post": send = lambda: session.post(form['action'], data=data, timeout=CULTURA_HTTP_TIMEOUT)
+        else: send = lambda: session.get(form['action'], params=data, timeout=CULTURA_HTTP_TIMEOUT)
+        r = request_with_retries(cultura_http_backend_global, send, stage="cultura.http.busqueda")
+        r.raise_for_status()
+    except BackendUnavailable:
+        return CIRCUIT_OPEN_STATUS, None, None, None, None
+    except requests.exceptions.RequestException as e_req:
+        log(f"Cultura.gob (HTTP): Error en la petición: {e_req}")
+        perf_count("cultura.http.errores")
+        _cultura_http_local.form = None
+        return "Error HTTP", None, None, None, None
+
+    with perf_stage("cultura.http.analisis"):
+        registros, aviso = parse_cultura_results_html(r.text)
+    if not registros:
+        if aviso: return "No hallado", None, None, None, None
+        log("Cultura.gob (HTTP): Respuesta sin resultados ni aviso reconocibles.")
+        perf_count("cultura.http.errores")
+        _cultura_http_local.form = None # Puede haber caducado la sesión: se recarga el formulario
+        return "Error HTTP", None, None, None, None
+    return _select_latest_cultura(registros)
+
+# Mismos XPath que la extracción elemento a elemento, evaluados en el navegador en una sola llamada
+CULTURA_EXTRACT_JS = """
+const xp = (expr, ctx, type) => document.evaluate(expr, ctx, null, type, null);
+const ALL = XPathResult.ORDERED_NODE_SNAPSHOT_TYPE, FIRST = XPathResult.FIRST_ORDERED_NODE_TYPE;
+const resultados = xp("//div[@class='isbnResultado']", document, ALL), registros = [];
+for (let i = 0; i < resultados.snapshotLength; i++) {
+    const res = resultados.snapshotItem(i);
+    const titulo = xp(".//div[@class='isbnResDescripcion']//a[contains(@href, 'tituloDetalle')]", res, FIRST).singleNodeValue;
+    if (!titulo) continue;
+    const isbn = xp(".//div[@class='camposCheck']//a[contains(@href, 'tituloDetalle')] | .//div[contains(@class, 'camposIsbnRes')]//span[@class='isbn'][1]//strong", res, FIRST).singleNodeValue;
+    const ps = xp(".//div[@class='isbnResDescripcion']//p", res, ALL), parrafos = [];
+    for (let j = 0; j < ps.snapshotLength; j++) parrafos.push(ps.snapshotItem(j).innerText);
+    registros.push({titulo: titulo.innerText.trim(), isbn: isbn ? isbn.innerText.trim() : null, parrafos: parrafos});
+}
+return registros;
+"""
+
+def extract_cultura_records_selenium(driver, mode=None):
+    """Lee todos los resultados de la página actual con una única llamada a WebDriver."""
+    if (mode or CULTURA_SELENIUM_EXTRACTION) == "page_source":
+        return parse_cultura_results_html(driver.page_source)[0]
+    return driver.execute_script(CULTURA_EXTRACT_JS) or []
+
+def search_book_cultura_gob(lease, title_for_search, author_for_search):
+    from selenium.webdriver.common.by import By
+    from selenium.webdriver.support.ui import WebDriverWait
+    from selenium.webdriver.support import expected_conditions as EC
+    from selenium.common.exceptions import TimeoutException
     log(f"Cultura.gob: Buscando T='{title_for_search}', A='{author_for_search}'")
 
+    driver = lease.driver if lease else None
     if not driver:
         log("Cultura.gob: Driver no disponible. Saltando búsqueda.")
         return "Driver Error", None, None, None, None
     try:
-        current_url = driver.current_url
-        base_search_url = 'https://www.cultura.gob.es/webISBN/tituloSimpleFilter.do'
-        if base_search_url not in current_url :
-             driver.get(base_search_url + '?cache=init&prev_layout=busquedaisbn&layout=busquedaisbn&language=es')
+        search_box_locator = (By.ID, CULTURA_QUERY_FIELD)
+        # La página de resultados trae el mismo formulario: solo se carga el de búsqueda si no está en la actual
+        if not driver.find_elements(*search_box_locator):
+            with perf_stage("cultura.selenium.carga_formulario"):
+                driver.get(CULTURA_SEARCH_URL + CULTURA_SEARCH_INIT_QUERY)
 
         wait = WebDriverWait(driver, 20)
 
-        if not cookies_already_accepted:
-            try:
-                cookie_xpaths = ["//button[contains(translate(normalize-space(.), 'ACEPTAR', 'aceptar'), 'aceptar')]", "//button[contains(translate(text(), 'ACEPTAR', 'aceptar'), 'Aceptar')]", "//a[contains(translate(normalize-space(.), 'ACEPTAR', 'aceptar'), 'aceptar')]"]
-                for xpath in cookie_xpaths:
-                    try:
-                        cookie_button = WebDriverWait(driver, 3).until(EC.element_to_be_clickable((By.XPATH, xpath)))
-                        driver.execute_script("arguments[0].click();", cookie_button)
-                        cultura_cookies_accepted_global = True; time.sleep(1.0)
-                        break
-                    except: continue
-                if not cultura_cookies_accepted_global: cultura_cookies_accepted_global = True
-            except Exception as e_cookie:
-                log(f"Cultura.gob: Advertencia (o banner no presente) al manejar cookies: {str(e_cookie)}")
-                if not cultura_cookies_accepted_global: cultura_cookies_accepted_global = True
-
-        search_box_xpath = "//input[@id='params.liConceptosExt[0].texto']"
-        search_box = wait.until(EC.presence_of_element_located((By.XPATH, search_box_xpath)))
-        driver.execute_script("arguments[0].scrollIntoView({block: 'center'});", search_box)
-        time.sleep(0.3); search_box.clear()
-
-        search_query = " ".join([part for part in [title_for_search, author_for_search] if part and part.strip()]) or title_for_search
-        if not search_query.strip(): return "Query Vacía", None, None, None, None
-
-        search_box.send_keys(search_query)
-        submit_button = wait.until(EC.element_to_be_clickable((By.XPATH, "//input[@type='submit' and @value='Buscar']")))
-        driver.execute_script("arguments[0].click();", submit_button)
+        if not lease.cookies_accepted:
+            with perf_stage("cultura.selenium.cookies"):
+                try:
+                    # Un único XPath con todas las variantes del botón, en vez de esperar a cada una por separado
+                    cookie_button = WebDriverWait(driver, CULTURA_COOKIE_WAIT).until(EC.element_to_be_clickable((By.XPATH, CULTURA_COOKIE_XPATH)))
+                    driver.execute_script("arguments[0].click();", cookie_button)
+                    WebDriverWait(driver, 3).until(EC.invisibility_of_element(cookie_button))
+                except TimeoutException:
+                    pass # Banner no presente (o ya cerrado)
+                except Exception as e_cookie:
+                    log(f"Cultura.gob: Advertencia al manejar cookies: {str(e_cookie)}")
+            lease.cookies_accepted = True
+
+        with perf_stage("cultura.selenium.formulario"):
+            search_query = _cultura_search_query(title_for_search, author_for_search)
+            if not search_query.strip(): return "Query Vacía", None, None, None, None
+
+            search_box = wait.until(EC.element_to_be_clickable(search_box_locator))
+            driver.execute_script("arguments[0].scrollIntoView({block: 'center'});", search_box)
+            search_box.clear()
+            search_box.send_keys(search_query)
+            submit_button = wait.until(EC.element_to_be_clickable((By.XPATH, "//input[@type='submit' and @value='Buscar']")))
+            previous_page = driver.find_element(By.TAG_NAME, "html")
+            driver.execute_script("arguments[0].click();", submit_button)
 
         resultados_xpath, no_resultados_xpath = "//div[@class='isbnResultado']", "//div[@id='aviso']"
         try:
-            WebDriverWait(driver, 12).until(EC.any_of(EC.presence_of_element_located((By.XPATH, resultados_xpath)), EC.presence_of_element_located((By.XPATH, no_resultados_xpath))))
+            with perf_stage("cultura.selenium.espera_resultados"):
+                # La página anterior puede ser otra de resultados: primero se espera a que sea sustituida
+                WebDriverWait(driver, 12).until(EC.all_of(EC.staleness_of(previous_page), EC.any_of(
+                    EC.presence_of_element_located((By.XPATH, resultados_xpath)), EC.presence_of_element_located((By.XPATH, no_resultados_xpath)))))
         except TimeoutException:
             log("Cultura.gob: Timeout esperando resultados.")
+            perf_count("cultura.selenium.timeouts")
+            lease.broken = True # Página posiblemente colgada: mejor un navegador nuevo
             return "Timeout Resultados", None, None, None, None
 
-        resultados_elements = driver.find_elements(By.XPATH, resultados_xpath)
-        if not resultados_elements: return "No hallado", None, None, None, None
-
-        libros = []
-        for res_element in resultados_elements:
-            titulo_text, autor_text, isbn_text, ano_val = "No disponible", "No disponible", "No disponible", None
-            try:
-                titulo_el = res_element.find_element(By.XPATH, ".//div[@class='isbnResDescripcion']//a[contains(@href, 'tituloDetalle')]")
-                titulo_text = titulo_el.text.strip()
-                try:
-                    autor_p = res_element.find_element(By.XPATH, ".//div[@class='isbnResDescripcion']//p[contains(normalize-space(.), 'Autor/es:')]")
-                    autor_match = re.search(r'Autor/es:\s*(.*?)(?:\n|$|F\. Edición:|ISBN:)', autor_p.text, re.DOTALL)
-                    if autor_match: autor_text = re.sub(r'\s+', ' ', autor_match.group(1).strip())
-                except: pass
-                try:
-                    isbn_el = res_element.find_element(By.XPATH, ".//div[@class='camposCheck']//a[contains(@href, 'tituloDetalle')] | .//div[contains(@class, 'camposIsbnRes')]//span[@class='isbn'][1]//strong")
-                    isbn_text = isbn_el.text.strip()
-                except: pass
-
-                full_desc_text = " ".join([p.text for p in res_element.find_elements(By.XPATH, ".//div[@class='isbnResDescripcion']//p")])
-                year_patterns = [r'\((\d{4})\)', r'F\.\s*Edición:\s*\D*(\d{4})\b', r'F\.\s*Publicación:\s*\D*(\d{4})\b', r'\b(1[89]\d{2}|20\d{2})\b']
-                for pattern in year_patterns:
-                    match = re.search(pattern, full_desc_text, re.IGNORECASE)
-                    if match:
-                        potential_year = int(match.group(1))
-                        if 1800 <= potential_year <= 2100: ano_val = potential_year; break
-
-                if ano_val: libros.append({'titulo': titulo_text, 'autor': autor_text, 'isbn': isbn_text, 'ano_edicion': ano_val})
-            except Exception as e_proc_res:
-                log(f"Cultura.gob: Error procesando resultado individual: {str(e_proc_res)}")
-
-        if libros:
-            libros.sort(key=lambda x: x.get('ano_edicion', 0), reverse=True)
-            lr = libros[0]
-            return "OK", lr['titulo'], lr['autor'], lr['isbn'], str(lr['ano_edicion'])
-        return "No hallado (s/año)", None, None, None, None
+        with perf_stage("cultura.selenium.extraccion"):
+            registros = extract_cultura_records_selenium(driver)
+        if not registros: return "No hallado", None, None, None, None
+        return _select_latest_cultura(registros)
     except Exception as e_sel:
         log(f"Cultura.gob: Error inesperado en Selenium: {str(e_sel)}\n{traceback.format_exc()}")
+        perf_count("cultura.selenium.errores")
+        lease.broken = True
         return "Error Inesperado", None, None, None, None
 
+CULTURA_SELENIUM_FAILURES = {"Driver Error", "Timeout Resultados", "Error Inesperado"}
+
+def search_book_cultura_pooled(title_for_search, author_for_search):
+    """Búsqueda con Selenium detrás del cortacircuitos: con el sitio caído se falla al momento en vez de esperar."""
+    backend = cultura_selenium_backend_global
+    if not backend.breaker.allow():
+        perf_count(f"{backend.key}.circuito_abierto")
+        return CIRCUIT_OPEN_STATUS, None, None, None, None
+    start = time.perf_counter()
+    result = _search_book_cultura_pooled(title_for_search, author_for_search)
+    if result[0] in CULTURA_SELENIUM_FAILURES: backend.failure()
+    else: backend.success(time.perf_counter() - start)
+    return result
+
+def _search_book_cultura_pooled(title_for_search, author_for_search):
+    """Toma un driver del pool global, hace la búsqueda en Cultura.gob y lo devuelve."""
+    pool = cultura_driver_pool_global
+    if not pool:
+        return search_book_cultura_gob(None, title_for_search, author_for_search)
+    try:
+        with pool.lease() as lease:
+            return search_book_cultura_gob(lease, title_for_search, author_for_search)
+    except Exception as e_pool:
+        log(f"Cultura.gob: No se pudo obtener un driver del pool: {e_pool}")
+        return "Driver Error", None, None, None, None
+
+def search_book_cultura(title_for_search, author_for_search):
+    """Busca en Cultura.gob con el backend configurado; en modo "auto" usa Selenium solo si falla el HTTP."""
+    if CULTURA_BACKEND != "selenium":
+        result = search_book_cultura_http(title_for_search, author_for_search)
+        if result[0] not in ("Error HTTP", CIRCUIT_OPEN_STATUS) or CULTURA_BACKEND == "http": return result
+        log("  -> Cliente HTTP de Cultura.gob falló. Reintentando con Selenium...")
+        perf_count("cultura.respaldo_selenium")
+    return search_book_cultura_pooled(title_for_search, author_for_search)
+
 def y_ol(date_input):
     if not date_input: return None
     date_str = str(date_input[0]) if isinstance(date_input, list) and date_input else str(date_input)
+    return _year_from_date_text(date_str)
+
+@lru_cache(maxsize=65536)
+def _year_from_date_text(date_str):
+    # Las mismas fechas ("1998", "March 1998"...) se repiten en miles de ediciones: se analizan una vez
     try:
         if re.fullmatch(r'\d{4}', date_str):
             year = int(date_str)
@@ -252,54 +956,642 @@ def y_ol(date_input):
         m = re.search(r"\b(1[7-9]\d{2}|20\d{2}|2100)\b", date_str)
         return int(m.group(1)) if m else None
 
-def g_ol(url, **kv):
+class OLResponseCache:
+    """
+    Caché en disco (SQLite) de las respuestas GET de Open Library, indexada por URL+parámetros.
+    Cada entrada caduca según el TTL de su endpoint y, si se supera OL_CACHE_MAX_BYTES,
+    se descartan primero las entradas usadas hace más tiempo.
+    """
+    def __init__(self, path, max_bytes):
+        self.path, self.max_bytes = path, max_bytes
+        self.stats = {"hits": 0, "misses": 0, "expired": 0, "stores": 0, "evicted": 0}
+        self._lock = threading.Lock()
+        # Varios procesos (ejecución por fragmentos) pueden compartir la caché: se espera al que escribe
+        self._conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS responses (key TEXT PRIMARY KEY, status INTEGER, body BLOB, "
+            "size INTEGER, stored_at REAL, expires_at REAL, last_access REAL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_responses_access ON responses(last_access)")
+        self._conn.commit()
+        self._total_bytes = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+
+    @staticmethod
+    def ttl_for(url, status):
+        if status != 200: return OL_CACHE_NEGATIVE_TTL
+        for fragment, ttl in OL_CACHE_TTLS:
+            if fragment in url: return ttl
+        return OL_CACHE_DEFAULT_TTL
+
+    def get(self, key):
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute("SELECT status, body, expires_at FROM responses WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                self.stats["misses"] += 1; return None
+            status, body, expires_at = row
+            if expires_at < now and not OL_CACHE_OFFLINE: # En modo sin conexión se aprovecha lo caducado
+                self.stats["expired"] += 1; self.stats["misses"] += 1; return None
+            self._conn.execute("UPDATE responses SET last_access = ? WHERE key = ?", (now, key))
+            self._conn.commit()
+            self.stats["hits"] += 1
+            return status, body
+
+    def put(self, key, status, body):
+        now, body = time.time(), body or b""
+        with self._lock:
+            old = self._conn.execute("SELECT size FROM responses WHERE key = ?", (key,)).fetchone()
+            if old: self._total_bytes -= old[0]
+            self._conn.execute(
+                "INSERT OR REPLACE INTO responses (key, status, body, size, stored_at, expires_at, last_access) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (key, status, sqlite3.Binary(body), len(body), now, now + self.ttl_for(key, status), now),
+            )
+            self._total_bytes += len(body); self.stats["stores"] += 1
+            if self._total_bytes > self.max_bytes: self._evict()
+            self._conn.commit()
+
+    def _evict(self):
+        # Se libera hasta el 90% del máximo empezando por las entradas menos usadas recientemente
+        target = int(self.max_bytes * 0.9)
+        self._conn.execute("DELETE FROM responses WHERE expires_at < ?", (time.time(),))
+        self._total_bytes = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+        while self._total_bytes > target:
+            victims = self._conn.execute("SELECT key, size FROM responses ORDER BY last_access LIMIT 500").fetchall()
+            if not victims: break
+            self._conn.executemany("DELETE FROM responses WHERE key = ?", [(k,) for k, _ in victims])
+            self._total_bytes -= sum(sz for _, sz in victims); self.stats["evicted"] += len(victims)
+
+    def summary(self):
+        st = self.stats; total = st["hits"] + st["misses"]
+        ratio = (100.0 * st["hits"] / total) if total else 0.0
+        return (f"Caché OL: {st['hits']} aciertos, {st['misses']} fallos ({ratio:.1f}% aciertos), "
+                f"{st['expired']} caducadas, {st['stores']} guardadas, {st['evicted']} descartadas, "
+                f"{self._total_bytes / (1024 * 1024):.1f} MB en disco")
+
+class TokenBucket:
+    """Limitador de tasa (cubo de fichas) seguro entre hilos."""
+    def __init__(self, rate, capacity):
+        self.rate, self.capacity = rate, capacity
+        self._tokens, self._last = float(capacity), time.monotonic()
+        self._paused_until = 0.0
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._last) * self.rate)
+                self._last = now
+                if now < self._paused_until: wait = self._paused_until - now
+                elif self._tokens >= 1:
+                    self._tokens -= 1; return
+                else: wait = (1 - self._tokens) / self.rate
+            time.sleep(wait)
+
+    def set_rate(self, rate):
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.capacity, self._tokens + (now - self._last) * self.rate)
+            self._last, self.rate = now, rate
+
+    def pause(self, seconds):
+        """Nadie obtiene fichas durante `seconds` (p. ej. lo pedido en un Retry-After)."""
+        with self._lock: self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+
+class AdaptiveRate:
+    """
+    Ajusta la tasa de un TokenBucket (AIMD): sube poco a poco con cada respuesta rápida y baja a la
+    mitad ante un 429/503, o un 20 % si hay errores o la latencia media supera `latency_target`.
+    """
+    def __init__(self, bucket, max_rate, min_rate, latency_target):
+        self.bucket, self.max_rate, self.min_rate, self.latency_target = bucket, max_rate, min(min_rate, max_rate), latency_target
+        self.latency_ewma, self.decreases = None, 0
+        self._last_decrease = 0.0
+        self._lock = threading.Lock()
+
+    def success(self, latency):
+        with self._lock:
+            self.latency_ewma = latency if self.latency_ewma is None else 0.8 * self.latency_ewma + 0.2 * latency
+            if self.latency_ewma > self.latency_target: self._decrease(0.8)
+            elif self.bucket.rate < self.max_rate: self.bucket.set_rate(min(self.max_rate, self.bucket.rate + self.max_rate * 0.02))
+
+    def throttled(self, retry_after=None):
+        with self._lock: self._decrease(0.5)
+        if retry_after: self.bucket.pause(retry_after)
+
+    def error(self):
+        with self._lock: self._decrease(0.8)
+
+    def _decrease(self, factor):
+        # Una ráfaga de fallos simultáneos cuenta como una sola señal
+        now = time.monotonic()
+        if now - self._last_decrease < 1.0: return
+        self._last_decrease = now; self.decreases += 1
+        self.bucket.set_rate(max(self.min_rate, self.bucket.rate * factor))
+
+class BackendUnavailable(Exception):
+    """El cortacircuitos del backend está abierto: se falla sin hacer la petición."""
+
+class CircuitBreaker:
+    """
+    Cortacircuitos de un backend remoto. Tras `failure_threshold` fallos seguidos se abre y las llamadas
+    fallan al momento durante `reset_timeout` segundos; después deja pasar una sola prueba (semiabierto)
+    y se cierra si sale bien o se vuelve a abrir si falla.
+    """
+    def __init__(self, name, failure_threshold=CIRCUIT_FAILURE_THRESHOLD, reset_timeout=CIRCUIT_RESET_SECONDS):
+        self.name, self.failure_threshold, self.reset_timeout = name, failure_threshold, reset_timeout
+        self.state, self.trips, self.rejected = "cerrado", 0, 0
+        self._failures, self._opened_at, self._probing = 0, 0.0, False
+        self._lock = threading.Lock()
+
+    def allow(self):
+        with self._lock:
+            if self.state == "cerrado": return True
+            if self.state == "abierto" and time.monotonic() - self._opened_at >= self.reset_timeout:
+                self.state, self._probing = "semiabierto", False
+            if self.state == "semiabierto" and not self._probing:
+                self._probing = True; return True
+            self.rejected += 1
+            return False
+
+    def is_open(self):
+        with self._lock: return self.state == "abierto" and time.monotonic() - self._opened_at < self.reset_timeout
+
+    def success(self):
+        with self._lock:
+            if self.state != "cerrado": log(f"{self.name}: El backend responde de nuevo, se cierra el circuito.")
+            self.state, self._failures, self._probing = "cerrado", 0, False
+
+    def release_probe(self):
+        """La prueba del semiabierto acabó sin veredicto (p. ej. un 429): se deja pasar otra."""
+        with self._lock:
+            if self.state == "semiabierto": self._probing = False
+
+    def failure(self):
+        with self._lock:
+            self._failures += 1
+            if self.state == "semiabierto" or (self.state == "cerrado" and self._failures >= self.failure_threshold):
+                self.state, self._opened_at, self._probing = "abierto", time.monotonic(), False
+                self.trips += 1
+                log(f"{self.name}: {self._failures} fallos seguidos, se abre el circuito durante {self.reset_timeout:.0f} s.")
+
+class RemoteBackend:
+    """Limitador de tasa (opcional), control adaptativo de la tasa y cortacircuitos de un backend remoto."""
+    def __init__(self, key, name, bucket=None, min_rate=OL_MIN_REQUESTS_PER_SECOND, latency_target=OL_LATENCY_TARGET):
+        self.key, self.name, self.bucket = key, name, bucket # key: prefijo en las métricas
+        self.rate = AdaptiveRate(bucket, bucket.rate, min_rate, latency_target) if bucket else None
+        self.breaker = CircuitBreaker(name)
+        self.retries = 0
+
+    def success(self, latency):
+        self.breaker.success()
+        if self.rate: self.rate.success(latency)
+
+    def failure(self):
+        self.breaker.failure()
+        if self.rate: self.rate.error()
+
+    def throttled(self, retry_after=None):
+        if self.rate: self.rate.throttled(retry_after)
+
+    def summary(self):
+        tasa = f", tasa {self.bucket.rate:.2f}/s ({self.rate.decreases} frenadas)" if self.rate else ""
+        return (f"{self.name}: circuito {self.breaker.state}, abierto {self.breaker.trips} veces, "
+                f"{self.breaker.rejected} llamadas rechazadas, {self.retries} reintentos{tasa}.")
+
+def _retry_after_seconds(response):
+    value = response.headers.get("Retry-After") if response is not None else None
+    if not value: return None
+    try: return max(0.0, float(value))
+    except ValueError: pass
+    try: return max(0.0, email.utils.parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError): return None
+
+def backoff_delay(attempt, retry_after=None):
+    """Espera antes del reintento `attempt` (desde 0): Retry-After si lo hay, si no exponencial con jitter completo."""
+    if retry_after is not None: return min(retry_after, RETRY_MAX_DELAY)
+    return random.uniform(0, min(RETRY_MAX_DELAY, RETRY_BASE_DELAY * 2 ** attempt))
+
+def request_with_retries(backend, send, stage=None, max_retries=BACKEND_MAX_RETRIES):
+    """
+    Hace la petición send() (que devuelve un requests.Response) a través de `backend`: respeta su
+    limitador y su cortacircuitos y reintenta los errores de red y los 429/5xx con backoff_delay.
+    Devuelve la última respuesta (puede ser un error HTTP) o lanza la última excepción de red;
+    BackendUnavailable si el circuito está abierto.
+    """
+    for attempt in range(max_retries + 1):
+        if not backend.breaker.allow():
+            perf_count(f"{backend.key}.circuito_abierto")
+            raise BackendUnavailable(backend.name)
+        start, response, error, retry_after = time.perf_counter(), None, None, None
+        try:
+            if backend.bucket:
+                with perf_stage(f"espera.limite_{backend.key}"): backend.bucket.acquire()
+            start = time.perf_counter()
+            with perf_stage(stage or backend.key): response = send()
+        except (requests.exceptions.ConnectionError, requests.exceptions.Timeout) as e_net:
+            error = e_net
+            backend.failure()
+        except BaseException:
+            # Cualquier otro error también resuelve la prueba del semiabierto; si no, el circuito no se volvería a cerrar
+            backend.failure(); raise
+        else:
+            if response.status_code not in RETRY_STATUSES:
+                backend.success(time.perf_counter() - start)
+                return response
+            error, retry_after = f"HTTP {response.status_code}", _retry_after_seconds(response)
+            if response.status_code == 429: # El servidor está vivo: solo se frena
+                backend.throttled(retry_after); backend.breaker.release_probe()
+            else:
+                backend.failure()
+                if response.status_code == 503: backend.throttled(retry_after)
+        if attempt == max_retries: break
+        delay = backoff_delay(attempt, retry_after)
+        backend.retries += 1; perf_count(f"{backend.key}.reintentos")
+        log(f"{backend.name}: {error}. Reintento {attempt + 1}/{max_retries} en {delay:.1f} s.")
+        perf_sleep(delay, f"reintento_{backend.key}")
+    if response is not None: return response
+    raise error
+
+ol_rate_limiter_global = TokenBucket(OL_REQUESTS_PER_SECOND, OL_RATE_BURST)
+ol_backend_global = RemoteBackend("ol", "OL", ol_rate_limiter_global)
+cultura_http_backend_global = RemoteBackend("cultura.http", "Cultura.gob (HTTP)", TokenBucket(CULTURA_REQUESTS_PER_SECOND, max(1, int(CULTURA_REQUESTS_PER_SECOND))))
+cultura_selenium_backend_global = RemoteBackend("cultura.selenium", "Cultura.gob (Selenium)")
+
+class LRUMemo:
+    """
+    Memoización acotada (LRU) y segura entre hilos. Si varios hilos piden a la vez una clave
+    ausente, solo uno la calcula y el resto espera su resultado.
+    """
+    def __init__(self, name, maxsize):
+        self.name, self.maxsize = name, maxsize
+        self._data, self._inflight = OrderedDict(), {}
+        self._lock = threading.Lock()
+        self.hits, self.misses, self.evictions = 0, 0, 0
+
+    def get_or_compute(self, key, fn, *args, keep=bool):
+        """Devuelve el valor de `key`, calculándolo con fn(*args) si hace falta; solo se guarda si keep(valor)."""
+        with self._lock:
+            if key in self._data:
+                self._data.move_to_end(key); self.hits += 1
+                return self._data[key]
+            future = self._inflight.get(key)
+            owner = future is None
+            if owner:
+                future = self._inflight[key] = Future(); self.misses += 1
+            else:
+                self.hits += 1
+        if not owner: return future.result()
+        try:
+            value = fn(*args)
+        except BaseException as e_memo:
+            with self._lock: self._inflight.pop(key, None)
+            future.set_exception(e_memo); raise
+        with self._lock:
+            self._inflight.pop(key, None)
+            if keep(value): self._store(key, value)
+        future.set_result(value)
+        return value
+
+    def put(self, key, value):
+        with self._lock: self._store(key, value)
+
+    def __contains__(self, key):
+        with self._lock: return key in self._data
+
+    def _store(self, key, value):
+        self._data[key] = value
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False); self.evictions += 1
+
+    def summary(self):
+        total = self.hits + self.misses
+        ratio = (100.0 * self.hits / total) if total else 0.0
+        return f"{self.name}: {self.hits} aciertos, {self.misses} fallos ({ratio:.1f}% aciertos), {len(self._data)}/{self.maxsize} entradas, {self.evictions} descartadas"
+
+ol_author_memo_global = LRUMemo("Memo autores OL", OL_AUTHOR_MEMO_SIZE)
+ol_work_memo_global = LRUMemo("Memo obras OL", OL_WORK_MEMO_SIZE)
+ol_isbn_memo_global = LRUMemo("Memo ISBN->obra OL", OL_ISBN_MEMO_SIZE)
+
+def _get_ol_session():
+    global ol_session_global
+    with _lazy_init_lock:
+        if ol_session_global is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=4, pool_maxsize=max(OL_MAX_WORKERS, 10))
+            session.mount("https://", adapter); session.mount("http://", adapter)
+            ol_session_global = session
+    return ol_session_global
+
+def _get_ol_cache():
+    global ol_cache_global
+    with _lazy_init_lock:
+        if ol_cache_global is None and OL_CACHE_PATH:
+            try: ol_cache_global = OLResponseCache(OL_CACHE_PATH, OL_CACHE_MAX_BYTES)
+            except Exception as e_cache:
+                log(f"OL: No se pudo abrir la caché en '{OL_CACHE_PATH}', se continúa sin caché: {e_cache}")
+                ol_cache_global = False
+    return ol_cache_global or None
+
+def _get_ol_local_index():
+    global ol_local_index_global
+    if OL_BACKEND != "local": return None
+    with _lazy_init_lock:
+        if ol_local_index_global is None:
+            if not os.path.exists(OL_LOCAL_INDEX_PATH):
+                raise FileNotFoundError(f"OL_BACKEND=local pero no existe el índice '{OL_LOCAL_INDEX_PATH}' (genéralo con ol_index.py)")
+            ol_local_index_global = OLLocalIndex(OL_LOCAL_INDEX_PATH)
+    return ol_local_index_global
+
+def _ol_cache_key(url, params=None):
+    if params: url = requests.Request("GET", url, params=sorted(params.items())).prepare().url
+    return url
+
+def _response_from_cache(url, body):
+    r = requests.Response()
+    r.status_code, r._content, r.url, r.encoding = 200, body, url, "utf-8"
+    return r
+
+OL_ENDPOINTS = [("/editions.json", "editions"), ("/isbn/", "isbn"), ("/api/books", "books"), ("/search.json", "search"), ("/authors/", "authors"), ("/works/", "works")]
+
+def _ol_endpoint(url):
+    return next((name for fragment, name in OL_ENDPOINTS if fragment in url), "otros")
+
+def g_ol(url, use_cache=True, **kv):
+    cache, cache_key = _get_ol_cache() if use_cache else None, _ol_cache_key(url, kv.get("params"))
+    endpoint = _ol_endpoint(url) if current_perf() is not None else None
+    cached = cache.get(cache_key) if cache else None
+    if cached is not None:
+        perf_count(f"ol.{endpoint}.cache")
+        status, body = cached
+        return _response_from_cache(cache_key, bytes(body)) if status == 200 else None
+    if OL_CACHE_OFFLINE:
+        log(f"OL: Modo sin conexión, sin entrada en caché para {cache_key}"); return None
     try:
-        r = requests.get(url, timeout=20, **kv)
-        r.raise_for_status(); return r
-    except requests.exceptions.RequestException as e_req: log(f"OL Error GET: {e_req}"); return None
-    except Exception as e_gen: log(f"OL Error general g_ol: {e_gen}"); return None
+        r = request_with_retries(ol_backend_global, lambda: _get_ol_session().get(url, timeout=OL_HTTP_TIMEOUT, **kv), stage=f"ol.{endpoint}")
+        if cache and r.status_code == 404: cache.put(cache_key, 404, b"")
+        r.raise_for_status()
+        if cache: cache.put(cache_key, 200, r.content)
+        return r
+    except BackendUnavailable: return None
+    except requests.exceptions.RequestException as e_req: log(f"OL Error GET: {e_req}"); perf_count(f"ol.{endpoint}.errores"); return None
+    except Exception as e_gen: log(f"OL Error general g_ol: {e_gen}"); perf_count(f"ol.{endpoint}.errores"); return None
+
+def _works_from_isbn_ol_single(isbn):
+    local_index = _get_ol_local_index()
+    if local_index: return local_index.works_from_isbn(isbn)
+    r = g_ol(f"{OL_BASE_URL}/isbn/{isbn}.json")
+    return [w["key"] for w in r.json().get("works", [])] if r and r.content else []
 
 def works_from_isbn_ol(isbn):
-    r = g_ol(f"https://openlibrary.org/isbn/{isbn}.json")
-    return [w["key"] for w in r.json().get("works", [])] if r and r.content else []
+    # Normalmente ya resuelto por prefetch_isbn_works_ol; si no, petición individual
+    return ol_isbn_memo_global.get_or_compute(isbn, _works_from_isbn_ol_single, isbn)
+
+def _books_api_params(isbns):
+    return {"bibkeys": ",".join(f"ISBN:{isbn}" for isbn in isbns), "format": "json", "jscmd": "details"}
+
+def _works_from_books_api(data, isbn):
+    return [w["key"] for w in (data.get(f"ISBN:{isbn}") or {}).get("details", {}).get("works", []) if w.get("key")]
+
+def _isbn_batch_works_ol(batch):
+    """
+    Resuelve un lote de ISBN a claves de obra con /api/books. Devuelve None si la petición falla.
+    La respuesta se guarda en la caché troceada por ISBN, para que un lote distinto la aproveche.
+    """
+    r = g_ol(f"{OL_BASE_URL}/api/books", use_cache=False, params=_books_api_params(batch))
+    if not r or not r.content: return None
+    try: data = r.json()
+    except ValueError: return None
+    cache = _get_ol_cache()
+    if cache:
+        for isbn in batch:
+            entry = {f"ISBN:{isbn}": data[f"ISBN:{isbn}"]} if f"ISBN:{isbn}" in data else {}
+            cache.put(_ol_cache_key(f"{OL_BASE_URL}/api/books", _books_api_params([isbn])), 200, json.dumps(entry).encode("utf-8"))
+    return {isbn: _works_from_books_api(data, isbn) for isbn in batch}
+
+def _cached_isbn_works_ol(isbn):
+    cache = _get_ol_cache()
+    cached = cache.get(_ol_cache_key(f"{OL_BASE_URL}/api/books", _books_api_params([isbn]))) if cache else None
+    if not cached or cached[0] != 200: return None
+    try: return _works_from_books_api(json.loads(bytes(cached[1])), isbn)
+    except ValueError: return None
+
+def prefetch_isbn_works_ol(isbns, batch_size=None):
+    """
+    Resuelve de antemano, por lotes (de OL_ISBN_BATCH_SIZE por defecto), los ISBN del archivo a claves
+    de obra y siembra con ellos la memoria que consulta works_from_isbn_ol, para que las filas no
+    hagan peticiones por ISBN.
+    """
+    batch_size = batch_size or OL_ISBN_BATCH_SIZE
+    pending, resolved, with_work, failed = [], 0, 0, 0
+    for isbn in sorted({isbn for isbn in isbns if isbn and isbn not in ol_isbn_memo_global}):
+        works = _cached_isbn_works_ol(isbn)
+        if works is None: pending.append(isbn); continue
+        ol_isbn_memo_global.put(isbn, works); resolved += 1; with_work += bool(works)
+    from_cache = resolved
+    batches = [pending[i:i + batch_size] for i in range(0, len(pending), batch_size)]
+    if batches:
+        with ThreadPoolExecutor(max_workers=min(OL_MAX_WORKERS, len(batches)), thread_name_prefix="ol-isbn") as executor:
+            for batch_result in executor.map(bind_job_context(_isbn_batch_works_ol), batches):
+                if batch_result is None: failed += 1; continue
+                for isbn, works in batch_result.items():
+                    ol_isbn_memo_global.put(isbn, works) # También los no encontrados, para no repetirlos uno a uno
+                    resolved += 1; with_work += bool(works)
+    return (f"Prefetch ISBN OL: {resolved}/{from_cache + len(pending)} ISBN resueltos ({from_cache} desde caché, "
+            f"{len(pending)} en {len(batches)} peticiones; {with_work} con obra, {failed} lotes fallidos).")
+
+def author_name_ol(author_key_path):
+    rk_author = g_ol(OL_BASE_URL + author_key_path + ".json")
+    return rk_author.json().get("name", "") if rk_author and rk_author.content else None
 
 def authors_of_work_ol(wk):
-    r = g_ol(f"https://openlibrary.org{wk}.json"); names = []
+    local_index = _get_ol_local_index()
+    if local_index: return local_index.authors_of_work(wk)
+    r = g_ol(f"{OL_BASE_URL}{wk}.json"); names = []
     if r and r.content:
         for a_data in r.json().get("authors", []):
             author_entry = a_data.get("author", {}) if "author" in a_data else a_data
             author_key_path = author_entry.get("key")
             if author_key_path:
-                rk_author = g_ol("https://openlibrary.org" + author_key_path + ".json")
-                if rk_author and rk_author.content: names.append(rk_author.json().get("name", ""))
+                # Un autor prolífico aparece en muchas obras: su nombre se pide una sola vez
+                name = ol_author_memo_global.get_or_compute(author_key_path, author_name_ol, author_key_path, keep=lambda n: n is not None)
+                if name is not None: names.append(name)
     return names
 
-def eds_of_work_ol(wk, names_of_work_authors):
-    url_base, params = f"https://openlibrary.org{wk}/editions.json", {"limit": 50, "fields": "key,title,publish_date,publish_year,isbn_13,isbn_10,identifiers,authors,author_name"}
-    all_eds, current_offset, max_eds = [], 0, 150
-    while len(all_eds) < max_eds:
-        params["offset"] = current_offset
-        r = g_ol(url_base, params=params);
-        if not r or not r.content: break
-        try: data = r.json()
-        except: break
-        current_entries = data.get("entries", [])
-        if not current_entries: break
-        for entry in current_entries:
-            final_authors = entry.get("author_name", []) or names_of_work_authors
-            all_eds.append({**entry, "author_list_resolved": final_authors})
-        current_offset += len(current_entries)
-        if len(current_entries) < params["limit"]: break
-        time.sleep(PAUSE_OPENLIBRARY / 4)
-    return all_eds
+def _get_ol_editions_executor():
+    global ol_editions_executor_global
+    with _lazy_init_lock:
+        if ol_editions_executor_global is None:
+            ol_editions_executor_global = ThreadPoolExecutor(max_workers=OL_EDITIONS_PAGE_WORKERS, thread_name_prefix="ol-ediciones")
+        return ol_editions_executor_global
+
+def _get_ol_speculative_executor():
+    global ol_speculative_executor_global
+    with _lazy_init_lock:
+        if ol_speculative_executor_global is None:
+            # Una consulta especulativa por cada fila 'es' en vuelo
+            workers = max(CULTURA_POOL_SIZE, CULTURA_HTTP_WORKERS)
+            ol_speculative_executor_global = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="ol-especulativa")
+        return ol_speculative_executor_global
+
+def _edition_isbn_ol(e_data):
+    chosen_isbn = None
+    isbns13_data = e_data.get("isbn_13", []); isbns10_data = e_data.get("isbn_10", []); isbns_cand_data = e_data.get("isbn_candidate", [])
+    if isbns13_data and isinstance(isbns13_data, list) and isbns13_data: chosen_isbn = isbns13_data[0]
+    if not chosen_isbn and isbns10_data and isinstance(isbns10_data, list) and isbns10_data: chosen_isbn = isbns10_data[0]
+    if not chosen_isbn and isbns_cand_data and isinstance(isbns_cand_data, list) and isbns_cand_data:
+        for ic in isbns_cand_data:
+            if len(str(ic).replace("-","")) == 13: chosen_isbn = ic; break
+        if not chosen_isbn and isbns_cand_data: chosen_isbn = isbns_cand_data[0]
+    return str(chosen_isbn).replace("-","") if chosen_isbn else None
+
+def edition_candidate_ol(e_data):
+    """Edición reducida a (año, título, ISBN, autores), o None si no tiene un año válido."""
+    year = y_ol(e_data.get("publish_date") or e_data.get("publish_year"))
+    if not year or year < 1700: return None
+    return (year, e_data.get("title"), _edition_isbn_ol(e_data), tuple(e_data.get("author_list_resolved", []) or ()))
+
+class EditionCandidatesOL:
+    """
+    Candidatos de una obra tal como llegan las ediciones. Una edición se descarta al llegar si otra
+    anterior con los mismos autores es más reciente: nunca podría ganar, sea cual sea el filtro.
+    """
+    def __init__(self):
+        self.items, self.seen = [], 0
+        self._newest_by_authors = {}
+
+    def add(self, e_data):
+        self.seen += 1
+        candidate = edition_candidate_ol(e_data)
+        if candidate is None or candidate[0] < self._newest_by_authors.get(candidate[3], -1): return None
+        self._newest_by_authors[candidate[3]] = candidate[0] # Las del mismo año se quedan: desempata el título
+        self.items.append(candidate)
+        return candidate
+
+# --- Puntuación de ediciones candidatas ---
+# El año manda; título, ISBN y coincidencia de autores (todos < 1 en suma) solo desempatan ediciones del mismo año
+SCORE_TITLE_WEIGHT, SCORE_ISBN_WEIGHT, SCORE_AUTHOR_WEIGHT = 0.5, 0.25, 0.1
+
+@lru_cache(maxsize=65536)
+def normalized_name(name):
+    """Nombre en minúsculas y sin acentos, como lo compara author_ok_ol."""
+    return unidecode.unidecode(str(name)).lower().strip()
+
+@lru_cache(maxsize=65536)
+def title_tokens(title):
+    """Palabras del título limpio (clean_title_general) en minúsculas; vacío si no hay título."""
+    cleaned = clean_title_general(title)
+    return frozenset() if cleaned == "No disponible" else frozenset(cleaned.lower().split())
+
+def title_similarity(found_title, search_title):
+    """Jaccard entre las palabras de dos títulos (1.0 = mismas palabras, sin importar mayúsculas ni orden)."""
+    found, search = title_tokens(found_title), title_tokens(search_title)
+    if not found or not search: return 0.0
+    return len(found & search) / len(found | search)
+
+class EditionScorer:
+    """
+    Puntúa en bloque los candidatos (año, título, ISBN, autores) de una búsqueda. Nombres y títulos
+    se normalizan una vez (en caché) y el filtro de autores se evalúa una vez por lista de autores
+    distinta; después año, similitud del título, presencia de ISBN y solapamiento de autores se
+    combinan con operaciones sobre arrays. Con `stop_year`, is_stop_candidate() indica qué
+    candidato basta para dejar de buscar.
+    """
+    def __init__(self, filter_authors, search_title=None, stop_year=None):
+        self.filter_authors, self.search_title, self.stop_year = filter_authors, search_title, stop_year
+        self._target_tokens = {token for target in filter_authors or [] if target and target != "No disponible"
+                               for token in normalized_name(target).split()}
+        self._authors = {} # lista de autores -> (pasa el filtro, fracción de palabras del autor buscado presentes)
+
+    def _author_score(self, authors):
+        if authors not in self._authors:
+            ok = not self.filter_authors or author_ok_ol(self.filter_authors, list(authors))
+            found = {token for name in authors for token in normalized_name(name).split()}
+            overlap = len(self._target_tokens & found) / len(self._target_tokens) if self._target_tokens else 0.0
+            self._authors[authors] = (ok, overlap)
+        return self._authors[authors]
+
+    def accepts(self, candidate):
+        return self._author_score(candidate[3])[0]
+
+    def is_stop_candidate(self, candidate):
+        return self.stop_year is not None and candidate[0] >= self.stop_year and self.accepts(candidate)
+
+    def rank(self, candidates):
+        """[(puntuación, candidato)] de los que pasan el filtro de autores, de mejor a peor (empates en el orden de llegada)."""
+        if not candidates: return []
+        author_scores = [self._author_score(c[3]) for c in candidates]
+        eligible = np.fromiter((ok for ok, _ in author_scores), dtype=bool, count=len(candidates))
+        years = np.fromiter((c[0] for c in candidates), dtype=float, count=len(candidates))
+        overlap = np.fromiter((o for _, o in author_scores), dtype=float, count=len(candidates))
+        has_isbn = np.fromiter((bool(c[2]) for c in candidates), dtype=float, count=len(candidates))
+        similarity = np.fromiter((title_similarity(c[1], self.search_title) for c in candidates), dtype=float, count=len(candidates))
+        scores = years + SCORE_TITLE_WEIGHT * similarity + SCORE_ISBN_WEIGHT * has_isbn + SCORE_AUTHOR_WEIGHT * overlap
+        scores = np.where(eligible, scores, -np.inf)
+        order = np.argsort(-scores, kind="stable")
+        return [(float(scores[i]), candidates[i]) for i in order if eligible[i]]
+
+    def best(self, candidates):
+        ranked = self.rank(candidates)
+        if not ranked: return "No hallado (s/criterio)", None, None, None, None
+        year, title, isbn, authors = ranked[0][1]
+        return "OK", title, ", ".join(authors or self.filter_authors or ["Desconocido"]), isbn, str(year)
+
+def _editions_page_ol(url_base, offset):
+    """Una página de ediciones: (entradas, total de ediciones de la obra o None), o None si falla."""
+    params = {"limit": OL_EDITIONS_PAGE_SIZE, "offset": offset, "fields": "key,title,publish_date,publish_year,isbn_13,isbn_10,identifiers,authors,author_name"}
+    r = g_ol(url_base, params=params)
+    if not r or not r.content: return None
+    try: data = r.json()
+    except: return None
+    return data.get("entries", []), data.get("size")
+
+def eds_of_work_ol(wk, names_of_work_authors, stop=None):
+    """
+    Candidatos (EditionCandidatesOL) de las ediciones de una obra y si la lista está completa.
+    La primera página dice cuántas ediciones hay y el resto se piden a la vez; las páginas se
+    procesan en orden y se descartan tras reducirlas. Si stop(candidato) se cumple, se deja de pedir.
+    """
+    candidates = EditionCandidatesOL()
+    def consume(entries):
+        for entry in entries:
+            candidate = candidates.add({**entry, "author_list_resolved": entry.get("author_list_resolved") or entry.get("author_name", []) or names_of_work_authors})
+            if candidate is not None and stop and stop(candidate): return True
+        return False
+
+    local_index = _get_ol_local_index()
+    if local_index: return candidates, not consume(local_index.editions_of_work(wk, names_of_work_authors, OL_MAX_EDITIONS))
+    url_base = f"{OL_BASE_URL}{wk}/editions.json"
+    page = _editions_page_ol(url_base, 0)
+    if page is None: return candidates, False
+    entries, size = page
+    if consume(entries): return candidates, False
+    if len(entries) < OL_EDITIONS_PAGE_SIZE: return candidates, True
+    total = min(int(size), OL_MAX_EDITIONS) if str(size or "").isdigit() else OL_MAX_EDITIONS
+    executor = _get_ol_editions_executor()
+    futures = [executor.submit(bind_job_context(_editions_page_ol), url_base, offset) for offset in range(len(entries), total, OL_EDITIONS_PAGE_SIZE)]
+    complete = True
+    try:
+        for future in futures: # En orden, para que el resultado no dependa de qué página llega antes
+            page = future.result()
+            if page is None: complete = False; break
+            if consume(page[0]): complete = False; break
+            if len(page[0]) < OL_EDITIONS_PAGE_SIZE: break
+    finally:
+        for future in futures: future.cancel() # Las páginas aún no pedidas sobran
+    return candidates, complete
 
 def search_editions_ol(title_for_query, author_for_query_hint=""):
     if not title_for_query or title_for_query == "No disponible": return []
+    local_index = _get_ol_local_index()
+    if local_index: return local_index.search_editions(title_for_query, author_for_query_hint if author_for_query_hint != "No disponible" else "")
     cleaned_title = title_for_query.replace('"', ''); q_parts = [f'title:"{cleaned_title}"']
     if author_for_query_hint and author_for_query_hint != "No disponible":
         cleaned_author = author_for_query_hint.replace('"', ''); q_parts.append(f'author:"{cleaned_author}"')
     q, fields = " AND ".join(q_parts), "key,title,author_name,publish_year,publish_date,isbn,first_publish_year"
-    url = f"https://openlibrary.org/search.json?q={urllib.parse.quote_plus(q)}&fields={fields}&limit=10"
+    url = f"{OL_BASE_URL}/search.json?q={urllib.parse.quote_plus(q)}&fields={fields}&limit=10"
     r = g_ol(url); out = []
     if r and r.content:
         try:
@@ -324,8 +1616,8 @@ def search_editions_ol(title_for_query, author_for_query_hint=""):
 def author_ok_ol(targets, ol_authors):
     if not targets or (len(targets)==1 and targets[0]=="No disponible"): return True
     if not ol_authors: return False
-    targets_p = [unidecode.unidecode(str(t)).lower().strip() for t in targets if t and str(t).strip()]
-    ol_authors_p = [unidecode.unidecode(str(a)).lower().strip() for a in ol_authors if a and str(a).strip()]
+    targets_p = [normalized_name(t) for t in targets if t and str(t).strip()]
+    ol_authors_p = [normalized_name(a) for a in ol_authors if a and str(a).strip()]
     if not targets_p: return True
     for t_full in targets_p:
         t_parts = [p for p in t_full.split() if p]
@@ -333,316 +1625,1101 @@ def author_ok_ol(targets, ol_authors):
         for ol_full in ol_authors_p:
             if not ol_full: continue
             if t_full == ol_full or all(p in ol_full for p in t_parts): return True
-            if t_parts[-1] in ol_full.split() and (len(t_parts)==1 or any(np in ol_full for np in t_parts[:-1])): return True
+            if t_parts[-1] in ol_full.split() and (len(t_parts)==1 or any(part in ol_full for part in t_parts[:-1])): return True
     return False
 
-def best_edition_ol(original_isbn_cleaned, title_clean_general, author_clean_general):
+def _work_editions_ol(wk):
+    authors_wk = authors_of_work_ol(wk)
+    return (authors_wk, *eds_of_work_ol(wk, authors_wk))
+
+def work_editions_ol(wk):
+    """
+    Autores, candidatos (EditionCandidatesOL) y si están completos, de una obra de Open Library,
+    memorizados por clave de obra (LRU).
+    """
+    # Si falló alguna página (o no llegó ninguna edición) no se memoriza: las demás filas y trabajos de la
+    # misma obra elegirían entre candidatos incompletos. Se reintenta más tarde
+    return ol_work_memo_global.get_or_compute(wk, _work_editions_ol, wk, keep=lambda r: r[2] and bool(r[1].seen))
+
+def best_edition_ol(original_isbn_cleaned, title_clean_general, author_clean_general, input_year=None):
+    """
+    Edición más reciente en Open Library (entre las del mismo año, la de título más parecido y con
+    ISBN; ver EditionScorer). Con OL_EARLY_STOP_YEARS e `input_year`, la búsqueda termina en cuanto
+    aparece una edición al menos esos años posterior a la del Excel.
+    """
     log(f"OL: Buscando T='{title_clean_general}', A='{author_clean_general}'")
-    all_eds, work_authors = [], set()
-    time.sleep(PAUSE_OPENLIBRARY / 3)
+    stop_year = input_year + OL_EARLY_STOP_YEARS if OL_EARLY_STOP_YEARS and input_year else None
+    wk, authors_wk, eds_wk, seen = None, [], None, 0
 
     if original_isbn_cleaned and original_isbn_cleaned != "No disponible":
         work_keys = works_from_isbn_ol(original_isbn_cleaned)
         if work_keys:
-            for wk_idx, wk in enumerate(work_keys[:1]):
-                if wk_idx > 0: time.sleep(PAUSE_OPENLIBRARY / 4)
+            wk = work_keys[0]
+            if stop_year is None or wk in ol_work_memo_global:
+                # Filas con ISBN distintos de la misma obra comparten la descarga de sus ediciones
+                authors_wk, eds_wk, _ = work_editions_ol(wk)
+            else:
                 authors_wk = authors_of_work_ol(wk)
-                if authors_wk: work_authors.update(authors_wk)
-                eds_wk = eds_of_work_ol(wk, authors_wk or list(work_authors))
-                if eds_wk: all_eds.extend(eds_wk)
 
-    if title_clean_general and title_clean_general != "No disponible":
-        time.sleep(PAUSE_OPENLIBRARY / 3)
+    scorer = EditionScorer([author_clean_general] if author_clean_general != "No disponible" else list(authors_wk or []), title_clean_general, stop_year)
+    if wk and eds_wk is None:
+        # Con parada anticipada lo descargado depende del año de la fila: solo se comparte si llegó completo
+        eds_wk, complete = eds_of_work_ol(wk, authors_wk, stop=scorer.is_stop_candidate)
+        if complete and eds_wk.seen: ol_work_memo_global.put(wk, (authors_wk, eds_wk, complete))
+    candidates = list(eds_wk.items) if eds_wk is not None else []
+    seen += eds_wk.seen if eds_wk is not None else 0
+
+    if title_clean_general and title_clean_general != "No disponible" and not any(map(scorer.is_stop_candidate, candidates)):
         author_hint = author_clean_general if author_clean_general != "No disponible" else ""
         eds_title = search_editions_ol(title_clean_general, author_hint)
-        if eds_title: all_eds.extend(eds_title)
+        seen += len(eds_title)
+        candidates.extend(c for c in map(edition_candidate_ol, eds_title) if c is not None)
 
-    if not all_eds:
+    if not seen:
+        # Con el circuito abierto no se sabe si el libro existe: no se da por no hallado
+        if ol_backend_global.breaker.is_open(): return CIRCUIT_OPEN_STATUS, None, None, None, None
         return "No hallado", None, None, None, None
+    return scorer.best(candidates)
+
+# --- Lectura del fichero de entrada ---
+INPUT_EXTENSIONS = ['.xlsx', '.xlsm', '.csv', '.parquet']
 
-    filter_authors = [author_clean_general] if author_clean_general != "No disponible" else list(work_authors)
-    best = {"year": -1, "title": None, "isbn": None, "author": None}
-
-    for e_data in all_eds:
-        if filter_authors and not author_ok_ol(filter_authors, e_data.get("author_list_resolved", [])): continue
-        year = y_ol(e_data.get("publish_date") or e_data.get("publish_year"))
-        if not year or year < 1700: continue
-        if year > best["year"]:
-            best["year"] = year; best["title"] = e_data.get("title"); chosen_isbn = None
-            isbns13_data = e_data.get("isbn_13", []); isbns10_data = e_data.get("isbn_10", []); isbns_cand_data = e_data.get("isbn_candidate", [])
-            if isbns13_data and isinstance(isbns13_data, list) and isbns13_data: chosen_isbn = isbns13_data[0]
-            if not chosen_isbn and isbns10_data and isinstance(isbns10_data, list) and isbns10_data: chosen_isbn = isbns10_data[0]
-            if not chosen_isbn and isbns_cand_data and isinstance(isbns_cand_data, list) and isbns_cand_data:
-                for ic in isbns_cand_data:
-                    if len(str(ic).replace("-","")) == 13: chosen_isbn = ic; break
-                if not chosen_isbn and isbns_cand_data: chosen_isbn = isbns_cand_data[0]
-            best["isbn"] = str(chosen_isbn).replace("-","") if chosen_isbn else None
-            best["author"] = ", ".join(e_data.get("author_list_resolved", []) or filter_authors or ["Desconocido"])
-
-    if best["year"] > -1:
-        return "OK", best['title'], best['author'], best['isbn'], str(best['year'])
+def _read_csv_input(path):
+    for encoding in ("utf-8-sig", "latin-1"): # Las exportaciones de los catálogos suelen venir en una de las dos
+        try:
+            with open(path, newline="", encoding=encoding) as f: sample = f.read(64 * 1024)
+            break
+        except UnicodeDecodeError:
+            continue
+    try: sep = csv.Sniffer().sniff(sample, delimiters=",;\t|").delimiter
+    except csv.Error: sep = ","
+    # Todo como texto, igual que se escribió: un ISBN con celdas vacías no pasa a float ("...567.0") ni pierde ceros iniciales
+    return pd.read_csv(path, sep=sep, encoding=encoding, dtype=str)
+
+def read_input_table(path):
+    """Lee de una sola vez la tabla de entrada: Excel (.xlsx/.xlsm), CSV o Parquet según la extensión."""
+    ext = os.path.splitext(str(path))[1].lower()
+    if ext == ".csv": return _read_csv_input(path)
+    if ext == ".parquet":
+        try: return pd.read_parquet(path)
+        except ImportError as e_parquet: raise RuntimeError(f"Para leer Parquet hace falta instalar pyarrow: {e_parquet}")
+    return pd.read_excel(path) # El motor openpyxl de pandas ya abre el libro en modo solo lectura
+
+# --- Excel de salida ---
+GREEN_FILL = PatternFill(start_color="C6EFCE", end_color="C6EFCE", fill_type="solid")
+YELLOW_FILL = PatternFill(start_color="FFEB9C", end_color="FFEB9C", fill_type="solid")
+RED_FILL = PatternFill(start_color="FFC7CE", end_color="FFC7CE", fill_type="solid")
+THICK_BORDER = Border(left=Side(style='thick'), right=Side(style='thick'), top=Side(style='thick'), bottom=Side(style='thick'))
+THIN_BORDER = Border(left=Side(style='thin'), right=Side(style='thin'), top=Side(style='thin'), bottom=Side(style='thin'))
+HEADER_FONT, HEADER_ALIGNMENT = Font(bold=True), Alignment(horizontal='center', vertical='top') # Cabecera como la de pandas
+
+def result_fill(resultado_str):
+    """Relleno de la fila según el texto de la columna Resultado (None = sin color)."""
+    resultado_str = resultado_str or ""
+    if resultado_str.startswith("Fallo"): return RED_FILL
+    if "sin versión más reciente" in resultado_str: return None
+    if resultado_str == "Éxito, ed. más actual": return GREEN_FILL
+    if resultado_str.startswith("Éxito, ed. más actual -"): return YELLOW_FILL
+    return None
+
+def _excel_value(value):
+    if value is None or (not isinstance(value, (list, tuple, dict)) and pd.isna(value)): return None
+    return value.item() if hasattr(value, "item") else value
+
+PERF_SHEET_HEADER = ["Etapa", "Llamadas", "Total (s)", "Media (ms)", "p50 (ms)", "p95 (ms)", "Máx (ms)"]
+
+def _write_perf_sheet(workbook, perf):
+    worksheet = workbook.create_sheet("Rendimiento")
+    header_cells = []
+    for name in PERF_SHEET_HEADER:
+        cell = WriteOnlyCell(worksheet, value=name)
+        cell.font, cell.alignment, cell.border = HEADER_FONT, HEADER_ALIGNMENT, THIN_BORDER
+        header_cells.append(cell)
+    worksheet.append(header_cells)
+    for row in perf.rows(): worksheet.append(list(row))
+    worksheet.append([])
+    for name, value in [("Contador", "Valor")] + list(perf.counters().items()): worksheet.append([name, value])
+
+def _write_summary_sheet(workbook, rows):
+    worksheet = workbook.create_sheet("Resumen")
+    header_cells = []
+    for name in rows[0]:
+        cell = WriteOnlyCell(worksheet, value=name)
+        cell.font, cell.alignment, cell.border = HEADER_FONT, HEADER_ALIGNMENT, THIN_BORDER
+        header_cells.append(cell)
+    worksheet.append(header_cells)
+    for row in rows[1:]: worksheet.append([_excel_value(v) for v in row])
+
+def write_results_excel(df_output, output_path, perf=None, summary=None):
+    """
+    Escribe el Excel de resultados en una sola pasada con openpyxl en modo write-only:
+    cada fila se colorea según su Resultado y la columna Resultado lleva borde grueso.
+    Con `perf` (PerfMetrics) se añade la hoja "Rendimiento" y con `summary` (filas, la primera
+    de cabecera) la hoja "Resumen".
+    """
+    workbook = openpyxl.Workbook(write_only=True)
+    worksheet = workbook.create_sheet("Sheet1")
+    columns = [str(c) for c in df_output.columns]
+    result_col_idx = columns.index('Resultado') if 'Resultado' in columns else None
+
+    header_cells = []
+    for i, name in enumerate(columns):
+        cell = WriteOnlyCell(worksheet, value=name)
+        cell.font, cell.alignment = HEADER_FONT, HEADER_ALIGNMENT
+        cell.border = THICK_BORDER if i == result_col_idx else THIN_BORDER
+        header_cells.append(cell)
+    worksheet.append(header_cells)
+
+    for values in df_output.itertuples(index=False, name=None):
+        values = [_excel_value(v) for v in values]
+        if result_col_idx is None:
+            worksheet.append(values); continue
+        fill = result_fill(values[result_col_idx] if isinstance(values[result_col_idx], str) else "")
+        row_cells = []
+        for i, value in enumerate(values):
+            if fill is None and i != result_col_idx:
+                row_cells.append(value); continue
+            cell = WriteOnlyCell(worksheet, value=value)
+            if fill is not None: cell.fill = fill
+            if i == result_col_idx: cell.border = THICK_BORDER
+            row_cells.append(cell)
+        worksheet.append(row_cells)
+
+    if perf is not None: _write_perf_sheet(workbook, perf)
+    if summary: _write_summary_sheet(workbook, summary)
+    workbook.save(output_path)
+
+# --- Procesamiento de una fila ---
+ROW_RESULT_COLS = ['Título usado para búsqueda', 'Autor usado para búsqueda', 'Título encontrado', 'Autor encontrado', 'ISBN encontrado', 'Año de edición encontrado', 'Resultado']
+TRANSIENT_STATUSES = {"Driver Error", "Timeout Resultados", "Error Inesperado", "Error HTTP", CIRCUIT_OPEN_STATUS} # No se comparten entre filas
+
+class QueryMemo:
+    """
+    Memoria de consultas de un trabajo: cada consulta única a un backend se ejecuta una sola vez
+    y su resultado se reparte entre todas las filas que la piden, aunque lleguen a la vez desde varios hilos.
+    """
+    def __init__(self):
+        self._futures = {}
+        self._lock = threading.Lock()
+        self.requested, self.executed = 0, 0
+        self.winners = {} # Búsqueda especulativa: backend ganador -> filas
+
+    def run(self, key, fn, *args):
+        with self._lock:
+            self.requested += 1
+            future = self._futures.get(key)
+            owner = future is None
+            if owner:
+                future = self._futures[key] = Future(); self.executed += 1
+        if not owner:
+            result = future.result()
+            log("  (Consulta repetida en el lote: se reutiliza su resultado)")
+            return result
+        try:
+            result = fn(*args)
+        except BaseException as e_query:
+            with self._lock: self._futures.pop(key, None)
+            future.set_exception(e_query); raise
+        future.set_result(result)
+        if isinstance(result, tuple) and result and isinstance(result[0], str) and result[0] in TRANSIENT_STATUSES:
+            with self._lock: self._futures.pop(key, None) # Las siguientes filas lo vuelven a intentar
+        return result
+
+    def record_winner(self, backend):
+        with self._lock: self.winners[backend] = self.winners.get(backend, 0) + 1
+        perf_count(f"especulativa.{backend}")
+
+    def winners_summary(self):
+        with self._lock: winners = dict(self.winners)
+        return "Búsqueda especulativa (filas 'es'): " + ", ".join(f"{backend}: {n}" for backend, n in sorted(winners.items()))
+
+    def summary(self):
+        saved = self.requested - self.executed
+        ratio = (100.0 * saved / self.requested) if self.requested else 0.0
+        return f"Deduplicación: {self.requested} consultas pedidas, {self.executed} ejecutadas ({saved} evitadas, {ratio:.1f}%)"
+
+def cultura_search_terms(row):
+    # Columnas calculadas de antemano por normalize_search_columns
+    return row['Titulo_busqueda_cultura'], row['Autor_busqueda']
+
+def ol_search_terms(row):
+    return row['Titulo_busqueda_ol'], row['Autor_busqueda']
+
+def cultura_query_key(titulo, autor):
+    return ('cultura', titulo.lower(), (autor or "").lower())
+
+def ol_query_key(isbn, titulo, autor, year=None):
+    # Con parada anticipada el resultado depende del año de la fila
+    return ('ol', isbn, titulo.lower(), (autor or "").lower(), int(year) if OL_EARLY_STOP_YEARS and pd.notna(year) else None)
+
+def plan_row_query(row):
+    """Clave normalizada de la consulta principal de una fila, o None si la fila no llegará a ningún backend."""
+    original_title_excel, idioma_excel = str(row.get('Title', '')), str(row.get('Idioma', '')).strip().lower()
+    if pd.isna(pd.to_numeric(row.get('Year_cleaned_from_input'), errors='coerce')) or not original_title_excel.strip(): return None
+    if idioma_excel == 'es':
+        titulo, autor = cultura_search_terms(row)
+        return None if "No disponible" in titulo else cultura_query_key(titulo, autor)
+    if idioma_excel == 'no-es':
+        titulo, autor = ol_search_terms(row)
+        return None if "No disponible" in titulo else ol_query_key(str(row.get('ISBN_prioritario_input', '')).strip(), titulo, autor, row.get('Year_cleaned_from_input'))
+    return None
+
+def _run_query(memo, key, fn, *args):
+    if memo is None: return fn(*args)
+    return memo.run(key, fn, *args)
+
+def _speculative_ol_query(cultura_status, ol_query):
+    """Consulta de Open Library de una fila 'es', salvo que Cultura.gob encuentre la edición en los primeros ES_SPECULATIVE_DELAY s."""
+    if ES_SPECULATIVE_DELAY > 0:
+        try:
+            if cultura_status.result(timeout=ES_SPECULATIVE_DELAY) == "OK": return None
+        except FutureTimeoutError: pass
+    return _run_query(*ol_query)
+
+def _record_winner(memo, backend):
+    if memo is not None: memo.record_winner(backend)
+    else: perf_count(f"especulativa.{backend}")
+
+def process_row(index, row, total_rows, memo=None):
+    """
+    Busca la última edición de una fila del Excel (dict columna -> valor).
+    Devuelve los valores de ROW_RESULT_COLS en ese orden. Es seguro llamarla desde varios hilos;
+    con `memo` las consultas repetidas dentro del lote se resuelven una sola vez.
+    """
+    log(f"--- Fila Excel {index+1}/{total_rows} ---")
+    original_title_excel = str(row.get('Title', ''))
+    idioma_excel, isbn_prioritario = str(row.get('Idioma', '')).strip().lower(), str(row.get('ISBN_prioritario_input', '')).strip()
+    year_input_cleaned = pd.to_numeric(row.get('Year_cleaned_from_input'), errors='coerce')
+    if pd.isna(year_input_cleaned):
+        log("  Advertencia: Falta el año en la columna 'year'. Saltando fila.")
+        log("") # Espacio en blanco
+        return ["", "", "", "", "", "", "Fallo - Input: Falta el año"]
+
+    status, res_t, res_a, res_i, res_y, final_result_message = "No procesado", "", "", "", "", "No procesado"
+    titulo_usado_para_busqueda_display, autor_usado_para_busqueda_display = "N/A", "N/A"
+
+    if not original_title_excel.strip():
+        final_result_message = "Fallo - Input: Título vacío"
+    elif idioma_excel == 'es':
+        titulo_busqueda_cultura, autor_busqueda_cultura = cultura_search_terms(row)
+        titulo_usado_para_busqueda_display, autor_usado_para_busqueda_display = titulo_busqueda_cultura, autor_busqueda_cultura or "N/A"
+        if "No disponible" in titulo_busqueda_cultura:
+            final_result_message = "Fallo - Input: Título inválido"
+        else: 
+            titulo_busqueda_ol, autor_busqueda_ol = ol_search_terms(row)
+            ol_query = (memo, ol_query_key(isbn_prioritario, titulo_busqueda_ol, autor_busqueda_ol, year_input_cleaned), best_edition_ol, isbn_prioritario, titulo_busqueda_ol, autor_busqueda_ol, int(year_input_cleaned))
+            # En modo especulativo Open Library ya está buscando mientras se consulta Cultura.gob (con su log aparte)
+            cultura_status = Future()
+            speculative = _get_ol_speculative_executor().submit(bind_job_context(_run_with_log_buffer), _speculative_ol_query, cultura_status, ol_query) if ES_SPECULATIVE_OL else None
+
+            status, res_t, res_a, res_i, res_y = _run_query(memo, cultura_query_key(titulo_busqueda_cultura, autor_busqueda_cultura), search_book_cultura, titulo_busqueda_cultura, autor_busqueda_cultura)
+            cultura_status.set_result(status)
+
+            if status == "OK" and speculative is not None:
+                # Gana Cultura.gob: si Open Library aún no ha empezado no llega a consultarse; si ya está en
+                # marcha, su resultado se descarta (queda en la memoria del lote y en la caché)
+                log("  -> Resultado de Cultura.gob; se " + ("cancela" if speculative.cancel() else "descarta") + " la búsqueda en Open Library")
+                _record_winner(memo, "Cultura.gob")
+
+            # Si la búsqueda en Cultura.gob falla, intentamos con Open Library como respaldo
+            if status != "OK":
+                titulo_usado_para_busqueda_display = titulo_busqueda_ol
+                autor_usado_para_busqueda_display = autor_busqueda_ol or "N/A"
+
+                if speculative is not None:
+                    log(f"  -> Fallo en Cultura.gob ({status}). Se usa la búsqueda en Open Library lanzada en paralelo...")
+                    (status, res_t, res_a, res_i, res_y), ol_log, _ = speculative.result()
+                    for line in ol_log: log(line)
+                    _record_winner(memo, "Open Library" if status == "OK" else "ninguno")
+                else:
+                    log(f"  -> Fallo en Cultura.gob ({status}). Intentando búsqueda de respaldo en Open Library...")
+                    status, res_t, res_a, res_i, res_y = _run_query(*ol_query)
+
+                if status == "OK":
+                    status = "OK_FALLBACK"
+    elif idioma_excel == 'no-es':
+        titulo_busqueda_ol, autor_busqueda_ol = ol_search_terms(row)
+        titulo_usado_para_busqueda_display, autor_usado_para_busqueda_display = titulo_busqueda_ol, autor_busqueda_ol or "N/A"
+        if "No disponible" in titulo_busqueda_ol:
+            final_result_message = "Fallo - Input: Título inválido"
+        else:
+            status, res_t, res_a, res_i, res_y = _run_query(memo, ol_query_key(isbn_prioritario, titulo_busqueda_ol, autor_busqueda_ol, year_input_cleaned), best_edition_ol, isbn_prioritario, titulo_busqueda_ol, autor_busqueda_ol, int(year_input_cleaned))
     else:
-        return "No hallado (s/criterio)", None, None, None, None
+        final_result_message = "Fallo - Input: Idioma Inválido"
+
+    # --- BLOQUE DE PROCESAMIENTO DE RESULTADO (CORREGIDO) ---
+    if status.startswith("OK"): # Captura "OK" y "OK_FALLBACK"
+        year_found = pd.to_numeric(res_y, errors='coerce')
+        warnings_list = []
+        title_differs = False
+
+        # Misma normalización (en caché) que la puntuación de candidatos
+        if title_similarity(res_t, row['Titulo_busqueda_ol']) < 1.0:
+             title_differs = True
+
+        if title_differs: warnings_list.append("Título difiere")
+        if autor_usado_para_busqueda_display == "N/A": warnings_list.append("Sin autor")
+        if pd.isna(year_input_cleaned): warnings_list.append("Sin año de comparación")
+
+        is_newer = pd.notna(year_found) and pd.notna(year_input_cleaned) and year_found > year_input_cleaned
+        base_message = "Éxito, ed. más actual" if is_newer else "Éxito - sin versión más reciente"
+
+        # Añade una etiqueta si el éxito vino de la búsqueda de respaldo
+        if status == "OK_FALLBACK":
+            base_message = f" {base_message}"
+
+        final_result_message = f"{base_message} - {', '.join(warnings_list)}" if warnings_list else base_message
+    elif final_result_message == "No procesado":
+        final_result_message = f"Fallo - {status}"
+
+    log(f"  Resultado fila {index+1}: {final_result_message}")
+    log("") # Línea de separación
+    return [titulo_usado_para_busqueda_display, autor_usado_para_busqueda_display, res_t, res_a, res_i, res_y, final_result_message]
+
+# --- Preparación y salida del DataFrame ---
+OUTPUT_EXTRA_COLS = ['Year_cleaned_from_input', 'ISBN_prioritario_input'] + ROW_RESULT_COLS
+ROW_TIMING_COL = 'Tiempo fila (s)' # Solo con PERF_ROW_TIMINGS
+RESULT_DATE_COL = 'Fecha de búsqueda' # Antigüedad del resultado, para el modo delta
+RESULT_ORIGIN_COL = 'Origen resultado' # Solo en modo delta: "reutilizado" o "actualizado"
+
+SEARCH_TERM_COLS = ['Titulo_busqueda_ol', 'Titulo_busqueda_cultura', 'Autor_busqueda'] # Internas, no van al Excel
+
+def normalize_search_columns(df):
+    """Términos de búsqueda de todas las filas en forma de columnas (mismo resultado que la limpieza fila a fila)."""
+    titles = df['Title'].map(str).astype(object) # Igual que str(valor) en la fila, nulos incluidos
+    # Autor: lo anterior a la primera coma
+    authors = df['Author'].map(str).astype(object).str.split(',', n=1).str[0].str.strip().where(df['Author'].notna())
+    autor = clean_author_general_column(authors)
+    df['Titulo_busqueda_ol'] = clean_title_general_column(titles)
+    df['Titulo_busqueda_cultura'] = clean_title_cultura_column(titles)
+    df['Autor_busqueda'] = autor.where(autor != "No disponible", "")
+    return df
+
+def prepare_input_frame(df):
+    """Añade al DataFrame de entrada las columnas derivadas y las de resultado vacías."""
+    if 'year' in df.columns: df['Year_cleaned_from_input'] = clean_year_column(df['year'])
+    else: df['Year_cleaned_from_input'] = pd.NA
+    for col in ['Title', 'Author', 'Idioma', 'ISBN']:
+        if col not in df.columns: df[col] = pd.NA
+    df['ISBN_prioritario_input'] = priority_isbn_column(df['ISBN'])
+    normalize_search_columns(df)
+    for col in ROW_RESULT_COLS: df[col] = ""
+    return df
+
+def output_frame(df, original_cols):
+    final_output_columns = [c for c in original_cols if c in df.columns]
+    final_output_columns.extend([c for c in OUTPUT_EXTRA_COLS if c not in final_output_columns])
+    for col in (RESULT_DATE_COL, RESULT_ORIGIN_COL, ROW_TIMING_COL):
+        if col in df.columns and col not in final_output_columns: final_output_columns.append(col)
+    return df[final_output_columns]
+
+# --- Modo delta (reutilizar un Resultados_*.xlsx anterior) ---
+def delta_row_keys(df):
+    """Clave estable de cada fila ya preparada: ISBN prioritario, título y autor limpios, año e idioma."""
+    years = pd.to_numeric(df['Year_cleaned_from_input'], errors='coerce')
+    idiomas = df['Idioma'].astype(str).str.strip().str.lower()
+    return [(str(isbn).strip(), str(titulo).lower(), str(autor).lower(), None if pd.isna(year) else int(year), idioma)
+            for isbn, titulo, autor, year, idioma in zip(df['ISBN_prioritario_input'], df['Titulo_busqueda_ol'], df['Autor_busqueda'], years, idiomas)]
+
+def _result_text(value):
+    # Al releer el Excel los años o ISBN pueden llegar como números
+    if value is None or pd.isna(value): return ""
+    if isinstance(value, float) and value.is_integer(): return str(int(value))
+    return str(value)
+
+def load_previous_results(path, max_age_days=None):
+    """
+    {clave de fila: (valores de ROW_RESULT_COLS, fecha)} de las filas con éxito y de menos de
+    `max_age_days` días de un Excel de resultados anterior. Si no tiene la columna de fecha
+    (resultados de versiones anteriores), cuenta la fecha de modificación del fichero.
+    """
+    if max_age_days is None: max_age_days = DELTA_MAX_AGE_DAYS
+    prev = read_input_table(path)
+    if 'Resultado' not in prev.columns: raise ValueError(f"'{os.path.basename(str(path))}' no es un Excel de resultados (falta la columna 'Resultado').")
+    file_date = pd.Timestamp(os.path.getmtime(path), unit='s').normalize()
+    dates = pd.to_datetime(prev[RESULT_DATE_COL], errors='coerce') if RESULT_DATE_COL in prev.columns else pd.Series(pd.NaT, index=prev.index)
+    dates = dates.fillna(file_date)
+    results = [[_result_text(v) for v in values] for values in prev.reindex(columns=ROW_RESULT_COLS).itertuples(index=False)]
+    fresh = (pd.Timestamp.now().normalize() - dates).dt.days <= max_age_days
+    keys = delta_row_keys(prepare_input_frame(prev.drop(columns=[c for c in OUTPUT_EXTRA_COLS if c in prev.columns])))
+    prior = {}
+    for key, values, date, is_fresh in zip(keys, results, dates, fresh):
+        if is_fresh and values[-1].strip().startswith("Éxito") and key not in prior:
+            prior[key] = (values, date.strftime("%Y-%m-%d"))
+    return prior
+
+# --- Diario de filas completadas ---
+def file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1024 * 1024), b""): digest.update(block)
+    return digest.hexdigest()
+
+class RowJournal:
+    """
+    Diario append-only (JSON Lines) con el resultado de cada fila completada, ligado al hash
+    del fichero de entrada. Permite reanudar tras una caída y exportar resultados parciales.
+    """
+    def __init__(self, path):
+        self.path, self._file, self._pending_sync = path, None, 0
+
+    @classmethod
+    def for_input(cls, input_path):
+        name_without_ext = os.path.splitext(os.path.basename(str(input_path)))[0]
+        return cls(os.path.join(JOURNAL_DIR, f"Journal_{name_without_ext}_{file_sha256(input_path)[:16]}.jsonl"))
+
+    def load(self):
+        """Devuelve {índice de fila: valores de ROW_RESULT_COLS} de las filas ya completadas."""
+        done = {}
+        if not os.path.exists(self.path): return done
+        with open(self.path, encoding="utf-8") as f:
+            for line in f:
+                try: entry = json.loads(line)
+                except ValueError: continue # Última línea a medio escribir si el proceso murió
+                if "row" in entry: done[entry["row"]] = [entry.get(col, "") for col in ROW_RESULT_COLS]
+        return done
+
+    def append(self, index, values):
+        if self._file is None:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            self._file = open(self.path, "a", encoding="utf-8")
+        entry = {"row": int(index), "ts": round(time.time(), 3), **dict(zip(ROW_RESULT_COLS, values))}
+        self._file.write(json.dumps(entry, ensure_ascii=False) + "\n")
+        self._file.flush()
+        self._pending_sync += 1
+        if self._pending_sync >= JOURNAL_FSYNC_EVERY:
+            os.fsync(self._file.fileno()); self._pending_sync = 0
+
+    def close(self):
+        if self._file is not None:
+            self._file.close(); self._file = None
+
+    def reset(self):
+        self.close()
+        if os.path.exists(self.path): os.remove(self.path)
+
+    remove = reset
+
+def export_partial_results(input_path, output_dir=None):
+    """
+    Genera un Excel con lo ya completado según el diario; las filas pendientes quedan marcadas.
+    Se escribe en `output_dir` (el directorio del trabajo) o, sin él, en un directorio temporal propio:
+    nunca en el directorio actual, que comparten todos los trabajos y usuarios.
+    """
+    journal = RowJournal.for_input(input_path)
+    done_rows = journal.load()
+    df = read_input_table(input_path)
+    original_cols = list(df.columns)
+    prepare_input_frame(df)
+    df['Resultado'] = "Pendiente"
+    for done_index, done_values in done_rows.items():
+        if done_index in df.index: df.loc[done_index, ROW_RESULT_COLS] = done_values
+    name_without_ext = os.path.splitext(os.path.basename(str(input_path)))[0]
+    output_path = os.path.join(output_dir or tempfile.mkdtemp(prefix="buscador_"), f"Parcial_{name_without_ext}.xlsx")
+    write_results_excel(output_frame(df, original_cols), output_path)
+    return output_path, len(done_rows), len(df)
 
 # --- Función Principal de Procesamiento (MODIFICADA A GENERADOR) ---
-def process_excel_generator(file_path_or_obj):
-    global driver_cultura_global, cultura_cookies_accepted_global
+def _get_row_executor(idioma, workers):
+    with _lazy_init_lock:
+        if idioma not in row_executors_global:
+            row_executors_global[idioma] = FairExecutor(workers, f"filas-{idioma}")
+        return row_executors_global[idioma]
+
+def process_excel_generator(file_path_or_obj, job_log=None, resume=True, output_dir=None, progress=None, previous_results=None):
+    """
+    Procesa el Excel y va devolviendo el texto del log para la interfaz (limitado y con refresco
+    espaciado); al final devuelve (ruta_excel_resultados, texto_log). El log completo queda en job_log.
+    Con resume=True se saltan las filas que ya constan en el diario de un intento anterior del mismo fichero.
+    Los resultados se escriben en `output_dir` (por defecto el directorio actual) y progress(hechas, total)
+    se llama tras cada fila. Las filas se reparten en los hilos compartidos con los demás trabajos.
+    Con `previous_results` (un Resultados_*.xlsx anterior) solo se buscan las filas nuevas, cambiadas,
+    fallidas o caducadas; las demás reutilizan el resultado anterior (modo delta).
+    """
+    global cultura_driver_pool_global
+    if job_log is None: job_log = JobLog()
+    perf = PerfMetrics() if PERF_METRICS else None
+    previous_context = _job_context(); _set_job_context(perf, job_log)
+    job_key = object() # Identifica las tareas de este trabajo en los ejecutores compartidos
 
     try:
-        log("=======================================\nInicio del procesamiento del archivo Excel.\n=======================================")
-        yield "\n".join(log_messages)
+        job_log.write("=======================================\nInicio del procesamiento del archivo Excel.\n=======================================")
+        yield job_log.text()
 
+        job_log.write("Cargando archivo de entrada...")
         try:
-            df_peek = pd.read_excel(file_path_or_obj, nrows=None)
-        except Exception as e_peek:
-            log(f"Error Crítico al intentar leer el Excel: {e_peek}")
-            yield "\n".join(log_messages)
+            with perf_stage("entrada.lectura"): df = read_input_table(file_path_or_obj)
+        except Exception as e_read:
+            job_log.write(f"Error Crítico al intentar leer el archivo: {e_read}")
+            yield job_log.text()
             return
+        job_log.write(f"Archivo cargado. {len(df)} filas.")
+        yield job_log.text()
 
         # --- Inicialización del Driver (si es necesario) ---
-        if 'Idioma' in df_peek.columns and 'es' in df_peek['Idioma'].astype(str).str.lower().unique():
-            if not driver_cultura_global:
-                log("Inicializando driver de Selenium para Cultura.gob...")
-                yield "\n".join(log_messages)
-                try:
-                    chrome_options = Options(); chrome_options.add_argument("--headless"); chrome_options.add_argument("--no-sandbox"); chrome_options.add_argument("--disable-dev-shm-usage"); chrome_options.add_argument("--window-size=1920,1080"); chrome_options.add_argument("--disable-gpu"); chrome_options.add_argument("--log-level=3")
-                    driver_cultura_global = _init_cultura_driver_for_spaces()
-                    cultura_cookies_accepted_global = False
-                    log("Driver de Cultura.gob inicializado.")
-                    yield "\n".join(log_messages)
-                except Exception as e_driver_init:
-                    log(f"CRITICAL: No se pudo inicializar el driver de Cultura.gob: {e_driver_init}")
-                    driver_cultura_global = None
-                    yield "\n".join(log_messages)
+        needs_cultura = 'Idioma' in df.columns and 'es' in df['Idioma'].astype(str).str.lower().unique()
+        if needs_cultura and CULTURA_BACKEND == "auto":
+            with _cultura_pool_lock:
+                if not cultura_driver_pool_global:
+                    # Los navegadores solo se arrancan si el cliente HTTP falla
+                    cultura_driver_pool_global = CulturaDriverPool(CULTURA_POOL_SIZE, CULTURA_DRIVER_MAX_SEARCHES)
+            job_log.write("Cultura.gob se consultará por HTTP; Selenium queda como respaldo.")
+            yield job_log.text()
+        elif needs_cultura and CULTURA_BACKEND == "http":
+            job_log.write("Cultura.gob se consultará solo por HTTP (sin Selenium).")
+            yield job_log.text()
+        elif needs_cultura:
+            # Sin yield dentro del cerrojo: un consumidor lento de este generador bloquearía a los demás trabajos
+            with _cultura_pool_lock:
+                if not cultura_driver_pool_global:
+                    job_log.write(f"Inicializando pool de {CULTURA_POOL_SIZE} driver(s) de Selenium para Cultura.gob...")
+                    pool = CulturaDriverPool(CULTURA_POOL_SIZE, CULTURA_DRIVER_MAX_SEARCHES)
+                    try:
+                        started = pool.prewarm()
+                        cultura_driver_pool_global = pool
+                        job_log.write(f"Pool de Cultura.gob inicializado ({started} driver(s) listos).")
+                    except Exception as e_driver_init:
+                        job_log.write(f"CRITICAL: No se pudo inicializar el driver de Cultura.gob: {e_driver_init}")
+            yield job_log.text()
         else:
-            log("No hay libros en 'es' o 'Idioma' no presente, no se inicializa driver para Cultura.gob.")
-            yield "\n".join(log_messages)
+            job_log.write("No hay libros en 'es' o 'Idioma' no presente, no se inicializa driver para Cultura.gob.")
+            yield job_log.text()
 
-        log("Cargando archivo Excel...")
-        df = pd.read_excel(file_path_or_obj)
-        log(f"Archivo cargado. {len(df)} filas. Preparando búsqueda, espere unos segundos...")
-        yield "\n".join(log_messages)
+        job_log.write("Preparando búsqueda, espere unos segundos...")
+        yield job_log.text()
         original_excel_cols = list(df.columns)
         # Extraer el nombre del archivo original sin la ruta y la extensión
         base_name = os.path.basename(file_path_or_obj)
         name_without_ext = os.path.splitext(base_name)[0]
         # Crear el nuevo nombre para el archivo de salida
-        output_file_name = f"Resultados_{name_without_ext}.xlsx"
+        output_file_name = os.path.join(output_dir or "", f"Resultados_{name_without_ext}.xlsx")
 
         # --- Preparación del DataFrame ---
-        if 'year' in df.columns: df['Year_cleaned_from_input'] = df['year'].apply(lambda x: clean_year_value(str(x) if pd.notnull(x) else None))
-        else: df['Year_cleaned_from_input'] = pd.NA
-        for col in ['Title', 'Author', 'Idioma', 'ISBN']:
-            if col not in df.columns: df[col] = pd.NA
-        df['ISBN_prioritario_input'] = df['ISBN'].apply(lambda x: select_priority_isbn(str(x) if pd.notnull(x) else None))
-        res_cols = ['Título encontrado', 'Autor encontrado', 'ISBN encontrado', 'Año de edición encontrado']
-        search_terms_cols = ['Título usado para búsqueda', 'Autor usado para búsqueda']
-        for col in res_cols + search_terms_cols + ['Resultado']: df[col] = ""
+        with perf_stage("entrada.preparacion"): prepare_input_frame(df)
+        if PERF_ROW_TIMINGS: df[ROW_TIMING_COL] = None
+
+        # --- Diario de filas (reanudación) ---
+        journal = RowJournal.for_input(file_path_or_obj)
+        done_rows = journal.load() if resume else {}
+        if not resume: journal.reset()
+        if done_rows:
+            job_log.write(f"Reanudando un procesamiento interrumpido: {len(done_rows)} filas ya estaban completadas.")
+            for done_index, done_values in done_rows.items():
+                if done_index in df.index: df.loc[done_index, ROW_RESULT_COLS] = done_values
+            yield job_log.text()
+
+        # --- Modo delta ---
+        df[RESULT_DATE_COL] = pd.Timestamp.now().strftime("%Y-%m-%d")
+        if previous_results:
+            try:
+                with perf_stage("entrada.delta"): prior = load_previous_results(previous_results)
+            except Exception as e_prev:
+                prior = None
+                job_log.write(f"No se pudieron leer los resultados anteriores ({e_prev}); se buscan todas las filas.")
+            if prior is not None:
+                df[RESULT_ORIGIN_COL] = "actualizado"
+                reused = {index: prior[key] for index, key in zip(df.index, delta_row_keys(df)) if index not in done_rows and key in prior}
+                if reused:
+                    # Asignación en bloque: en un catálogo casi sin cambios son casi todas las filas
+                    df.loc[list(reused), ROW_RESULT_COLS] = [values for values, _ in reused.values()]
+                    df.loc[list(reused), RESULT_DATE_COL] = [date for _, date in reused.values()]
+                    df.loc[list(reused), RESULT_ORIGIN_COL] = "reutilizado"
+                    done_rows.update((index, values) for index, (values, _) in reused.items())
+                job_log.write(f"Modo delta: {len(reused)} filas reutilizadas de {os.path.basename(str(previous_results))}; "
+                              f"{len(df) - len(done_rows)} se buscan (nuevas, cambiadas, fallidas o de más de {DELTA_MAX_AGE_DAYS:g} días).")
+            yield job_log.text()
 
 # --- Bucle Principal de Procesamiento ---
-        for index, row in df.iterrows():
-            log(f"--- Fila Excel {index+1}/{len(df)} ---")
-            original_title_excel, raw_author_excel = str(row.get('Title', '')), row.get('Author')
-            idioma_excel, isbn_prioritario = str(row.get('Idioma', '')).strip().lower(), str(row.get('ISBN_prioritario_input', '')).strip()
-            year_input_cleaned = pd.to_numeric(row.get('Year_cleaned_from_input'), errors='coerce')
-            if pd.isna(year_input_cleaned):
-                log("  Advertencia: Falta el año en la columna 'year'. Saltando fila.")
-                log("") # Espacio en blanco
-                df.at[index, 'Resultado'] = "Fallo - Input: Falta el año"
-                yield "\n".join(log_messages)
-                continue # Salta al siguiente libro del bucle
-            author_post_comma = str(raw_author_excel).split(',', 1)[0].strip() if pd.notna(raw_author_excel) and ',' in str(raw_author_excel) else (str(raw_author_excel).strip() if pd.notna(raw_author_excel) else None)
-
-            status, res_t, res_a, res_i, res_y, final_result_message = "No procesado", "", "", "", "", "No procesado"
-            titulo_usado_para_busqueda_display, autor_usado_para_busqueda_display = "N/A", "N/A"
-
-            if not original_title_excel.strip():
-                final_result_message = "Fallo - Input: Título vacío"
-            elif idioma_excel == 'es':
-                titulo_busqueda_cultura = clean_title_for_cultura_gob_search(original_title_excel)
-                _, autor_busqueda_cultura_temp = clean_title_and_author_general(pd.Series({'Title': '', 'Author': author_post_comma}))
-                autor_busqueda_cultura = "" if autor_busqueda_cultura_temp in ["No disponible", "Error Limpieza"] else autor_busqueda_cultura_temp
-                titulo_usado_para_busqueda_display, autor_usado_para_busqueda_display = titulo_busqueda_cultura, autor_busqueda_cultura or "N/A"
-                if "No disponible" in titulo_busqueda_cultura:
-                    final_result_message = "Fallo - Input: Título inválido"
-                else: 
-                    status, res_t, res_a, res_i, res_y = search_book_cultura_gob(driver_cultura_global, titulo_busqueda_cultura, autor_busqueda_cultura, cultura_cookies_accepted_global)
-                    
-                    # Si la búsqueda en Cultura.gob falla, intentamos con Open Library como respaldo
-                    if status != "OK":
-                        log(f"  -> Fallo en Cultura.gob ({status}). Intentando búsqueda de respaldo en Open Library...")
-                        yield "\n".join(log_messages)
-                        
-                        titulo_busqueda_ol, autor_busqueda_ol_temp = clean_title_and_author_general(pd.Series({'Title': original_title_excel, 'Author': author_post_comma}))
-                        autor_busqueda_ol = "" if autor_busqueda_ol_temp in ["No disponible", "Error Limpieza"] else autor_busqueda_ol_temp
-                        
-                        titulo_usado_para_busqueda_display = titulo_busqueda_ol
-                        autor_usado_para_busqueda_display = autor_busqueda_ol or "N/A"
-
-                        status, res_t, res_a, res_i, res_y = best_edition_ol(isbn_prioritario, titulo_busqueda_ol, autor_busqueda_ol)
-                        time.sleep(PAUSE_OPENLIBRARY)
-
-                        if status == "OK":
-                            status = "OK_FALLBACK"
-            elif idioma_excel == 'no-es':
-                titulo_busqueda_ol, autor_busqueda_ol_temp = clean_title_and_author_general(pd.Series({'Title': original_title_excel, 'Author': author_post_comma}))
-                autor_busqueda_ol = "" if autor_busqueda_ol_temp in ["No disponible", "Error Limpieza"] else autor_busqueda_ol_temp
-                titulo_usado_para_busqueda_display, autor_usado_para_busqueda_display = titulo_busqueda_ol, autor_busqueda_ol or "N/A"
-                if "No disponible" in titulo_busqueda_ol:
-                    final_result_message = "Fallo - Input: Título inválido"
-                else:
-                    status, res_t, res_a, res_i, res_y = best_edition_ol(isbn_prioritario, titulo_busqueda_ol, autor_busqueda_ol)
-                time.sleep(PAUSE_OPENLIBRARY)
-            else:
-                final_result_message = "Fallo - Input: Idioma Inválido"
-
-            # --- BLOQUE DE PROCESAMIENTO DE RESULTADO (CORREGIDO) ---
-            if status.startswith("OK"): # Captura "OK" y "OK_FALLBACK"
-                year_found = pd.to_numeric(res_y, errors='coerce')
-                warnings_list = []
-                title_differs = False
-                
-                # Lógica de comparación de títulos unificada
-                clean_found_title, _ = clean_title_and_author_general(pd.Series({'Title': res_t, 'Author': ''}))
-                clean_search_title, _ = clean_title_and_author_general(pd.Series({'Title': original_title_excel, 'Author': ''}))
-                if clean_found_title != clean_search_title.lower():
-                     title_differs = True
-
-                if title_differs: warnings_list.append("Título difiere")
-                if autor_usado_para_busqueda_display == "N/A": warnings_list.append("Sin autor")
-                if pd.isna(year_input_cleaned): warnings_list.append("Sin año de comparación")
-                
-                is_newer = pd.notna(year_found) and pd.notna(year_input_cleaned) and year_found > year_input_cleaned
-                base_message = "Éxito, ed. más actual" if is_newer else "Éxito - sin versión más reciente"
-                
-                # Añade una etiqueta si el éxito vino de la búsqueda de respaldo
-                if status == "OK_FALLBACK":
-                    base_message = f" {base_message}"
-
-                final_result_message = f"{base_message} - {', '.join(warnings_list)}" if warnings_list else base_message
-            elif final_result_message == "No procesado":
-                final_result_message = f"Fallo - {status}"
-
-            df.loc[index, ['Título usado para búsqueda', 'Autor usado para búsqueda', 'Título encontrado', 'Autor encontrado', 'ISBN encontrado', 'Año de edición encontrado', 'Resultado']] = \
-            [titulo_usado_para_busqueda_display, autor_usado_para_busqueda_display, res_t, res_a, res_i, res_y, final_result_message]
-            log(f"  Resultado fila {index+1}: {final_result_message}")
-            log("") # Línea de separación
-            yield "\n".join(log_messages)
-
-        log("=======================================\nProcesamiento de filas completado.\n=======================================")
-        yield "\n".join(log_messages)
+        # Las filas se adelantan en dos carriles de hilos: 'no-es' (limitado por el cubo de fichas de OL)
+        # y 'es' (tantos hilos como drivers en el pool, o CULTURA_HTTP_WORKERS si se busca por HTTP).
+        # El resto se procesa en este hilo.
+        # Resultados y log se vuelcan siempre en el orden del Excel.
+        records = df.to_dict('index')
+        total_rows = len(records)
+        idioma_por_fila = {i: str(r.get('Idioma', '')).strip().lower() for i, r in records.items() if i not in done_rows}
+
+        # Planificación: consultas únicas del lote (las repetidas se resuelven una vez y se reparten)
+        planned_keys = [k for k in (plan_row_query(records[i]) for i in idioma_por_fila) if k is not None]
+        if planned_keys:
+            unique_keys = len(set(planned_keys))
+            job_log.write(f"Planificación: {len(planned_keys)} filas con búsqueda, {unique_keys} consultas únicas "
+                          f"({100.0 * (len(planned_keys) - unique_keys) / len(planned_keys):.1f}% menos).")
+        memo = QueryMemo()
+
+        # ISBN del archivo resueltos a obras de Open Library por lotes, antes de procesar las filas
+        isbns = {str(records[i].get('ISBN_prioritario_input', '')).strip() for i in idioma_por_fila if idioma_por_fila[i] in ('es', 'no-es')}
+        isbns.discard("")
+        if isbns and not _get_ol_local_index(): # Con el índice local cada ISBN es una consulta SQLite
+            with perf_stage("ol.prefetch_isbn"): job_log.write(prefetch_isbn_works_ol(isbns))
+            yield job_log.text()
+        lanes = [] # (executor, iterador de índices, ventana, futuros pendientes)
+        cultura_workers = CULTURA_POOL_SIZE if CULTURA_BACKEND == "selenium" else CULTURA_HTTP_WORKERS
+        for idioma, workers in [('no-es', OL_MAX_WORKERS), ('es', cultura_workers)]:
+            lane_indices = [i for i, idm in idioma_por_fila.items() if idm == idioma]
+            if lane_indices:
+                lanes.append((_get_row_executor(idioma, workers), iter(lane_indices), workers * OL_PREFETCH_FACTOR, {}))
+        index_done = len(done_rows)
+        if progress: progress(index_done, total_rows)
+        try:
+            for index, row in records.items():
+                if index in done_rows: continue
+                future = None
+                for executor, lane_indices, window, pending in lanes:
+                    while len(pending) < window:
+                        next_index = next(lane_indices, None)
+                        if next_index is None: break
+                        pending[next_index] = executor.submit(job_key, _run_with_log_buffer, process_row, next_index, records[next_index], total_rows, memo)
+                    if index in pending: future = pending.pop(index)
+                row_values, row_log, row_seconds = future.result() if future is not None else _run_with_log_buffer(process_row, index, row, total_rows, memo)
+                job_log.extend(row_log)
+                df.loc[index, ROW_RESULT_COLS] = row_values
+                if perf is not None: perf.add("fila", row_seconds)
+                if PERF_ROW_TIMINGS: df.at[index, ROW_TIMING_COL] = round(row_seconds, 3)
+                journal.append(index, row_values)
+                index_done += 1
+                if progress: progress(index_done, total_rows)
+                if job_log.due(): yield job_log.text()
+        finally:
+            for executor, _, _, _ in lanes: executor.cancel_job(job_key)
+            journal.close()
+
+        job_log.write("=======================================\nProcesamiento de filas completado.\n=======================================")
+        job_log.write(memo.summary())
+        if memo.winners: job_log.write(memo.winners_summary())
+        job_log.write(ol_author_memo_global.summary())
+        job_log.write(ol_work_memo_global.summary())
+        job_log.write(ol_isbn_memo_global.summary())
+        if _get_ol_cache(): job_log.write(_get_ol_cache().summary())
+        for backend in (ol_backend_global, cultura_http_backend_global, cultura_selenium_backend_global):
+            if backend.retries or backend.breaker.trips or backend.breaker.rejected or (backend.rate and backend.rate.decreases): job_log.write(backend.summary())
+        yield job_log.text()
 
         # --- Creación y formato del archivo Excel de salida ---
-        final_output_columns = [c for c in original_excel_cols if c in df.columns]
-        extra_cols = ['Year_cleaned_from_input', 'ISBN_prioritario_input', 'Título usado para búsqueda', 'Autor usado para búsqueda', 'Título encontrado', 'Autor encontrado', 'ISBN encontrado', 'Año de edición encontrado', 'Resultado']
-        final_output_columns.extend([c for c in extra_cols if c not in final_output_columns])
-        df_output_final = df[final_output_columns]
-
-        # -- Bloque de guardado y formato con la indentación corregida --
-
-        # Guardar el DataFrame inicial en el archivo con el nuevo nombre
-        df_output_final.to_excel(output_file_name, index=False, engine='openpyxl')
-
-        # Cargar el archivo recién guardado para aplicarle estilos
-        workbook = openpyxl.load_workbook(output_file_name)
-        worksheet = workbook.active
-
-        # Definición de estilos
-        green_fill = PatternFill(start_color="C6EFCE", end_color="C6EFCE", fill_type="solid")
-        yellow_fill = PatternFill(start_color="FFEB9C", end_color="FFEB9C", fill_type="solid")
-        red_fill = PatternFill(start_color="FFC7CE", end_color="FFC7CE", fill_type="solid")
-        thick_border = Border(left=Side(style='thick'), right=Side(style='thick'), top=Side(style='thick'), bottom=Side(style='thick'))
-
-        # Localizar la columna de Resultado
-        header = {cell.value: i+1 for i, cell in enumerate(worksheet[1])}
-        result_col_idx = header.get('Resultado')
-
-        # Aplicar estilos fila por fila
-        if result_col_idx:
-            for row_idx in range(2, worksheet.max_row + 1):
-                cell = worksheet.cell(row=row_idx, column=result_col_idx)
-                resultado_str = cell.value or ""
-                fill_to_apply = None
-
-                if resultado_str.startswith("Fallo"):
-                    fill_to_apply = red_fill
-                elif "sin versión más reciente" in resultado_str:
-                    fill_to_apply = None
-                elif resultado_str == "Éxito, ed. más actual":
-                    fill_to_apply = green_fill
-                elif resultado_str.startswith("Éxito, ed. más actual -"):
-                    fill_to_apply = yellow_fill
-
-                if fill_to_apply:
-                    for c in worksheet[row_idx]:
-                        c.fill = fill_to_apply
-
-            # Aplicar borde a toda la columna de Resultado
-            for row in worksheet.iter_rows(min_col=result_col_idx, max_col=result_col_idx, min_row=1):
-                for cell in row:
-                    cell.border = thick_border
-
-        # Guardar los cambios de estilo en el mismo archivo
-        workbook.save(output_file_name)
-
-        log(f"Archivo Excel generado con los resultados: {output_file_name}")
-        yield (output_file_name, "\n".join(log_messages))
+        # Datos y estilos se escriben en una sola pasada (modo write-only, memoria constante)
+        with perf_stage("salida.excel"): write_results_excel(output_frame(df, original_excel_cols), output_file_name, perf)
+        journal.remove() # El diario solo hace falta mientras el resultado no está completo
+        if perf is not None:
+            perf_file_name = os.path.join(output_dir or "", f"Rendimiento_{name_without_ext}.json")
+            perf.write_json(perf_file_name) # "salida.excel" ya consta en el JSON, no en la hoja escrita antes
+            job_log.write(f"Métricas de rendimiento en la hoja 'Rendimiento' y en {perf_file_name}")
+
+        job_log.write(f"Archivo Excel generado con los resultados: {output_file_name}")
+        yield (output_file_name, job_log.text())
 
     except Exception as e:
-        log(f"Error CRÍTICO general: {str(e)}\n{traceback.format_exc()}")
-        yield (None, "\n".join(log_messages))
+        job_log.write(f"Error CRÍTICO general: {str(e)}\n{traceback.format_exc()}")
+        yield (None, job_log.text())
+    finally:
+        _set_job_context(*previous_context)
+
+JOB_QUEUED, JOB_RUNNING, JOB_DONE, JOB_FAILED = "en cola", "procesando", "completado", "error"
+
+class Job:
+    """Un procesamiento lanzado desde la interfaz, con su propio directorio, log, métricas y progreso."""
+    def __init__(self, input_path, input_hash, resume, output_dir=None, previous_results=None):
+        self.id = hashlib.sha256(f"{input_hash}{time.time()}{random.random()}".encode()).hexdigest()[:12]
+        self.input_path, self.input_hash, self.resume, self.previous_results = input_path, input_hash, resume, previous_results
+        self.status, self.done, self.total = JOB_QUEUED, 0, 0
+        self.output_path, self.log_text = None, ""
+        self.workdir = output_dir or tempfile.mkdtemp(prefix="buscador_")
+        self._owns_workdir = output_dir is None # El directorio temporal se borra al salir del historial
+        self.key = None # Fichero y opciones, para no lanzar dos veces el mismo trabajo (lo asigna JobScheduler)
+        name_without_ext = os.path.splitext(os.path.basename(input_path))[0]
+        self.log = JobLog(os.path.join(self.workdir, f"Log_{name_without_ext}.txt"))
+        self._version = 0
+        self._cond = threading.Condition()
+
+    @property
+    def active(self):
+        return self.status in (JOB_QUEUED, JOB_RUNNING)
+
+    def _publish(self, **changes):
+        with self._cond:
+            for attr, value in changes.items(): setattr(self, attr, value)
+            self._version += 1
+            self._cond.notify_all()
+
+    def wait_update(self, version, min_interval):
+        """
+        Espera a que el trabajo cambie respecto a `version` y devuelve la versión actual. Los cambios
+        se agrupan en intervalos de `min_interval` segundos, salvo el final del trabajo, que es inmediato.
+        """
+        with self._cond:
+            self._cond.wait_for(lambda: not self.active, min_interval)
+            self._cond.wait_for(lambda: self._version != version or not self.active)
+            return self._version
+
+    def status_text(self):
+        progress = f" ({self.done}/{self.total} filas)" if self.total else ""
+        return f"Trabajo {self.id}: {self.status}{progress}"
+
+    def run(self):
+        self._publish(status=JOB_RUNNING)
+        try:
+            for update in process_excel_generator(self.input_path, self.log, resume=self.resume, output_dir=self.workdir,
+                                                  progress=lambda done, total: self._publish(done=done, total=total),
+                                                  previous_results=self.previous_results):
+                if isinstance(update, tuple): self._publish(output_path=update[0], log_text=update[1])
+                else: self._publish(log_text=update)
+        finally:
+            self.log.close()
+            self._publish(status=JOB_DONE if self.output_path else JOB_FAILED)
 
-# --- Interfaz Gradio ---
-with gr.Blocks(theme=gr.themes.Soft()) as demo:
-    gr.Markdown("# Buscador de Últimas Ediciones de Libros")
-    gr.Markdown(
-        "**Pasos:**\n"
-        "1.  Sube tu archivo Excel con las columnas requeridas.\n"
-        "2.  Presiona el botón 'Procesar Archivo Excel'. El programa buscará los libros españoles en la base de datos del ISBN (Ministerio de Cultura) y los extranjeros en la API de Open Library\n"
-        "3.  Descarga el archivo generado con los resultados.\n\n"
-        "**Columnas Requeridas:** `Title`, `year`, `Idioma` (`es` o `no-es`). **Muy recomendables:** `ISBN`, `Author`.\n\n"
-        "**Colores de Salida en el Excel:**\n"
-        "- **Verde**: Éxito total. Se encontró una edición más nueva sin problemas.\n"
-        "- **Amarillo**: Éxito con problemas (ej. el título difiere, sin autor, etc.).\n"
-        "- **Rojo**: Fallo. La búsqueda no se pudo completar o hubo un error de input.\n"
-        "- **Sin Color**: Búsqueda correcta, pero la edición encontrada es igual o anterior a la proporcionada."
-    )
-
-    with gr.Row():
-        excel_input = gr.File(label="Sube tu archivo Excel (.xlsx)", type="filepath", file_types=['.xlsx'])
-        processed_file_output = gr.File(label="Descarga el archivo procesado")
-
-    log_output = gr.Textbox(label="Log del Proceso", interactive=False, lines=15, max_lines=30, autoscroll=True)
-    submit_button = gr.Button("Procesar Archivo Excel")
-
-    def gradio_excel_processing_interface(gradio_file_object):
-        global log_messages
-        log_messages = []
-
-        if gradio_file_object is None:
-            yield None, "Por favor, sube un archivo Excel."
-            return
+    def discard(self):
+        """Borra el directorio temporal de un trabajo terminado (resultados y log incluidos)."""
+        if self._owns_workdir: shutil.rmtree(self.workdir, ignore_errors=True)
 
-        for update in process_excel_generator(gradio_file_object.name):
-            if isinstance(update, tuple):
-                file_path, log_text = update
-                yield file_path, log_text
-            else:
-                log_text = update
-                yield None, log_text
 
-    submit_button.click(gradio_excel_processing_interface, inputs=excel_input, outputs=[processed_file_output, log_output])
+class JobScheduler:
+    """
+    Trabajos de varios usuarios a la vez. Cada uno corre en su propio hilo (como mucho
+    JOB_MAX_RUNNING simultáneos) y sus filas se reparten por turnos en los hilos compartidos.
+    Subir otra vez un fichero que ya se está procesando, con las mismas opciones, devuelve el trabajo existente;
+    con otras opciones, el nuevo espera a que termine el anterior (comparten el diario de filas).
+    Los trabajos terminados que salen del historial se borran del disco.
+    """
+    def __init__(self, max_running=JOB_MAX_RUNNING, history=JOB_HISTORY):
+        self._slots = threading.Semaphore(max_running)
+        self._jobs = OrderedDict() # id -> Job, los más antiguos primero
+        self._input_locks = {} # hash de la entrada -> [cerrojo, trabajos pendientes con esa entrada]
+        self._lock = threading.Lock()
+        self.history = history
+
+    def submit(self, input_path, resume=True, output_dir=None, previous_results=None):
+        input_hash = file_sha256(input_path)
+        key = (input_hash, bool(resume), output_dir, file_sha256(previous_results) if previous_results else None)
+        with self._lock:
+            for job in self._jobs.values():
+                if job.active and job.key == key: return job
+            job = Job(input_path, input_hash, resume, output_dir, previous_results)
+            job.key = key
+            self._jobs[job.id] = job
+            self._input_locks.setdefault(input_hash, [threading.Lock(), 0])[1] += 1
+            finished = [j.id for j in self._jobs.values() if not j.active]
+            evicted = [self._jobs.pop(job_id) for job_id in finished[:max(0, len(self._jobs) - self.history)]]
+        for old_job in evicted: old_job.discard()
+        threading.Thread(target=self._run, args=(job,), name=f"trabajo-{job.id}", daemon=True).start()
+        return job
+
+    def _run(self, job):
+        with self._lock: input_lock = self._input_locks[job.input_hash][0]
+        try:
+            # Uno tras otro con la misma entrada: uno con resume=False borraría el diario en el que escribe el otro.
+            # El turno de la entrada se toma antes que el hueco, así el que espera no ocupa uno
+            with input_lock, self._slots:
+                try: job.run()
+                except Exception as e: log(f"Error en el trabajo {job.id}: {e}")
+        finally:
+            with self._lock:
+                entry = self._input_locks[job.input_hash]
+                entry[1] -= 1
+                if not entry[1]: del self._input_locks[job.input_hash]
+
+    def get(self, job_id):
+        with self._lock: return self._jobs.get(str(job_id or "").strip())
+
+    def latest_for(self, input_path):
+        """Último trabajo lanzado con el mismo fichero de entrada (por contenido), o None."""
+        input_hash = file_sha256(input_path)
+        with self._lock: return next((job for job in reversed(self._jobs.values()) if job.input_hash == input_hash), None)
+
+    def jobs(self):
+        with self._lock: return list(self._jobs.values())
+
+job_scheduler_global = JobScheduler()
+
+# --- Interfaz Gradio ---
+def build_demo():
+    """Construye la interfaz. Gradio solo se importa aquí, así el modo por lotes (main) no lo necesita."""
+    import gradio as gr
+    with gr.Blocks(theme=gr.themes.Soft()) as demo:
+        gr.Markdown("# Buscador de Últimas Ediciones de Libros")
+        gr.Markdown(
+            "**Pasos:**\n"
+            "1.  Sube tu archivo Excel (o CSV / Parquet) con las columnas requeridas.\n"
+            "2.  Presiona el botón 'Procesar Archivo Excel'. El programa buscará los libros españoles en la base de datos del ISBN (Ministerio de Cultura) y los extranjeros en la API de Open Library\n"
+            "3.  Descarga el archivo generado con los resultados.\n\n"
+            "**Columnas Requeridas:** `Title`, `year`, `Idioma` (`es` o `no-es`). **Muy recomendables:** `ISBN`, `Author`.\n\n"
+            "**Colores de Salida en el Excel:**\n"
+            "- **Verde**: Éxito total. Se encontró una edición más nueva sin problemas.\n"
+            "- **Amarillo**: Éxito con problemas (ej. el título difiere, sin autor, etc.).\n"
+            "- **Rojo**: Fallo. La búsqueda no se pudo completar o hubo un error de input.\n"
+            "- **Sin Color**: Búsqueda correcta, pero la edición encontrada es igual o anterior a la proporcionada."
+        )
+
+        with gr.Row():
+            excel_input = gr.File(label="Sube tu archivo Excel (.xlsx), CSV o Parquet", type="filepath", file_types=INPUT_EXTENSIONS)
+            previous_input = gr.File(label="Resultados anteriores (opcional): solo se buscan las filas nuevas, cambiadas o fallidas", type="filepath", file_types=[".xlsx"])
+            processed_file_output = gr.File(label="Descarga el archivo procesado")
+            log_file_output = gr.File(label="Descarga el log completo")
+
+        log_output = gr.Textbox(label="Log del Proceso", interactive=False, lines=15, max_lines=30, autoscroll=True)
+        resume_checkbox = gr.Checkbox(label="Reanudar si el mismo archivo quedó a medias", value=True)
+        with gr.Row():
+            submit_button = gr.Button("Procesar Archivo Excel")
+            partial_button = gr.Button("Descargar resultados parciales")
+        with gr.Row():
+            job_id_input = gr.Textbox(label="Id del trabajo (para consultarlo más tarde)", max_lines=1)
+            job_status_button = gr.Button("Consultar trabajo")
+
+        def _job_outputs(job):
+            finished = not job.active
+            return (job.output_path if finished else None, f"{job.status_text()}\n{job.log_text}",
+                    job.log.path if finished else None, job.id)
+
+        def gradio_excel_processing_interface(gradio_file_object, resume, previous_file_object=None):
+            if gradio_file_object is None:
+                yield None, "Por favor, sube un archivo Excel.", None, ""
+                return
+
+            # El trabajo corre en su propio hilo: si el navegador se desconecta sigue adelante y se puede consultar por id
+            previous_results = previous_file_object.name if previous_file_object is not None else None
+            job = job_scheduler_global.submit(gradio_file_object.name, resume=resume, previous_results=previous_results)
+            version = -1
+            while True:
+                version = job.wait_update(version, LOG_UI_MIN_INTERVAL)
+                yield _job_outputs(job)
+                if not job.active: break
+
+        def gradio_job_status_interface(job_id):
+            job = job_scheduler_global.get(job_id)
+            if job is None:
+                return None, f"No hay ningún trabajo con id '{job_id}'.", None, job_id
+            return _job_outputs(job)
+
+        def gradio_partial_results_interface(gradio_file_object):
+            if gradio_file_object is None:
+                return None, "Por favor, sube un archivo Excel."
+            try:
+                # En el directorio del trabajo de ese fichero: dos ficheros con el mismo nombre no se pisan la descarga
+                job = job_scheduler_global.latest_for(gradio_file_object.name)
+                output_file_name, done, total = export_partial_results(gradio_file_object.name, job.workdir if job else None)
+                return output_file_name, f"Resultados parciales: {done}/{total} filas completadas ({output_file_name})."
+            except Exception as e_partial:
+                return None, f"No se pudieron generar los resultados parciales: {e_partial}"
+
+        job_outputs = [processed_file_output, log_output, log_file_output, job_id_input]
+        # Sin límite de concurrencia en Gradio: el reparto entre trabajos lo hace job_scheduler_global
+        submit_button.click(gradio_excel_processing_interface, inputs=[excel_input, resume_checkbox, previous_input], outputs=job_outputs, concurrency_limit=None)
+        job_status_button.click(gradio_job_status_interface, inputs=job_id_input, outputs=job_outputs, queue=False)
+        partial_button.click(gradio_partial_results_interface, inputs=excel_input, outputs=[processed_file_output, log_output], queue=False)
+
+    return demo
+
+def __getattr__(name):
+    # `app.demo` (Spaces, recarga de gradio) construye la interfaz la primera vez que se pide
+    if name == "demo":
+        globals()["demo"] = build_demo()
+        return globals()["demo"]
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+# --- Ejecución por fragmentos (varios procesos o equipos) ---
+# La hoja se reparte en N fragmentos según un hash estable de la consulta de cada fila. Cada fragmento es un
+# Excel normal que procesa su propio proceso (en este equipo o en otros que compartan el directorio de salida)
+# y al final los resultados se fusionan en el orden original de la entrada.
+SHARD_ROW_COL = 'Fila original' # Posición de la fila en la entrada; solo en los ficheros de fragmento
+
+def shard_of_rows(df, shards):
+    """Fragmento (1..shards) de cada fila. Las filas con la misma consulta caen en el mismo fragmento, así se siguen deduplicando."""
+    keys = delta_row_keys(prepare_input_frame(df.copy()))
+    return np.array([int(hashlib.sha1(repr(key).encode("utf-8")).hexdigest()[:8], 16) % shards + 1 for key in keys], dtype=int)
+
+def shard_dir_for(input_path, shards, output_dir):
+    """Directorio de los fragmentos de una entrada, ligado a su hash (una entrada cambiada no reutiliza fragmentos viejos)."""
+    name_without_ext = os.path.splitext(os.path.basename(str(input_path)))[0]
+    return os.path.join(output_dir, f"Fragmentos_{name_without_ext}_{file_sha256(input_path)[:12]}_{shards}")
+
+def shard_name(input_path, shard, shards):
+    return f"{os.path.splitext(os.path.basename(str(input_path)))[0]}.fragmento-{shard}-de-{shards}"
+
+def split_input_shards(input_path, shards, output_dir):
+    """
+    Escribe los `shards` ficheros de fragmento de la entrada (los que falten) y devuelve
+    (directorio, rutas). Varios procesos pueden llamarla a la vez: todos generan los mismos
+    fragmentos y cada fichero se escribe aparte y se renombra de forma atómica.
+    """
+    shard_dir = shard_dir_for(input_path, shards, output_dir)
+    paths = [os.path.join(shard_dir, shard_name(input_path, k, shards) + ".xlsx") for k in range(1, shards + 1)]
+    if all(os.path.exists(path) for path in paths): return shard_dir, paths
+    os.makedirs(shard_dir, exist_ok=True)
+    df = read_input_table(input_path)
+    assignment = shard_of_rows(df, shards)
+    df[SHARD_ROW_COL] = np.arange(len(df))
+    for k, path in enumerate(paths, 1):
+        if os.path.exists(path): continue
+        tmp_path = f"{path}.{socket.gethostname()}-{os.getpid()}.tmp.xlsx"
+        df[assignment == k].to_excel(tmp_path, index=False, engine="openpyxl")
+        os.replace(tmp_path, path)
+    return shard_dir, paths
+
+def shard_result_paths(input_path, shard, shards, output_dir):
+    """(Resultados_*.xlsx, resumen .json) de un fragmento."""
+    shard_dir, name = shard_dir_for(input_path, shards, output_dir), shard_name(input_path, shard, shards)
+    return os.path.join(shard_dir, f"Resultados_{name}.xlsx"), os.path.join(shard_dir, f"Resumen_{name}.json")
+
+def write_shard_summary(path, shard, shards, started, job):
+    summary = {"fragmento": shard, "fragmentos": shards, "equipo": socket.gethostname(), "pid": os.getpid(),
+               "inicio": round(started, 3), "fin": round(time.time(), 3), "estado": job.status}
+    with open(path, "w", encoding="utf-8") as f: json.dump(summary, f, ensure_ascii=False, indent=1)
+
+def merge_shard_results(input_path, shards, output_dir):
+    """
+    Fusiona los resultados de todos los fragmentos en un único Resultados_*.xlsx con las filas en el
+    orden de la entrada y una hoja "Resumen" por fragmento. Devuelve (ruta, texto del resumen);
+    lanza RuntimeError si falta algún fragmento.
+    """
+    frames, summary, missing = [], [["Fragmento", "Equipo", "Filas", "Éxitos", "Fallos", "Segundos"]], []
+    starts, ends = [], []
+    for k in range(1, shards + 1):
+        results_path, summary_path = shard_result_paths(input_path, k, shards, output_dir)
+        if not os.path.exists(results_path):
+            missing.append(k); continue
+        # Cada celda con el tipo que escribió su fragmento: con la inferencia de pandas, un fragmento cuyos
+        # "ISBN encontrado" fueran todos dígitos volvería como números y no como el texto del proceso único
+        frame = pd.read_excel(results_path, dtype=object)
+        frames.append(frame)
+        info = {}
+        if os.path.exists(summary_path):
+            with open(summary_path, encoding="utf-8") as f: info = json.load(f)
+            starts.append(info["inicio"]); ends.append(info["fin"])
+        resultado = frame['Resultado'].fillna("").astype(str).str.strip()
+        seconds = round(info["fin"] - info["inicio"], 1) if info else None
+        summary.append([f"{k}/{shards}", info.get("equipo", ""), len(frame), int(resultado.str.startswith("Éxito").sum()), int(resultado.str.startswith("Fallo").sum()), seconds])
+    if missing: raise RuntimeError(f"Faltan los resultados de los fragmentos {', '.join(map(str, missing))} de {shards}.")
+    merged = pd.concat(frames, ignore_index=True).sort_values(SHARD_ROW_COL, kind="stable").drop(columns=[SHARD_ROW_COL])
+    totals = [sum(row[i] for row in summary[1:]) for i in (2, 3, 4)]
+    wall = round(max(ends) - min(starts), 1) if starts else None
+    summary.append(["Total", f"{len({row[1] for row in summary[1:]})} equipo(s)", *totals, wall])
+    name_without_ext = os.path.splitext(os.path.basename(str(input_path)))[0]
+    output_path = os.path.join(output_dir, f"Resultados_{name_without_ext}.xlsx")
+    write_results_excel(merged, output_path, summary=summary)
+    text = (f"Fusionados {shards} fragmentos: {totals[0]} filas, {totals[1]} éxitos, {totals[2]} fallos"
+            + (f", {wall:g} s de principio a fin" if wall is not None else "") + f" -> {output_path}")
+    return output_path, text
+
+def run_local_shards(input_path, shards, output_dir, argv):
+    """Lanza un proceso de este mismo script por fragmento, espera a todos y fusiona. Devuelve el código de salida."""
+    shard_dir, _ = split_input_shards(input_path, shards, output_dir)
+    # El presupuesto de cortesía con cada sitio se reparte entre los procesos
+    env = dict(os.environ, OL_REQUESTS_PER_SECOND=str(OL_REQUESTS_PER_SECOND / shards), OL_RATE_BURST=str(max(1, OL_RATE_BURST // shards)),
+               CULTURA_REQUESTS_PER_SECOND=str(CULTURA_REQUESTS_PER_SECOND / shards))
+    workers = []
+    for k in range(1, shards + 1):
+        console = open(os.path.join(shard_dir, f"Consola_{shard_name(input_path, k, shards)}.txt"), "w", encoding="utf-8")
+        command = [sys.executable, os.path.abspath(__file__), *argv, "--fragmento", str(k)]
+        workers.append((k, subprocess.Popen(command, env=env, stdout=console, stderr=subprocess.STDOUT), console))
+    log(f"Lanzados {shards} procesos, uno por fragmento (consola y log de cada uno en {shard_dir}).")
+    failed = []
+    for k, process, console in workers:
+        if process.wait() != 0: failed.append(k)
+        console.close()
+    if failed: log(f"Fragmentos con errores: {', '.join(map(str, failed))}. Al relanzar se reanudan solo los pendientes.")
+    try: _, text = merge_shard_results(input_path, shards, output_dir)
+    except Exception as e_merge:
+        log(f"No se pudieron fusionar los fragmentos: {e_merge}"); return 1
+    log(text)
+    return 0 if not failed else 1
+
+# --- Modo por lotes (línea de comandos) ---
+def main(argv=None):
+    """
+    Procesa uno o varios ficheros sin interfaz (p. ej. desde cron) y devuelve el código de salida:
+    0 si todos terminan con resultados, 1 si alguno falla.
+        python app.py catalogo1.xlsx catalogo2.csv --salida resultados/ --cultura-backend http
+    """
+    global CULTURA_BACKEND, OL_BACKEND, OL_LOCAL_INDEX_PATH, OL_MAX_WORKERS, CULTURA_HTTP_WORKERS, CULTURA_POOL_SIZE
+    global OL_CACHE_PATH, OL_CACHE_OFFLINE, PERF_METRICS, DELTA_MAX_AGE_DAYS, ES_SPECULATIVE_OL, JOURNAL_DIR
+    parser = argparse.ArgumentParser(description="Busca ediciones más recientes de los libros de uno o varios ficheros, sin interfaz.")
+    parser.add_argument("entradas", nargs="+", help="Ficheros de entrada (.xlsx, .csv o .parquet)")
+    parser.add_argument("--salida", default=".", help="Directorio para resultados, logs y métricas (por defecto el actual)")
+    parser.add_argument("--cultura-backend", choices=["auto", "http", "selenium"], default=CULTURA_BACKEND)
+    parser.add_argument("--ol-backend", choices=["api", "local"], default=OL_BACKEND)
+    parser.add_argument("--ol-indice", default=OL_LOCAL_INDEX_PATH, help="Índice local de Open Library (con --ol-backend local)")
+    parser.add_argument("--hilos-ol", type=int, default=OL_MAX_WORKERS, help="Hilos para las filas 'no-es'")
+    parser.add_argument("--hilos-cultura", type=int, default=CULTURA_HTTP_WORKERS, help="Hilos para las filas 'es' por HTTP")
+    parser.add_argument("--drivers", type=int, default=CULTURA_POOL_SIZE, help="Navegadores del pool de Selenium")
+    parser.add_argument("--trabajos", type=int, default=1, help="Ficheros que se procesan a la vez")
+    parser.add_argument("--cache", default=OL_CACHE_PATH, help="Fichero de caché de Open Library")
+    parser.add_argument("--sin-cache", action="store_true", help="No usar la caché de Open Library")
+    parser.add_argument("--sin-conexion", action="store_true", default=OL_CACHE_OFFLINE, help="Responder solo desde la caché")
+    parser.add_argument("--no-reanudar", action="store_true", help="Empezar de cero aunque haya un diario a medias")
+    parser.add_argument("--anteriores", help="Resultados_*.xlsx anterior, o directorio con ellos, para buscar solo lo nuevo o fallido (modo delta)")
+    parser.add_argument("--antiguedad-max", type=float, default=DELTA_MAX_AGE_DAYS, help="Días que un resultado anterior sigue valiendo")
+    parser.add_argument("--especulativa", action="store_true", default=ES_SPECULATIVE_OL, help="Filas 'es': buscar en Open Library a la vez que en Cultura.gob")
+    parser.add_argument("--metricas", action="store_true", default=PERF_METRICS, help="Guardar métricas de rendimiento por etapa")
+    parser.add_argument("--fragmentos", type=int, help="Repartir la entrada en N fragmentos, cada uno en su proceso, y fusionar los resultados")
+    parser.add_argument("--fragmento", type=int, help="Procesar solo el fragmento K (1..N) de --fragmentos, p. ej. en otro equipo con la misma --salida")
+    parser.add_argument("--fusionar", action="store_true", help="Solo fusionar los resultados de los --fragmentos ya terminados")
+    args = parser.parse_args(argv)
+    if (args.fragmento is not None or args.fusionar) and not args.fragmentos: parser.error("--fragmento y --fusionar requieren --fragmentos")
+    if args.fragmentos is not None and (args.fragmentos < 1 or len(args.entradas) != 1): parser.error("--fragmentos requiere un único fichero de entrada y N >= 1")
+    if args.fragmento is not None and not 1 <= args.fragmento <= args.fragmentos: parser.error(f"--fragmento debe estar entre 1 y {args.fragmentos}")
+
+    CULTURA_BACKEND, OL_BACKEND, OL_LOCAL_INDEX_PATH = args.cultura_backend, args.ol_backend, args.ol_indice
+    OL_MAX_WORKERS, CULTURA_HTTP_WORKERS, CULTURA_POOL_SIZE = args.hilos_ol, args.hilos_cultura, args.drivers
+    OL_CACHE_PATH, OL_CACHE_OFFLINE, PERF_METRICS = "" if args.sin_cache else args.cache, args.sin_conexion, args.metricas
+    DELTA_MAX_AGE_DAYS, ES_SPECULATIVE_OL = args.antiguedad_max, args.especulativa
+    output_dir = os.path.abspath(args.salida)
+    os.makedirs(output_dir, exist_ok=True)
+
+    inputs = [] # (entrada, resultados anteriores)
+    for path in args.entradas:
+        if not os.path.exists(path):
+            log(f"No existe el fichero de entrada: {path}")
+            continue
+        previous = args.anteriores
+        if previous and os.path.isdir(previous): # Un directorio: el Resultados_ del mismo nombre, si existe
+            previous = os.path.join(previous, f"Resultados_{os.path.splitext(os.path.basename(path))[0]}.xlsx")
+            if not os.path.exists(previous): previous = None
+        inputs.append((os.path.abspath(path), previous))
+
+    shard_summary_path = None
+    if args.fragmentos and inputs:
+        input_path = inputs[0][0]
+        if args.fusionar:
+            try: _, text = merge_shard_results(input_path, args.fragmentos, output_dir)
+            except Exception as e_merge:
+                log(f"No se pudieron fusionar los fragmentos: {e_merge}"); return 1
+            log(text); return 0
+        if args.fragmento is None: return run_local_shards(input_path, args.fragmentos, output_dir, argv if argv is not None else sys.argv[1:])
+        # Un fragmento: se procesa como una entrada más, con su diario junto a los fragmentos para reanudar desde cualquier equipo
+        shard_dir, shard_paths = split_input_shards(input_path, args.fragmentos, output_dir)
+        results_path, shard_summary_path = shard_result_paths(input_path, args.fragmento, args.fragmentos, output_dir)
+        if os.path.exists(results_path) and not args.no_reanudar:
+            log(f"El fragmento {args.fragmento} de {args.fragmentos} ya está terminado: {results_path}"); return 0
+        JOURNAL_DIR, output_dir = os.path.join(shard_dir, "diarios"), shard_dir
+        inputs = [(shard_paths[args.fragmento - 1], inputs[0][1])]
+
+    started = time.time()
+    scheduler = JobScheduler(max_running=max(1, args.trabajos), history=len(inputs))
+    jobs = [scheduler.submit(path, resume=not args.no_reanudar, output_dir=output_dir, previous_results=previous) for path, previous in inputs]
+    try:
+        for job in jobs:
+            version = -1
+            while job.active: version = job.wait_update(version, LOG_UI_MIN_INTERVAL)
+    finally:
+        _close_cultura_driver_pool()
+    for job in jobs:
+        log(f"{job.status_text()} - {job.input_path} -> {job.output_path or 'sin resultados'}")
+    if shard_summary_path and jobs: write_shard_summary(shard_summary_path, args.fragmento, args.fragmentos, started, jobs[0])
+    return 0 if len(jobs) == len(args.entradas) and all(job.status == JOB_DONE for job in jobs) else 1
+
+def _close_cultura_driver_pool():
+    global cultura_driver_pool_global
+    if cultura_driver_pool_global:
+        log("Cerrando el pool de drivers de Cultura.gob al finalizar el script/demo.")
+        try:
+            cultura_driver_pool_global.close()
+        except Exception as e_quit:
+            log(f"Error al intentar cerrar el pool de drivers: {e_quit}")
+        cultura_driver_pool_global = None
 
 
 if __name__ == '__main__':
+    if len(sys.argv) > 1: # Con argumentos: modo por lotes, sin Gradio
+        sys.exit(main())
     try:
         # En Spaces NO uses share=True (es para enlaces efímeros en local/Colab)
-        demo.launch(debug=True)  # o incluso puedes omitir launch, ver README
+        build_demo().launch(debug=True)  # o incluso puedes omitir launch, ver README
     finally:
-        if driver_cultura_global:
-            log("Cerrando driver global de Cultura.gob al finalizar el script/demo.")
-            try:
-                driver_cultura_global.quit()
-            except Exception as e_quit:
-                log(f"Error al intentar cerrar el driver global: {e_quit}")
-            driver_cultura_global = None
\ No newline at end of file
+        _close_cultura_driver_pool()
\ No newline at end of file
@@ -0,0 +1,84 @@
+"""
+Micro-benchmark de la extracción de resultados de Cultura.gob en Selenium.
+
+Carga páginas de resultados guardadas (file://) en un Chromium headless y compara:
+  - elementos: la extracción antigua, varias llamadas a WebDriver por resultado.
+  - script:    una única llamada execute_script que devuelve todos los registros.
+  - page_source: una única lectura del HTML, analizado en Python.
+
+Uso:
+    python benchmarks/bench_cultura_extraction.py pagina1.html [pagina2.html ...] [--repeticiones 20]
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import app
+from selenium.webdriver.common.by import By
+
+
+def extraer_por_elementos(driver):
+    # Réplica de la extracción elemento a elemento previa a la extracción en un solo viaje
+    registros = []
+    for res_element in driver.find_elements(By.XPATH, "//div[@class='isbnResultado']"):
+        try:
+            titulo_el = res_element.find_element(By.XPATH, ".//div[@class='isbnResDescripcion']//a[contains(@href, 'tituloDetalle')]")
+            registro = {'titulo': titulo_el.text.strip(), 'isbn': None, 'parrafos': []}
+            try:
+                res_element.find_element(By.XPATH, ".//div[@class='isbnResDescripcion']//p[contains(normalize-space(.), 'Autor/es:')]").text
+            except Exception: pass
+            try:
+                registro['isbn'] = res_element.find_element(By.XPATH, ".//div[@class='camposCheck']//a[contains(@href, 'tituloDetalle')] | .//div[contains(@class, 'camposIsbnRes')]//span[@class='isbn'][1]//strong").text.strip()
+            except Exception: pass
+            registro['parrafos'] = [p.text for p in res_element.find_elements(By.XPATH, ".//div[@class='isbnResDescripcion']//p")]
+            registros.append(registro)
+        except Exception:
+            continue
+    return registros
+
+
+METODOS = {
+    "elementos": extraer_por_elementos,
+    "script": lambda driver: app.extract_cultura_records_selenium(driver, "script"),
+    "page_source": lambda driver: app.extract_cultura_records_selenium(driver, "page_source"),
+}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("paginas", nargs="+", help="Páginas de resultados de Cultura.gob guardadas en disco")
+    parser.add_argument("--repeticiones", type=int, default=20)
+    args = parser.parse_args()
+
+    driver = app._init_cultura_driver_for_spaces()
+    try:
+        tiempos = {nombre: [] for nombre in METODOS}
+        for pagina in args.paginas:
+            driver.get("file://" + os.path.abspath(pagina))
+            referencia = None
+            for nombre, metodo in METODOS.items():
+                for _ in range(args.repeticiones):
+                    t0 = time.perf_counter()
+                    registros = metodo(driver)
+                    tiempos[nombre].append(time.perf_counter() - t0)
+                seleccion = app._select_latest_cultura(registros)
+                if referencia is None: referencia = seleccion
+                elif seleccion != referencia:
+                    print(f"AVISO: {pagina}: '{nombre}' selecciona {seleccion} y 'elementos' {referencia}")
+            print(f"{pagina}: {len(registros)} resultados")
+
+        print(f"\n{'método':<12} {'mediana ms':>11} {'p95 ms':>9}")
+        for nombre, valores in tiempos.items():
+            valores.sort()
+            p95 = valores[min(len(valores) - 1, int(len(valores) * 0.95))]
+            print(f"{nombre:<12} {statistics.median(valores) * 1000:>11.2f} {p95 * 1000:>9.2f}")
+    finally:
+        driver.quit()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,137 @@
+"""
+Benchmark de la elección de la mejor edición de una obra con muchas ediciones: paginación secuencial
+y lista completa de ediciones (método anterior) frente a páginas en paralelo con selección en streaming
+(eds_of_work_ol y EditionScorer), y con parada anticipada (OL_EARLY_STOP_YEARS=1). Un servidor local hace de Open
+Library con la latencia indicada. Se informa del tiempo por obra, de la memoria retenida por obra
+(lo que quedaría en la memoria de obras) y de si ambos métodos eligen la misma edición.
+
+Uso:
+    python benchmarks/bench_editions.py [--obras 20] [--ediciones 400] [--max-ediciones 400] [--latencia-ms 80]
+"""
+import argparse
+import json
+import os
+import re
+import sys
+import threading
+import time
+import tracemalloc
+import urllib.parse
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+class Manejador(BaseHTTPRequestHandler):
+    disable_nagle_algorithm = True
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        ruta = urllib.parse.urlsplit(self.path)
+        params = dict(urllib.parse.parse_qsl(ruta.query))
+        time.sleep(self.server.latencia)
+        cuerpo = {}
+        m = re.fullmatch(r"/works/OL(\d+)W/editions\.json", ruta.path)
+        if m:
+            n, offset, limite = int(m.group(1)), int(params.get("offset", 0)), int(params.get("limit", 50))
+            total = self.server.ediciones
+            cuerpo = {"size": total, "entries": [
+                {"key": f"/books/OL{n}{k}M", "title": f"Obra {n} ed. {k}", "publish_date": f"{1950 + (n * 7 + k * 13) % 75}",
+                 "isbn_13": [f"978{(n * 1000 + k) % 10**10:010d}"], "isbn_10": [], "identifiers": {"goodreads": [str(k)]},
+                 "authors": [{"key": f"/authors/OL{n}A"}]} for k in range(offset, min(total, offset + limite))]}
+        datos = json.dumps(cuerpo).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(datos)))
+        self.end_headers()
+        self.wfile.write(datos)
+
+    def log_message(self, *args):
+        pass
+
+
+# Réplica del método previo: páginas una tras otra y todas las ediciones en una lista antes de elegir
+def eds_of_work_anterior(app, wk, names_of_work_authors, max_eds):
+    url_base, params = f"{app.OL_BASE_URL}{wk}/editions.json", {"limit": 50, "fields": "key,title,publish_date,publish_year,isbn_13,isbn_10,identifiers,authors,author_name"}
+    all_eds, current_offset = [], 0
+    while len(all_eds) < max_eds:
+        params["offset"] = current_offset
+        r = app.g_ol(url_base, params=params)
+        if not r or not r.content: break
+        current_entries = r.json().get("entries", [])
+        if not current_entries: break
+        for entry in current_entries:
+            all_eds.append({**entry, "author_list_resolved": entry.get("author_name", []) or names_of_work_authors})
+        current_offset += len(current_entries)
+        if len(current_entries) < params["limit"]: break
+    return all_eds
+
+
+def mejor_anterior(app, all_eds, filter_authors):
+    best = {"year": -1, "title": None, "isbn": None}
+    for e_data in all_eds:
+        if filter_authors and not app.author_ok_ol(filter_authors, e_data.get("author_list_resolved", [])): continue
+        year = app.y_ol(e_data.get("publish_date") or e_data.get("publish_year"))
+        if not year or year < 1700: continue
+        if year > best["year"]:
+            best = {"year": year, "title": e_data.get("title"), "isbn": app._edition_isbn_ol(e_data)}
+    return best["title"], best["isbn"], str(best["year"])
+
+
+def medir(obras, fn):
+    tiempos, elegidas = [], []
+    for n in obras:
+        t0 = time.perf_counter()
+        _, elegida = fn(f"/works/OL{n}W")
+        tiempos.append(time.perf_counter() - t0)
+        elegidas.append(elegida)
+    # Memoria en una pasada aparte, para que tracemalloc no altere los tiempos
+    tracemalloc.start()
+    valor, _ = fn(f"/works/OL{obras[0]}W")
+    retenido = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del valor
+    return sum(tiempos) / len(tiempos), retenido, elegidas
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--obras", type=int, default=20)
+    parser.add_argument("--ediciones", type=int, default=400, help="Ediciones de cada obra en el servidor")
+    parser.add_argument("--max-ediciones", type=int, default=400, help="OL_MAX_EDITIONS")
+    parser.add_argument("--latencia-ms", type=float, default=80)
+    parser.add_argument("--anio-entrada", type=int, default=2000, help="Año del Excel para la parada anticipada")
+    args = parser.parse_args()
+
+    servidor = ThreadingHTTPServer(("127.0.0.1", 0), Manejador)
+    servidor.latencia, servidor.ediciones = args.latencia_ms / 1000, args.ediciones
+    threading.Thread(target=servidor.serve_forever, daemon=True).start()
+    os.environ.update(OL_BASE_URL=f"http://127.0.0.1:{servidor.server_address[1]}", OL_CACHE_PATH="",
+                      OL_REQUESTS_PER_SECOND="1000", OL_RATE_BURST="1000", OL_MAX_EDITIONS=str(args.max_ediciones))
+    import app
+    autores = ["Autor"]
+    obras = range(1, args.obras + 1)
+
+    def anterior(wk):
+        eds = eds_of_work_anterior(app, wk, autores, args.max_ediciones)
+        return eds, mejor_anterior(app, eds, autores)
+
+    def streaming(wk, parada=False):
+        scorer = app.EditionScorer(autores, None, args.anio_entrada + 1 if parada else None)
+        candidatos, _ = app.eds_of_work_ol(wk, autores, stop=scorer.is_stop_candidate)
+        _, titulo, _, isbn, anio = scorer.best(candidatos.items)
+        return candidatos, (titulo, isbn, anio)
+
+    print(f"{args.obras} obras de {args.ediciones} ediciones (máx. {args.max_ediciones}); latencia {args.latencia_ms:.0f} ms")
+    print(f"{'método':<22} {'ms/obra':>8} {'KB retenidos/obra':>18}")
+    base = None
+    for nombre, fn in [("anterior", anterior), ("paralelo + streaming", streaming), ("con parada anticipada", lambda wk: streaming(wk, True))]:
+        ms, retenido, elegidas = medir(obras, fn)
+        base = base or elegidas
+        iguales = "" if nombre == "con parada anticipada" else f"  (misma elección: {elegidas == base})"
+        print(f"{nombre:<22} {ms * 1000:>8.0f} {retenido / 1024:>18.1f}{iguales}")
+    servidor.shutdown()
+
+
+if __name__ == "__main__":
+    main()
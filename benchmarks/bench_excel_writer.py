@@ -0,0 +1,101 @@
+"""
+Benchmark del Excel de resultados: escritura en una pasada (write_results_excel) frente al
+método anterior (to_excel + load_workbook + estilos celda a celda + save).
+
+Cada método se ejecuta en un proceso aparte para medir su pico de memoria (RSS) por separado.
+
+Uso:
+    python benchmarks/bench_excel_writer.py [--filas 100000]
+"""
+import argparse
+import os
+import random
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+RESULTADOS = ["Éxito, ed. más actual", "Éxito, ed. más actual - Título difiere", "Éxito - sin versión más reciente", "Fallo - No hallado", "Fallo - Input: Falta el año"]
+
+
+def generar_df(filas):
+    import pandas as pd
+    rnd = random.Random(42)
+    return pd.DataFrame({
+        "Title": [f"Título sintético número {i}" for i in range(filas)],
+        "Author": [f"Autor {i % 997}, Nombre" for i in range(filas)],
+        "year": [str(1950 + i % 70) for i in range(filas)],
+        "Idioma": [rnd.choice(["es", "no-es"]) for _ in range(filas)],
+        "ISBN": [f"978{rnd.randrange(10**9, 10**10)}" for _ in range(filas)],
+        "Year_cleaned_from_input": [1950 + i % 70 for i in range(filas)],
+        "ISBN_prioritario_input": [f"978{i:010d}" for i in range(filas)],
+        "Título usado para búsqueda": [f"titulo sintetico {i}" for i in range(filas)],
+        "Autor usado para búsqueda": [f"Autor {i % 997}" for i in range(filas)],
+        "Título encontrado": [f"Título sintético número {i}" for i in range(filas)],
+        "Autor encontrado": [f"Autor {i % 997}" for i in range(filas)],
+        "ISBN encontrado": [f"978{i:010d}" for i in range(filas)],
+        "Año de edición encontrado": [str(1990 + i % 30) for i in range(filas)],
+        "Resultado": [rnd.choice(RESULTADOS) for _ in range(filas)],
+    })
+
+
+def escribir_anterior(df, ruta):
+    # Réplica del método previo a la escritura en una pasada
+    import openpyxl
+    import app
+    df.to_excel(ruta, index=False, engine='openpyxl')
+    workbook = openpyxl.load_workbook(ruta)
+    worksheet = workbook.active
+    header = {cell.value: i + 1 for i, cell in enumerate(worksheet[1])}
+    result_col_idx = header.get('Resultado')
+    if result_col_idx:
+        for row_idx in range(2, worksheet.max_row + 1):
+            fill_to_apply = app.result_fill(worksheet.cell(row=row_idx, column=result_col_idx).value)
+            if fill_to_apply:
+                for c in worksheet[row_idx]:
+                    c.fill = fill_to_apply
+        for row in worksheet.iter_rows(min_col=result_col_idx, max_col=result_col_idx, min_row=1):
+            for cell in row:
+                cell.border = app.THICK_BORDER
+    workbook.save(ruta)
+
+
+def ejecutar_modo(modo, filas):
+    import app
+    df = generar_df(filas)
+    base_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    with tempfile.TemporaryDirectory() as tmp:
+        ruta = os.path.join(tmp, "Resultados_bench.xlsx")
+        t0 = time.perf_counter()
+        if modo == "anterior": escribir_anterior(df, ruta)
+        else: app.write_results_excel(df, ruta)
+        segundos = time.perf_counter() - t0
+        tamano = os.path.getsize(ruta)
+    pico_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss # KiB en Linux
+    print(f"{modo}\t{segundos:.2f}\t{pico_rss / 1024:.1f}\t{(pico_rss - base_rss) / 1024:.1f}\t{tamano / (1024 * 1024):.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--filas", type=int, default=100000)
+    parser.add_argument("--modo", choices=["anterior", "una_pasada"], help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.modo:
+        ejecutar_modo(args.modo, args.filas)
+        return
+
+    print(f"{args.filas} filas sintéticas")
+    print(f"{'método':<12} {'segundos':>9} {'pico RSS MB':>12} {'Δ RSS MB':>9} {'fichero MB':>11}")
+    for modo in ["anterior", "una_pasada"]:
+        salida = subprocess.run([sys.executable, os.path.abspath(__file__), "--filas", str(args.filas), "--modo", modo],
+                                check=True, capture_output=True, text=True).stdout.strip().splitlines()[-1]
+        nombre, segundos, pico, delta, tamano = salida.split("\t")
+        print(f"{nombre:<12} {segundos:>9} {pico:>12} {delta:>9} {tamano:>11}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,134 @@
+"""
+Benchmark de la normalización de la entrada: columnas vectorizadas (prepare_input_frame) frente a
+la limpieza anterior (apply por fila para año e ISBN y pd.Series desechables por fila para los
+términos de búsqueda). Comprueba además que ambas producen exactamente los mismos valores.
+
+Uso:
+    python benchmarks/bench_input_normalization.py [--filas 100000]
+"""
+import argparse
+import os
+import random
+import re
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pandas as pd
+import unidecode
+
+import app
+
+TITULOS = ["Cien años de soledad", "El amor en los tiempos del cólera", "La casa de los espíritus", "Don Quijote de la Mancha",
+           "¿Quién se ha llevado mi queso?", "L'Étranger", "Crime and Punishment", "Los de abajo (ed. crítica)", "1984", "   ", "", None]
+AUTORES = ["García Márquez, Gabriel", "Allende, Isabel", "Cervantes Saavedra, Miguel de", "Camus, Albert", "Dostoievski",
+           "Azuela, Mariano", "Orwell, George", "Ñúñez-Ruiz, José María", ",", None]
+ANIOS = ["1967", "[1985]", "(2001)", "c1999", "1899?", "s.f.", "2021-2022", "(1650) 1998", 1975, 2004.0, None]
+ISBNS = ["978-84-376-0494-7", "8437604944", "ISBN: 9788497592208; 8497592204", "0-14-044913-2, 978-0140449136", "sin isbn",
+         "9791234567896 979-1-2345-6789-6", "123", None]
+
+
+def generar_df(filas):
+    rnd = random.Random(7)
+    return pd.DataFrame({
+        "Title": [rnd.choice(TITULOS) if i % 5 else f"{rnd.choice(TITULOS) or 'Obra'} tomo {i % 311}" for i in range(filas)],
+        "Author": [rnd.choice(AUTORES) for _ in range(filas)],
+        "year": [rnd.choice(ANIOS) for _ in range(filas)],
+        "Idioma": [rnd.choice(["es", "no-es"]) for _ in range(filas)],
+        "ISBN": [rnd.choice(ISBNS) for _ in range(filas)],
+    })
+
+
+# Réplica de la limpieza previa a la normalización vectorizada
+def clean_year_anterior(year_str):
+    if pd.isnull(year_str) or not isinstance(year_str, str): return None
+    match_bracket_paren = re.search(r'[\[\(](\d{4})[\]\)]', year_str)
+    if match_bracket_paren:
+        year_cand = int(match_bracket_paren.group(1))
+        if 1700 <= year_cand <= 2100: return year_cand
+    match = re.search(r'\b(1[7-9]\d{2}|20\d{2}|2100)\b', year_str)
+    return int(match.group(1)) if match else None
+
+
+def isbn_anterior(isbn_field_str):
+    if pd.isnull(isbn_field_str) or not isinstance(isbn_field_str, str) or not isbn_field_str.strip(): return ""
+    strict, general, isbn10 = [], [], []
+    for isbn in [s.strip() for s in re.split(r'[;\s,]+', isbn_field_str) if s.strip()]:
+        digits = re.sub(r'^(ISBN|isbn)\s*:\s*', '', isbn, flags=re.IGNORECASE).replace('-', '').replace(' ', '').strip()
+        if digits.isdigit():
+            if len(digits) == 13:
+                if digits.startswith('9'): strict.append(digits)
+                if digits.startswith(('978', '979')): general.append(digits)
+            elif len(digits) == 10: isbn10.append(digits)
+    return (strict or general or isbn10 or [""])[0]
+
+
+def titulo_autor_anterior(row_series):
+    title_input = row_series.get('Title')
+    if pd.isnull(title_input) or str(title_input).strip() == "": title_clean = "No disponible"
+    else:
+        title = re.sub(r'[^a-zA-Z0-9\s]', '', unidecode.unidecode(str(title_input)))
+        title_clean = ' '.join([w for w in title.split() if w.lower() not in app.STOPWORDS][:5]) or "No disponible"
+        if not title_clean.strip(): title_clean = "No disponible"
+    author_input = row_series.get('Author')
+    if pd.isnull(author_input) or str(author_input).strip() == "": author_clean = "No disponible"
+    else:
+        author_clean = ' '.join(re.sub(r'[^a-zA-Z\s]', '', unidecode.unidecode(str(author_input))).split()[:2])
+        if not author_clean.strip(): author_clean = "No disponible"
+    return title_clean, author_clean
+
+
+def titulo_cultura_anterior(original_title):
+    if pd.isnull(original_title) or str(original_title).strip() == "": return "No disponible"
+    title = re.sub(r'[^a-zA-Z0-9\s]', '', unidecode.unidecode(str(original_title).lower()))
+    return ' '.join(title.split()[:5]) or "No disponible"
+
+
+def normalizar_anterior(df):
+    df['Year_cleaned_from_input'] = df['year'].apply(lambda x: clean_year_anterior(str(x) if pd.notnull(x) else None))
+    df['ISBN_prioritario_input'] = df['ISBN'].apply(lambda x: isbn_anterior(str(x) if pd.notnull(x) else None))
+    terminos = []
+    for _, row in df.iterrows():
+        raw_author, title = row.get('Author'), str(row.get('Title', ''))
+        post_comma = str(raw_author).split(',', 1)[0].strip() if pd.notna(raw_author) and ',' in str(raw_author) else (str(raw_author).strip() if pd.notna(raw_author) else None)
+        titulo_ol, autor_ol = titulo_autor_anterior(pd.Series({'Title': title, 'Author': post_comma}))
+        _, autor_cg = titulo_autor_anterior(pd.Series({'Title': '', 'Author': post_comma}))
+        titulo_cmp, _ = titulo_autor_anterior(pd.Series({'Title': title, 'Author': ''}))
+        terminos.append((titulo_ol, titulo_cultura_anterior(title), "" if autor_ol == "No disponible" else autor_ol,
+                         "" if autor_cg == "No disponible" else autor_cg, titulo_cmp))
+    return df, terminos
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--filas", type=int, default=100000)
+    args = parser.parse_args()
+
+    base = generar_df(args.filas)
+    t0 = time.perf_counter()
+    anterior, terminos = normalizar_anterior(base.copy())
+    t_anterior = time.perf_counter() - t0
+    t0 = time.perf_counter()
+    nuevo = app.prepare_input_frame(base.copy())
+    t_nuevo = time.perf_counter() - t0
+
+    diferencias = 0
+    for col in ['Year_cleaned_from_input', 'ISBN_prioritario_input']:
+        a, n = anterior[col].tolist(), nuevo[col].tolist()
+        diferencias += sum(1 for x, y in zip(a, n) if not (x == y or (pd.isna(x) and pd.isna(y))))
+        if anterior[col].dtype != nuevo[col].dtype: print(f"AVISO: tipo distinto en {col}: {anterior[col].dtype} / {nuevo[col].dtype}")
+    for (titulo_ol, titulo_cg, autor_ol, autor_cg, titulo_cmp), row in zip(terminos, nuevo.to_dict('records')):
+        diferencias += (titulo_ol, titulo_cg, autor_ol, autor_cg, titulo_cmp) != (
+            row['Titulo_busqueda_ol'], row['Titulo_busqueda_cultura'], row['Autor_busqueda'], row['Autor_busqueda'], row['Titulo_busqueda_ol'])
+
+    print(f"{args.filas} filas sintéticas")
+    print(f"{'método':<12} {'segundos':>9}")
+    print(f"{'anterior':<12} {t_anterior:>9.2f}")
+    print(f"{'vectorizado':<12} {t_nuevo:>9.2f}")
+    print(f"Valores distintos: {diferencias}")
+    return 1 if diferencias else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,419 @@
+"""
+Benchmark de extremo a extremo de process_excel_generator sin tocar openlibrary.org ni cultura.gob.es.
+
+Un servidor HTTP local hace de Open Library (raíz) y de Cultura.gob (/webISBN) y la aplicación se
+apunta a él con OL_BASE_URL y CULTURA_BASE_URL. Cada tamaño de hoja se procesa en un proceso aparte
+y se informa de filas/s, percentiles de latencia por backend y pico de memoria (RSS).
+
+Modos:
+  - grabar: el servidor reenvía las peticiones a los sitios reales y guarda las respuestas mientras
+    se procesa una hoja real (una sola vez, respetando los límites habituales de la aplicación).
+        python benchmarks/bench_pipeline.py grabar catalogo.xlsx --dir grabacion/
+  - reproducir: el servidor responde con lo grabado (404 si falta) o, sin --dir, con respuestas
+    sintéticas deterministas, añadiendo la latencia indicada. Las hojas se generan del tamaño pedido.
+        python benchmarks/bench_pipeline.py reproducir [--dir grabacion/] [--filas 100 1000 10000] [--latencia-ms 80]
+
+Con --cultura-backend selenium el mismo servidor sirve las páginas de búsqueda y resultados al
+navegador headless (requiere Chromium) y se informa también del pico de RSS de los navegadores.
+--navegador completo desactiva el perfil ligero (CULTURA_LEAN_BROWSER=0) para comparar:
+    python benchmarks/bench_pipeline.py reproducir --cultura-backend selenium --proporcion-es 1 --filas 200 --navegador completo
+
+Búsqueda especulativa en las filas 'es' (Open Library a la vez que Cultura.gob), con un Cultura.gob lento
+sobre todo cuando no encuentra nada:
+    python benchmarks/bench_pipeline.py reproducir --proporcion-es 1 --filas 200 --latencia-cultura-ms 500 --latencia-sin-resultado-ms 5000 --ol-rps 3 [--especulativa]
+
+Inyección de fallos al reproducir, para probar reintentos, tasa adaptativa y cortacircuitos:
+    --fallos 0.05        un 5 % de respuestas 503 con Retry-After
+    --limite 0.05        un 5 % de respuestas 429 con Retry-After
+    --caida cultura:5:40 Cultura.gob devuelve 503 entre los segundos 5 y 40 de cada ejecución (también "ol")
+"""
+import argparse
+import base64
+import hashlib
+import json
+import os
+import random
+import re
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.parse
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+OL_UPSTREAM = "https://openlibrary.org"
+CULTURA_UPSTREAM = "https://www.cultura.gob.es"
+CULTURA_PREFIX = "/webISBN"
+CAMPO_CONSULTA_CULTURA = "params.liConceptosExt[0].texto" # app.CULTURA_QUERY_FIELD
+FICHERO_RESPUESTAS = "respuestas.jsonl"
+
+
+def _letras(n):
+    # Los autores se limpian a solo letras: los números se codifican como letras
+    return "".join(chr(ord("a") + int(d)) for d in str(n)).capitalize()
+
+
+def _numero(texto):
+    return int(hashlib.sha1(texto.encode("utf-8")).hexdigest()[:8], 16)
+
+
+def clave_peticion(metodo, ruta, cuerpo=b""):
+    """Clave estable de una petición: ruta, parámetros ordenados y, en un POST, el texto buscado."""
+    partes = urllib.parse.urlsplit(ruta)
+    query = urllib.parse.urlencode(sorted(urllib.parse.parse_qsl(partes.query, keep_blank_values=True)))
+    clave = f"{metodo} {partes.path}?{query}"
+    if metodo == "POST":
+        campos = urllib.parse.parse_qs(cuerpo.decode("utf-8", "replace"))
+        clave += " " + (campos.get(CAMPO_CONSULTA_CULTURA) or [urllib.parse.urlencode(sorted(urllib.parse.parse_qsl(cuerpo.decode("utf-8", "replace"))))])[0]
+    return clave
+
+
+# --- Respuestas sintéticas ---
+# Como las reales, las páginas enlazan hojas de estilo e imágenes y las de resultados repiten el formulario
+CABECERA_CULTURA = """<html><head><link rel="stylesheet" href="estilos.css"/><link rel="stylesheet" href="portal.css"/></head><body>
+<img src="logo.png"/><img src="cabecera.jpg"/>
+<form action="tituloSimpleFilter.do" method="post">
+<input type="hidden" name="layout" value="busquedaisbn"/>
+<input type="text" id="{campo}" name="{campo}" value=""/>
+<input type="submit" value="Buscar"/>
+</form>"""
+PAGINA_BUSQUEDA_CULTURA = CABECERA_CULTURA + "</body></html>"
+RECURSO_CULTURA = "/* recurso estático de relleno */\n" * 1500 # ~50 KB por hoja de estilo o imagen
+
+RESULTADO_CULTURA = """<div class="isbnResultado"><div class="isbnResDescripcion">
+<p><strong><a href="tituloDetalle.do?id={id}">{titulo}</a></strong></p>
+<p>Autor/es: {autor}<br/>F. Edición: {mes}/{ano}</p></div>
+<div class="camposCheck"><a href="tituloDetalle.do?id={id}">{isbn}</a></div></div>"""
+
+
+def respuesta_sintetica(metodo, ruta, cuerpo):
+    """Respuesta determinista con la forma de las reales, o None (404)."""
+    partes = urllib.parse.urlsplit(ruta)
+    path, params = partes.path, dict(urllib.parse.parse_qsl(partes.query))
+    if path.startswith(CULTURA_PREFIX):
+        if path.endswith(".css"): return "text/css", RECURSO_CULTURA
+        if path.endswith((".png", ".jpg")): return "image/png", RECURSO_CULTURA
+        if metodo == "GET":
+            return "text/html", PAGINA_BUSQUEDA_CULTURA.format(campo=CAMPO_CONSULTA_CULTURA)
+        consulta = (urllib.parse.parse_qs(cuerpo.decode("utf-8")).get(CAMPO_CONSULTA_CULTURA) or [""])[0]
+        n = _numero(consulta)
+        cabecera = CABECERA_CULTURA.format(campo=CAMPO_CONSULTA_CULTURA)
+        if n % 10 == 0: return "text/html", cabecera + '<div id="aviso">No se han encontrado resultados</div></body></html>'
+        palabras = consulta.split()
+        titulo, autor = " ".join(palabras[:-2] or palabras).title(), " ".join(palabras[-2:]).title()
+        bloques = [RESULTADO_CULTURA.format(id=n + k, titulo=titulo, autor=autor, mes=1 + k, ano=1995 + (n + 7 * k) % 30,
+                                            isbn=f"978-84-{(n + k) % 10**7:07d}-0") for k in range(1 + n % 4)]
+        return "text/html", cabecera + "".join(bloques) + "</body></html>"
+
+    m = re.fullmatch(r"/isbn/(\d+)\.json", path)
+    if m:
+        return "application/json", {"works": [{"key": f"/works/OL{int(m.group(1)) % 10**6}W"}]}
+    if path == "/api/books":
+        isbns = [b[5:] for b in params.get("bibkeys", "").split(",") if b.startswith("ISBN:")]
+        return "application/json", {f"ISBN:{i}": {"details": {"works": [{"key": f"/works/OL{int(i) % 10**6}W"}]}} for i in isbns if i.isdigit()}
+    m = re.fullmatch(r"/works/OL(\d+)W\.json", path)
+    if m:
+        return "application/json", {"key": f"/works/OL{m.group(1)}W", "authors": [{"author": {"key": f"/authors/OL{int(m.group(1)) % 500}A"}}]}
+    m = re.fullmatch(r"/authors/OL(\d+)A\.json", path)
+    if m:
+        return "application/json", {"name": f"Nombre {_letras(int(m.group(1)))}"}
+    m = re.fullmatch(r"/works/OL(\d+)W/editions\.json", path)
+    if m:
+        n, offset = int(m.group(1)), int(params.get("offset", 0))
+        total = 1 + n % 60
+        entradas = [{"key": f"/books/OL{n}{k}M", "title": f"Obra {n} ed. {k}", "publish_date": str(1970 + (n + k) % 55),
+                     "isbn_13": [f"978{(n * 100 + k) % 10**10:010d}"]} for k in range(offset, min(total, offset + int(params.get("limit", 50))))]
+        return "application/json", {"entries": entradas, "size": total}
+    if path == "/search.json":
+        q = params.get("q", "")
+        titulo, autor = re.search(r'title:"([^"]*)"', q), re.search(r'author:"([^"]*)"', q)
+        n = _numero(q)
+        docs = [{"key": f"/works/OL{n % 10**6 + k}W", "title": titulo.group(1) if titulo else "", "author_name": [autor.group(1)] if autor else [],
+                 "publish_year": [1980 + (n + k) % 45], "isbn": [f"978{(n + k) % 10**10:010d}"]} for k in range(n % 3)]
+        return "application/json", {"numFound": len(docs), "docs": docs}
+    return None
+
+
+# --- Servidor local ---
+class Servidor(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, modo, directorio=None, latencia_ms=0.0, jitter_ms=0.0, fallos=0.0, limite=0.0, caidas=()):
+        super().__init__(("127.0.0.1", 0), Manejador)
+        self.modo, self.directorio = modo, directorio
+        self.latencia, self.jitter = latencia_ms / 1000.0, jitter_ms / 1000.0
+        self.latencia_cultura, self.latencia_sin_resultado = 0.0, 0.0 # Latencia añadida a Cultura.gob y a sus búsquedas sin resultado (s)
+        self.tasa_503, self.tasa_429, self.caidas = fallos, limite, list(caidas) # caidas: (backend, inicio_s, fin_s)
+        self.inicio, self.inyectados = time.monotonic(), 0
+        self.grabadas, self.lock = {}, threading.Lock()
+        self.aciertos, self.fallos = 0, 0
+        self._fichero = None
+        if modo == "reproducir" and directorio:
+            with open(os.path.join(directorio, FICHERO_RESPUESTAS), encoding="utf-8") as f:
+                for linea in f:
+                    r = json.loads(linea); self.grabadas[r["clave"]] = r
+        elif modo == "grabar":
+            import requests
+            self._upstream = requests.Session()
+            self._fichero = open(os.path.join(directorio, FICHERO_RESPUESTAS), "a", encoding="utf-8")
+
+    @property
+    def url(self):
+        return f"http://127.0.0.1:{self.server_address[1]}"
+
+    def reiniciar_reloj(self):
+        self.inicio = time.monotonic()
+
+    def fallo_inyectado(self, ruta):
+        backend = "cultura" if ruta.startswith(CULTURA_PREFIX) else "ol"
+        t = time.monotonic() - self.inicio
+        if any(b == backend and ini <= t < fin for b, ini, fin in self.caidas): return 503
+        azar = random.random()
+        if azar < self.tasa_503: return 503
+        if azar < self.tasa_503 + self.tasa_429: return 429
+        return None
+
+    def guardar(self, registro):
+        with self.lock:
+            if registro["clave"] in self.grabadas: return
+            self.grabadas[registro["clave"]] = registro
+            self._fichero.write(json.dumps(registro) + "\n"); self._fichero.flush()
+
+    def server_close(self):
+        super().server_close()
+        if self._fichero: self._fichero.close()
+
+
+class Manejador(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True # Cabeceras y cuerpo van en escrituras separadas: sin esto cada respuesta espera el ACK retardado (~40 ms)
+
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        self._responder("GET", b"")
+
+    def do_POST(self):
+        self._responder("POST", self.rfile.read(int(self.headers.get("Content-Length") or 0)))
+
+    def _enviar(self, estado, tipo, cuerpo, cabeceras=()):
+        self.send_response(estado)
+        self.send_header("Content-Type", tipo)
+        self.send_header("Content-Length", str(len(cuerpo)))
+        for nombre, valor in cabeceras: self.send_header(nombre, valor)
+        self.end_headers()
+        self.wfile.write(cuerpo)
+
+    def _responder(self, metodo, cuerpo):
+        srv, clave = self.server, clave_peticion(metodo, self.path, cuerpo)
+        if srv.modo == "grabar": return self._reenviar(metodo, cuerpo, clave)
+        if srv.latencia or srv.jitter: time.sleep(max(0.0, srv.latencia + random.uniform(-srv.jitter, srv.jitter)))
+        if srv.latencia_cultura and self.path.startswith(CULTURA_PREFIX) and metodo == "POST": time.sleep(srv.latencia_cultura)
+        estado = srv.fallo_inyectado(self.path)
+        if estado:
+            with srv.lock: srv.inyectados += 1
+            return self._enviar(estado, "text/plain", b"fallo inyectado", [("Retry-After", "1")])
+        if srv.directorio:
+            r = srv.grabadas.get(clave)
+            respuesta = (r["estado"], r["tipo"], base64.b64decode(r["cuerpo"])) if r else None
+        else:
+            sintetica = respuesta_sintetica(metodo, self.path, cuerpo)
+            respuesta = None if sintetica is None else (200, sintetica[0], (sintetica[1] if isinstance(sintetica[1], str) else json.dumps(sintetica[1])).encode("utf-8"))
+            if srv.latencia_sin_resultado and respuesta and b'id="aviso"' in respuesta[2]: time.sleep(srv.latencia_sin_resultado)
+        with srv.lock:
+            if respuesta: srv.aciertos += 1
+            else: srv.fallos += 1
+        if respuesta: self._enviar(*respuesta)
+        else: self._enviar(404, "text/plain", b"no grabado")
+
+    def _reenviar(self, metodo, cuerpo, clave):
+        srv = self.server
+        destino = (CULTURA_UPSTREAM if self.path.startswith(CULTURA_PREFIX) else OL_UPSTREAM) + self.path
+        cabeceras = {k: v for k, v in self.headers.items() if k.lower() in ("cookie", "content-type", "user-agent", "accept")}
+        try:
+            r = srv._upstream.request(metodo, destino, data=cuerpo or None, headers=cabeceras, timeout=30, allow_redirects=False)
+        except Exception as e:
+            return self._enviar(502, "text/plain", str(e).encode("utf-8"))
+        tipo = r.headers.get("Content-Type", "application/octet-stream")
+        if r.status_code in (200, 404):
+            srv.guardar({"clave": clave, "estado": r.status_code, "tipo": tipo, "cuerpo": base64.b64encode(r.content).decode("ascii")})
+        # Las cookies de sesión de Cultura.gob se devuelven sin dominio ni Secure para que valgan en 127.0.0.1
+        cookies = [("Set-Cookie", re.sub(r";\s*(Domain=[^;]*|Secure)", "", c, flags=re.IGNORECASE)) for c in r.raw.headers.getlist("Set-Cookie")]
+        if "Location" in r.headers: cookies.append(("Location", r.headers["Location"].replace(CULTURA_UPSTREAM, srv.url).replace(OL_UPSTREAM, srv.url)))
+        self._enviar(r.status_code, tipo, r.content, cookies)
+
+
+# --- Hojas de prueba ---
+def hoja_sintetica(filas, proporcion_es, semilla=11):
+    import pandas as pd
+    rnd = random.Random(semilla)
+    return pd.DataFrame({
+        "Title": [f"Obra sintética {_letras(i)} volumen {i}" for i in range(filas)],
+        "Author": [f"{_letras(i % 500)}, Nombre" for i in range(filas)],
+        "year": [str(1960 + i % 40) for i in range(filas)],
+        "Idioma": ["es" if rnd.random() < proporcion_es else "no-es" for _ in range(filas)],
+        "ISBN": [f"978{i:010d}" for i in range(filas)],
+    })
+
+
+def hoja_grabada(directorio, filas):
+    # Se repiten cíclicamente las filas de la hoja grabada hasta el tamaño pedido
+    import app
+    nombre = next(f for f in os.listdir(directorio) if f.startswith("hoja"))
+    base = app.read_input_table(os.path.join(directorio, nombre))
+    return base.iloc[[i % len(base) for i in range(filas)]].reset_index(drop=True)
+
+
+# --- Ejecución en un proceso aparte ---
+def _rss_descendientes_mb():
+    """RSS total (MB) de los procesos descendientes (Chromium y chromedriver), leído de /proc."""
+    hijos = {}
+    for pid in filter(str.isdigit, os.listdir("/proc")):
+        try:
+            with open(f"/proc/{pid}/stat") as f: ppid = int(f.read().rsplit(")", 1)[1].split()[1])
+        except (OSError, IndexError, ValueError): continue
+        hijos.setdefault(ppid, []).append(pid)
+    total, pendientes = 0, list(hijos.get(os.getpid(), []))
+    while pendientes:
+        pid = pendientes.pop()
+        pendientes.extend(hijos.get(int(pid), []))
+        try:
+            with open(f"/proc/{pid}/status") as f: total += next((int(l.split()[1]) for l in f if l.startswith("VmRSS:")), 0)
+        except OSError: continue
+    return total / 1024
+
+
+def _percentiles(valores):
+    if not valores: return {"n": 0}
+    valores = sorted(valores)
+    pct = lambda p: valores[min(len(valores) - 1, int(len(valores) * p))] * 1000
+    return {"n": len(valores), "p50": pct(0.50), "p95": pct(0.95), "p99": pct(0.99)}
+
+
+def ejecutar_hijo(args):
+    import app
+    tiempos = {"ol": [], "cultura": []}
+
+    def cronometrar(backend, fn):
+        def envoltura(*a, **kv):
+            t0 = time.perf_counter()
+            try: return fn(*a, **kv)
+            finally: tiempos[backend].append(time.perf_counter() - t0)
+        return envoltura
+
+    app.g_ol = cronometrar("ol", app.g_ol)
+    app.search_book_cultura = cronometrar("cultura", app.search_book_cultura)
+
+    df = hoja_grabada(args.dir, args.filas) if args.dir else hoja_sintetica(args.filas, args.proporcion_es)
+    ruta = os.path.abspath(f"hoja_{args.filas}.xlsx")
+    df.to_excel(ruta, index=False)
+    base_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    pico_navegador, terminado = [0.0], threading.Event()
+    def muestrear_navegador():
+        while not terminado.wait(0.5): pico_navegador[0] = max(pico_navegador[0], _rss_descendientes_mb())
+    if args.cultura_backend != "http": threading.Thread(target=muestrear_navegador, daemon=True).start()
+    t0 = time.perf_counter()
+    ultimo = None
+    try:
+        for ultimo in app.process_excel_generator(ruta, resume=False): pass
+    finally: terminado.set()
+    segundos = time.perf_counter() - t0
+    pico_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss # KiB en Linux
+    ok = isinstance(ultimo, tuple) and os.path.exists(ultimo[0])
+    exitos = int(app.read_input_table(ultimo[0])['Resultado'].astype(str).str.contains("Éxito").sum()) if ok else 0
+    if app.cultura_driver_pool_global: app.cultura_driver_pool_global.close()
+    print(json.dumps({"filas": args.filas, "segundos": segundos, "filas_s": args.filas / segundos if segundos else 0.0, "ok": ok, "exitos": exitos,
+                      "pico_rss_mb": pico_rss / 1024, "delta_rss_mb": (pico_rss - base_rss) / 1024, "pico_rss_navegador_mb": pico_navegador[0],
+                      "ol": _percentiles(tiempos["ol"]), "cultura": _percentiles(tiempos["cultura"])}))
+
+
+def lanzar_hijo(servidor, args, filas, trabajo):
+    env = dict(os.environ, OL_BASE_URL=servidor.url, CULTURA_BASE_URL=servidor.url + CULTURA_PREFIX,
+               OL_CACHE_PATH=os.path.join(trabajo, "ol_cache.sqlite3"), JOURNAL_DIR=os.path.join(trabajo, "journals"),
+               CULTURA_BACKEND=args.cultura_backend, CULTURA_LEAN_BROWSER="1" if args.navegador == "ligero" else "0")
+    if args.especulativa: env.update(ES_SPECULATIVE_OL="1")
+    if args.ol_rps: env.update(OL_REQUESTS_PER_SECOND=str(args.ol_rps), OL_RATE_BURST=str(max(1, int(args.ol_rps))))
+    comando = [sys.executable, os.path.abspath(__file__), "--hijo", "--filas", str(filas), "--proporcion-es", str(args.proporcion_es)]
+    if args.dir: comando += ["--dir", os.path.abspath(args.dir)]
+    salida = subprocess.run(comando, cwd=trabajo, env=env, check=True, capture_output=True, text=True).stdout
+    return json.loads(salida.strip().splitlines()[-1])
+
+
+def grabar(args):
+    os.makedirs(args.dir, exist_ok=True)
+    shutil.copy(args.hoja, os.path.join(args.dir, "hoja" + os.path.splitext(args.hoja)[1]))
+    servidor = Servidor("grabar", args.dir)
+    threading.Thread(target=servidor.serve_forever, daemon=True).start()
+    trabajo = tempfile.mkdtemp(prefix="bench_grabar_")
+    try:
+        import app
+        filas = len(app.read_input_table(args.hoja))
+        args.ol_rps = None # Se respeta el límite de la aplicación con los sitios reales
+        resultado = lanzar_hijo(servidor, args, filas, trabajo)
+        print(f"Grabadas {len(servidor.grabadas)} respuestas de {filas} filas en {args.dir} ({resultado['segundos']:.0f} s)")
+    finally:
+        servidor.shutdown(); servidor.server_close()
+        shutil.rmtree(trabajo, ignore_errors=True)
+
+
+def reproducir(args):
+    caidas = [(c.split(":")[0], float(c.split(":")[1]), float(c.split(":")[2])) for c in args.caida]
+    servidor = Servidor("reproducir", args.dir, args.latencia_ms, args.jitter_ms, args.fallos, args.limite, caidas)
+    servidor.latencia_cultura, servidor.latencia_sin_resultado = args.latencia_cultura_ms / 1000.0, args.latencia_sin_resultado_ms / 1000.0
+    threading.Thread(target=servidor.serve_forever, daemon=True).start()
+    origen = f"grabación {args.dir}" if args.dir else "respuestas sintéticas"
+    print(f"Origen: {origen}; latencia {args.latencia_ms:.0f}±{args.jitter_ms:.0f} ms; Cultura.gob por {args.cultura_backend}; OL a {args.ol_rps} peticiones/s")
+    print(f"{'filas':>7} {'segundos':>9} {'filas/s':>8} {'OL p50/p95/p99 ms':>22} {'Cultura p50/p95/p99 ms':>25} {'pico RSS MB':>12} {'éxitos':>7} {'404':>6} {'inyectados':>10}")
+    try:
+        for filas in args.filas:
+            trabajo = tempfile.mkdtemp(prefix="bench_pipeline_")
+            fallos_previos, inyectados_previos = servidor.fallos, servidor.inyectados
+            servidor.reiniciar_reloj()
+            try: r = lanzar_hijo(servidor, args, filas, trabajo)
+            finally: shutil.rmtree(trabajo, ignore_errors=True)
+            fmt = lambda p: f"{p['p50']:.0f}/{p['p95']:.0f}/{p['p99']:.0f} (n={p['n']})" if p["n"] else "-"
+            print(f"{filas:>7} {r['segundos']:>9.1f} {r['filas_s']:>8.1f} {fmt(r['ol']):>22} {fmt(r['cultura']):>25} "
+                  f"{r['pico_rss_mb']:>12.1f} {r['exitos']:>7} {servidor.fallos - fallos_previos:>6} {servidor.inyectados - inyectados_previos:>10}" + ("" if r["ok"] else "  (sin Excel de salida)"))
+            if r["pico_rss_navegador_mb"]: print(f"{'':>7} pico RSS de Chromium y chromedriver: {r['pico_rss_navegador_mb']:.1f} MB")
+    finally:
+        servidor.shutdown(); servidor.server_close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("modo", nargs="?", choices=["grabar", "reproducir"], default="reproducir")
+    parser.add_argument("hoja", nargs="?", help="Hoja real a procesar al grabar")
+    parser.add_argument("--dir", help="Carpeta de la grabación")
+    parser.add_argument("--filas", type=int, nargs="+", default=[100, 1000, 10000])
+    parser.add_argument("--latencia-ms", type=float, default=80.0)
+    parser.add_argument("--jitter-ms", type=float, default=20.0)
+    parser.add_argument("--fallos", type=float, default=0.0, help="Fracción de respuestas 503 inyectadas")
+    parser.add_argument("--limite", type=float, default=0.0, help="Fracción de respuestas 429 inyectadas")
+    parser.add_argument("--caida", action="append", default=[], metavar="BACKEND:INICIO:FIN", help="Ventana (s) en la que 'ol' o 'cultura' devuelve 503")
+    parser.add_argument("--proporcion-es", type=float, default=0.3, help="Fracción de filas 'es' en las hojas sintéticas")
+    parser.add_argument("--ol-rps", type=float, default=100.0, help="OL_REQUESTS_PER_SECOND al reproducir (el servidor es local)")
+    parser.add_argument("--cultura-backend", choices=["http", "selenium", "auto"], default="http")
+    parser.add_argument("--latencia-cultura-ms", type=float, default=0.0, help="Latencia añadida a cada búsqueda en Cultura.gob")
+    parser.add_argument("--latencia-sin-resultado-ms", type=float, default=0.0, help="Latencia añadida a las búsquedas de Cultura.gob sin resultado")
+    parser.add_argument("--especulativa", action="store_true", help="ES_SPECULATIVE_OL=1: filas 'es' en Open Library a la vez que en Cultura.gob")
+    parser.add_argument("--navegador", choices=["ligero", "completo"], default="ligero", help="Perfil de Chromium con --cultura-backend selenium")
+    parser.add_argument("--hijo", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.hijo:
+        args.filas = args.filas[0]
+        return ejecutar_hijo(args)
+    if args.modo == "grabar":
+        if not args.hoja or not args.dir: parser.error("grabar necesita la hoja y --dir")
+        return grabar(args)
+    return reproducir(args)
+
+
+if __name__ == "__main__":
+    main()
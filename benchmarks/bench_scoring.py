@@ -0,0 +1,108 @@
+"""
+Benchmark de la elección de edición entre muchos candidatos: bucle anterior (author_ok_ol y y_ol por
+edición, normalizando con unidecode en cada llamada) frente a edition_candidate_ol + EditionScorer
+(normalización en caché y puntuación en bloque). Comprueba además que ambos eligen el mismo año.
+
+Uso:
+    python benchmarks/bench_scoring.py [--ediciones 5000] [--busquedas 50]
+"""
+import argparse
+import os
+import random
+import re
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import unidecode
+from dateutil import parser as du
+
+import app
+
+AUTORES = ["Gabriel García Márquez", "García Márquez, Gabriel", "G. García Márquez", "Isabel Allende", "Mario Vargas Llosa",
+           "Julio Cortázar", "Jorge Luis Borges", "Edith Grossman (trad.)"]
+FECHAS = ["{y}", "March {y}", "{y}-05-01", "c{y}", "1 de enero de {y}", "[{y}]", "{y}?", "Spring {y}"]
+TITULOS = ["Cien años de soledad", "Cien Años de Soledad (edición conmemorativa)", "One Hundred Years of Solitude", "Cent ans de solitude"]
+
+
+def generar_ediciones(n, semilla):
+    rnd = random.Random(semilla)
+    return [{"key": f"/books/OL{i}M", "title": rnd.choice(TITULOS), "publish_date": rnd.choice(FECHAS).format(y=rnd.randrange(1967, 2025)),
+             "isbn_13": [f"978{rnd.randrange(10**9, 10**10)}"] if rnd.random() < 0.8 else [],
+             "author_list_resolved": rnd.sample(AUTORES, rnd.randrange(1, 3))} for i in range(n)]
+
+
+# Réplica del método previo
+def y_anterior(date_input):
+    if not date_input: return None
+    date_str = str(date_input[0]) if isinstance(date_input, list) and date_input else str(date_input)
+    try:
+        if re.fullmatch(r'\d{4}', date_str):
+            year = int(date_str)
+            if 1700 <= year <= 2100: return year
+    except: pass
+    try: return du.parse(date_str, fuzzy=True, ignoretz=True).year
+    except:
+        m = re.search(r"\b(1[7-9]\d{2}|20\d{2}|2100)\b", date_str)
+        return int(m.group(1)) if m else None
+
+
+def author_ok_anterior(targets, ol_authors):
+    if not targets or (len(targets)==1 and targets[0]=="No disponible"): return True
+    if not ol_authors: return False
+    targets_p = [unidecode.unidecode(str(t)).lower().strip() for t in targets if t and str(t).strip()]
+    ol_authors_p = [unidecode.unidecode(str(a)).lower().strip() for a in ol_authors if a and str(a).strip()]
+    if not targets_p: return True
+    for t_full in targets_p:
+        t_parts = [p for p in t_full.split() if p]
+        if not t_parts: continue
+        for ol_full in ol_authors_p:
+            if not ol_full: continue
+            if t_full == ol_full or all(p in ol_full for p in t_parts): return True
+            if t_parts[-1] in ol_full.split() and (len(t_parts)==1 or any(np in ol_full for np in t_parts[:-1])): return True
+    return False
+
+
+def mejor_anterior(ediciones, filter_authors):
+    best_year = -1
+    for e_data in ediciones:
+        if filter_authors and not author_ok_anterior(filter_authors, e_data.get("author_list_resolved", [])): continue
+        year = y_anterior(e_data.get("publish_date") or e_data.get("publish_year"))
+        if not year or year < 1700: continue
+        if year > best_year: best_year = year
+    return best_year
+
+
+def mejor_motor(ediciones, filter_authors, titulo):
+    candidatos = [c for c in map(app.edition_candidate_ol, ediciones) if c is not None]
+    ranking = app.EditionScorer(filter_authors, titulo).rank(candidatos)
+    return ranking[0][1][0] if ranking else -1
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--ediciones", type=int, default=5000, help="Candidatos por búsqueda")
+    parser.add_argument("--busquedas", type=int, default=50)
+    args = parser.parse_args()
+
+    lotes = [generar_ediciones(args.ediciones, semilla) for semilla in range(args.busquedas)]
+    filtro, titulo = ["Garcia Marquez"], "Cien anos soledad"
+
+    t0 = time.perf_counter()
+    anterior = [mejor_anterior(lote, filtro) for lote in lotes]
+    t_anterior = time.perf_counter() - t0
+    t0 = time.perf_counter()
+    motor = [mejor_motor(lote, filtro, titulo) for lote in lotes]
+    t_motor = time.perf_counter() - t0
+
+    print(f"{args.busquedas} búsquedas de {args.ediciones} ediciones")
+    print(f"{'método':<10} {'ms/búsqueda':>12}")
+    print(f"{'anterior':<10} {1000 * t_anterior / args.busquedas:>12.1f}")
+    print(f"{'motor':<10} {1000 * t_motor / args.busquedas:>12.1f}")
+    print(f"Mismo año elegido: {anterior == motor}")
+    return 0 if anterior == motor else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
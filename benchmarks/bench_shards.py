@@ -0,0 +1,84 @@
+"""
+Benchmark de la ejecución por fragmentos: la misma hoja sintética procesada por la línea de comandos
+en un solo proceso y repartida en N procesos locales (--fragmentos N), contra el servidor local de
+bench_pipeline.py. Se informa del tiempo total y de si el Resultados_*.xlsx fusionado es idéntico
+al del proceso único (mismas filas, en el mismo orden y con los mismos valores).
+
+Con --nodos se simulan además equipos distintos: cada fragmento se lanza con --fragmento K desde su
+propio directorio de trabajo, compartiendo solo el directorio de salida, y luego se fusiona con --fusionar.
+
+Uso:
+    python benchmarks/bench_shards.py [--filas 2000] [--fragmentos 1 2 4] [--latencia-ms 80] [--nodos]
+"""
+import argparse
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import pandas as pd
+
+from bench_pipeline import CULTURA_PREFIX, Servidor, hoja_sintetica
+
+APP = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "app.py")
+
+
+def lanzar(entorno, cwd, *argumentos):
+    t0 = time.perf_counter()
+    r = subprocess.run([sys.executable, APP, *argumentos], cwd=cwd, env=entorno, capture_output=True, text=True)
+    if r.returncode != 0: print(r.stdout[-2000:], r.stderr[-2000:])
+    return time.perf_counter() - t0
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--filas", type=int, default=2000)
+    parser.add_argument("--fragmentos", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--latencia-ms", type=float, default=80.0)
+    parser.add_argument("--proporcion-es", type=float, default=0.3)
+    parser.add_argument("--rps", type=float, default=400.0, help="Presupuesto total de peticiones/s por sitio (se reparte entre los fragmentos)")
+    parser.add_argument("--nodos", action="store_true", help="Simular también equipos distintos con --fragmento y --fusionar")
+    args = parser.parse_args()
+
+    servidor = Servidor("reproducir", None, args.latencia_ms, args.latencia_ms / 4)
+    threading.Thread(target=servidor.serve_forever, daemon=True).start()
+    trabajo = tempfile.mkdtemp(prefix="bench_fragmentos_")
+    entorno = dict(os.environ, OL_BASE_URL=servidor.url, CULTURA_BASE_URL=servidor.url + CULTURA_PREFIX, OL_CACHE_PATH="", CULTURA_BACKEND="http",
+                   OL_REQUESTS_PER_SECOND=str(args.rps), OL_RATE_BURST=str(int(args.rps)), CULTURA_REQUESTS_PER_SECOND=str(args.rps))
+    try:
+        hoja = os.path.join(trabajo, "hoja.xlsx")
+        hoja_sintetica(args.filas, args.proporcion_es).to_excel(hoja, index=False)
+        print(f"{args.filas} filas ({args.proporcion_es:.0%} 'es'); latencia {args.latencia_ms:.0f} ms; {args.rps:g} peticiones/s por sitio en total")
+        print(f"{'ejecución':<22} {'segundos':>9} {'filas/s':>8}  idéntico")
+        referencia = None
+        casos = [(f"{n} proceso(s)", n, False) for n in args.fragmentos] + ([(f"{n} nodos simulados", n, True) for n in args.fragmentos if n > 1] if args.nodos else [])
+        for nombre, n, nodos in casos:
+            salida = os.path.join(trabajo, f"salida_{n}_{int(nodos)}")
+            if n == 1: segundos = lanzar(entorno, trabajo, hoja, "--salida", salida)
+            elif not nodos: segundos = lanzar(entorno, trabajo, hoja, "--salida", salida, "--fragmentos", str(n))
+            else:
+                # Cada "equipo" con su propio directorio de trabajo (caché y diarios locales) y su parte del presupuesto
+                parte = dict(entorno, OL_REQUESTS_PER_SECOND=str(args.rps / n), OL_RATE_BURST=str(max(1, int(args.rps / n))), CULTURA_REQUESTS_PER_SECOND=str(args.rps / n))
+                t0 = time.perf_counter()
+                hilos = [threading.Thread(target=lanzar, args=(parte, tempfile.mkdtemp(dir=trabajo), hoja, "--salida", salida, "--fragmentos", str(n), "--fragmento", str(k)))
+                         for k in range(1, n + 1)]
+                for h in hilos: h.start()
+                for h in hilos: h.join()
+                lanzar(entorno, trabajo, hoja, "--salida", salida, "--fragmentos", str(n), "--fusionar")
+                segundos = time.perf_counter() - t0
+            resultado = pd.read_excel(os.path.join(salida, "Resultados_hoja.xlsx"))
+            referencia = resultado if referencia is None else referencia
+            print(f"{nombre:<22} {segundos:>9.1f} {args.filas / segundos:>8.1f}  {resultado.equals(referencia)}")
+    finally:
+        servidor.shutdown(); servidor.server_close()
+        shutil.rmtree(trabajo, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
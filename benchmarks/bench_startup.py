@@ -0,0 +1,53 @@
+"""
+Benchmark del arranque: tiempo hasta tener la aplicación lista en un proceso nuevo, para el modo por
+lotes (solo `import app`, sin Gradio ni Selenium) y para la interfaz (`app.demo`), junto con el coste
+de importar por separado gradio y selenium. Cada caso se mide varias veces y se da la mediana.
+
+Uso:
+    python benchmarks/bench_startup.py [--repeticiones 5]
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+CASOS = [
+    ("import app (lotes)", "import app"),
+    ("python app.py --help", None),
+    ("app.demo (interfaz)", "import app; app.demo"),
+    ("import gradio", "import gradio"),
+    ("import selenium", "from selenium import webdriver; from selenium.webdriver.support import expected_conditions"),
+]
+
+SONDA = "import json, sys; print(json.dumps({m: m in sys.modules for m in ('gradio', 'selenium')}))"
+
+
+def medir(codigo):
+    comando = [sys.executable, os.path.join(RAIZ, "app.py"), "--help"] if codigo is None else [sys.executable, "-c", codigo]
+    t0 = time.perf_counter()
+    subprocess.run(comando, cwd=RAIZ, check=True, capture_output=True)
+    return time.perf_counter() - t0
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeticiones", type=int, default=5)
+    args = parser.parse_args()
+
+    medir("pass") # Calienta la caché de disco del intérprete
+    print(f"{'caso':<24} {'mediana s':>10} {'mín s':>7}")
+    for nombre, codigo in CASOS:
+        tiempos = [medir(codigo) for _ in range(args.repeticiones)]
+        print(f"{nombre:<24} {statistics.median(tiempos):>10.2f} {min(tiempos):>7.2f}")
+
+    cargados = subprocess.run([sys.executable, "-c", "import app; " + SONDA], cwd=RAIZ, check=True, capture_output=True, text=True).stdout
+    print(f"Módulos cargados tras import app: {json.loads(cargados.strip().splitlines()[-1])}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,197 @@
+"""
+Índice local de ediciones de Open Library construido a partir de sus volcados (dumps).
+
+Los volcados (https://openlibrary.org/developers/dumps) son TSV comprimidos con gzip con las
+columnas: tipo, clave, revisión, última modificación y el registro en JSON. Este módulo los lee
+en streaming y genera un índice SQLite compacto que responde a las mismas preguntas que la API:
+ISBN -> obras, autores y ediciones de una obra y búsqueda por tokens de título y autor.
+
+Construcción:
+    python ol_index.py --authors ol_dump_authors.txt.gz --works ol_dump_works.txt.gz \
+        --editions ol_dump_editions.txt.gz --out ol_index.sqlite3
+"""
+import argparse
+import gzip
+import json
+import re
+import sqlite3
+import sys
+import threading
+import time
+
+import unidecode
+
+BATCH_ROWS = 10000
+YEAR_PATTERN = re.compile(r"\b(1[7-9]\d{2}|20\d{2}|2100)\b")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS authors (key TEXT PRIMARY KEY, name TEXT);
+CREATE TABLE IF NOT EXISTS works (key TEXT PRIMARY KEY, title TEXT, author_keys TEXT);
+CREATE TABLE IF NOT EXISTS editions (key TEXT PRIMARY KEY, work_key TEXT, title TEXT, publish_date TEXT,
+    publish_year INTEGER, isbn_13 TEXT, isbn_10 TEXT, author_keys TEXT);
+CREATE TABLE IF NOT EXISTS edition_isbn (isbn TEXT, edition_key TEXT, PRIMARY KEY (isbn, edition_key)) WITHOUT ROWID;
+"""
+INDEXES = """
+CREATE INDEX IF NOT EXISTS idx_editions_work ON editions(work_key);
+"""
+
+
+def normalize_tokens(text):
+    """Tokens en minúsculas, sin acentos ni signos, como los que se indexan."""
+    return re.sub(r"[^a-z0-9\s]", " ", unidecode.unidecode(str(text or "")).lower()).split()
+
+
+def _iter_dump(path):
+    opener = gzip.open if path.endswith(".gz") else open
+    with opener(path, "rt", encoding="utf-8") as f:
+        for line in f:
+            parts = line.rstrip("\n").split("\t")
+            if len(parts) < 5: continue
+            try: yield parts[0], parts[1], json.loads(parts[4])
+            except ValueError: continue
+
+
+def _ref_keys(refs, nested):
+    keys = []
+    for ref in refs or []:
+        if not isinstance(ref, dict): continue
+        entry = ref.get(nested, ref) if nested in ref else ref
+        key = entry.get("key") if isinstance(entry, dict) else None
+        if key: keys.append(key)
+    return keys
+
+
+def _clean_isbns(values):
+    return [str(v).replace("-", "").replace(" ", "").strip() for v in values or [] if str(v).strip()]
+
+
+def _author_row(record):
+    return record.get("key"), record.get("name") or record.get("personal_name") or ""
+
+
+def _work_row(record):
+    return record.get("key"), record.get("title") or "", json.dumps(_ref_keys(record.get("authors"), "author"))
+
+
+def _edition_row(record):
+    works = _ref_keys(record.get("works"), "work")
+    publish_date = str(record.get("publish_date") or "")
+    year = YEAR_PATTERN.search(publish_date)
+    return (record.get("key"), works[0] if works else None, record.get("title") or "", publish_date,
+            int(year.group(1)) if year else None, json.dumps(_clean_isbns(record.get("isbn_13"))),
+            json.dumps(_clean_isbns(record.get("isbn_10"))), json.dumps(_ref_keys(record.get("authors"), "author")))
+
+
+def _ingest(conn, path, record_type, row_fn, sql, log):
+    batch, total, t0 = [], 0, time.time()
+    isbn_batch = []
+    for tipo, _, record in _iter_dump(path):
+        if tipo != record_type: continue
+        row = row_fn(record)
+        if not row[0]: continue
+        batch.append(row)
+        if record_type == "/type/edition":
+            isbn_batch.extend((isbn, row[0]) for isbn in json.loads(row[5]) + json.loads(row[6]))
+        if len(batch) >= BATCH_ROWS:
+            conn.executemany(sql, batch); total += len(batch); batch = []
+            if isbn_batch: conn.executemany("INSERT OR IGNORE INTO edition_isbn VALUES (?, ?)", isbn_batch); isbn_batch = []
+            if total % (BATCH_ROWS * 50) == 0: log(f"  {record_type}: {total} registros ({time.time() - t0:.0f} s)")
+    if batch: conn.executemany(sql, batch); total += len(batch)
+    if isbn_batch: conn.executemany("INSERT OR IGNORE INTO edition_isbn VALUES (?, ?)", isbn_batch)
+    conn.commit()
+    log(f"{record_type}: {total} registros cargados desde {path} ({time.time() - t0:.0f} s)")
+
+
+def build_index(out_path, authors=None, works=None, editions=None, log=print):
+    """Construye (o amplía) el índice SQLite a partir de los volcados indicados."""
+    conn = sqlite3.connect(out_path)
+    conn.execute("PRAGMA journal_mode=OFF"); conn.execute("PRAGMA synchronous=OFF")
+    conn.executescript(SCHEMA)
+    if authors: _ingest(conn, authors, "/type/author", _author_row, "INSERT OR REPLACE INTO authors VALUES (?, ?)", log)
+    if works: _ingest(conn, works, "/type/work", _work_row, "INSERT OR REPLACE INTO works VALUES (?, ?, ?)", log)
+    if editions: _ingest(conn, editions, "/type/edition", _edition_row, "INSERT OR REPLACE INTO editions VALUES (?, ?, ?, ?, ?, ?, ?, ?)", log)
+    conn.executescript(INDEXES)
+
+    # Búsqueda por tokens normalizados de título y autor, a nivel de obra
+    log("Construyendo el índice de texto de obras...")
+    conn.execute("DROP TABLE IF EXISTS works_fts")
+    conn.execute("CREATE VIRTUAL TABLE works_fts USING fts5(work_key UNINDEXED, title, authors, tokenize='unicode61 remove_diacritics 2')")
+    # En una sola sentencia: los nombres de autor se buscan por clave obra a obra, sin cargar la tabla en memoria
+    conn.create_function("tokens", 1, lambda text: " ".join(normalize_tokens(text)), deterministic=True)
+    conn.execute("INSERT INTO works_fts SELECT w.key, tokens(w.title), tokens((SELECT group_concat(a.name, ' ') "
+                 "FROM json_each(w.author_keys) AS j JOIN authors AS a ON a.key = j.value)) FROM works AS w")
+    conn.commit()
+    conn.execute("VACUUM")
+    conn.close()
+    log(f"Índice local generado en {out_path}")
+
+
+class OLLocalIndex:
+    """Consultas sobre el índice local con la misma forma de resultado que las funciones *_ol de app.py."""
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local() # Una conexión de solo lectura por hilo
+
+    @property
+    def _conn(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = self._local.conn = sqlite3.connect(f"file:{self.path}?mode=ro", uri=True)
+        return conn
+
+    def _author_names(self, author_keys):
+        keys = json.loads(author_keys or "[]")
+        if not keys: return []
+        placeholders = ",".join("?" * len(keys))
+        names = dict(self._conn.execute(f"SELECT key, name FROM authors WHERE key IN ({placeholders})", keys))
+        return [names[k] for k in keys if names.get(k)]
+
+    def works_from_isbn(self, isbn):
+        rows = self._conn.execute(
+            "SELECT DISTINCT e.work_key FROM edition_isbn i JOIN editions e ON e.key = i.edition_key "
+            "WHERE i.isbn = ? AND e.work_key IS NOT NULL", (str(isbn),)).fetchall()
+        return [r[0] for r in rows]
+
+    def authors_of_work(self, wk):
+        row = self._conn.execute("SELECT author_keys FROM works WHERE key = ?", (wk,)).fetchone()
+        return self._author_names(row[0]) if row else []
+
+    def editions_of_work(self, wk, names_of_work_authors, max_eds=150):
+        eds = []
+        for key, title, publish_date, isbn_13, isbn_10, author_keys in self._conn.execute(
+                "SELECT key, title, publish_date, isbn_13, isbn_10, author_keys FROM editions WHERE work_key = ? LIMIT ?", (wk, max_eds)):
+            eds.append({"key": key, "title": title, "publish_date": publish_date, "isbn_13": json.loads(isbn_13 or "[]"),
+                        "isbn_10": json.loads(isbn_10 or "[]"), "author_list_resolved": self._author_names(author_keys) or names_of_work_authors})
+        return eds
+
+    def search_editions(self, title_for_query, author_for_query_hint="", limit=10):
+        title_tokens, author_tokens = normalize_tokens(title_for_query), normalize_tokens(author_for_query_hint)
+        if not title_tokens: return []
+        match = " AND ".join([f'title : "{t}"' for t in title_tokens] + [f'authors : "{t}"' for t in author_tokens])
+        out = []
+        for (wk,) in self._conn.execute("SELECT work_key FROM works_fts WHERE works_fts MATCH ? LIMIT ?", (match, limit)).fetchall():
+            work = self._conn.execute("SELECT title, author_keys FROM works WHERE key = ?", (wk,)).fetchone()
+            if not work: continue
+            year, isbns = None, []
+            for publish_year, isbn_13, isbn_10 in self._conn.execute("SELECT publish_year, isbn_13, isbn_10 FROM editions WHERE work_key = ?", (wk,)):
+                if publish_year and (year is None or publish_year > year): year = publish_year
+                isbns.extend(json.loads(isbn_13 or "[]") + json.loads(isbn_10 or "[]"))
+            out.append({"key": wk, "title": work[0], "publish_date": str(year) if year else "",
+                        "author_list_resolved": self._author_names(work[1]), "isbn_candidate": isbns})
+        return out
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--authors", help="Volcado de autores (ol_dump_authors_*.txt.gz)")
+    parser.add_argument("--works", help="Volcado de obras (ol_dump_works_*.txt.gz)")
+    parser.add_argument("--editions", help="Volcado de ediciones (ol_dump_editions_*.txt.gz)")
+    parser.add_argument("--out", default="ol_index.sqlite3", help="Fichero SQLite de salida")
+    args = parser.parse_args(argv)
+    if not (args.authors or args.works or args.editions):
+        parser.error("Indica al menos un volcado (--authors, --works o --editions).")
+    build_index(args.out, authors=args.authors, works=args.works, editions=args.editions)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,31 @@
+"""
+Configuración común de las pruebas: la aplicación se apunta, antes de importarla, al servidor local
+de benchmarks/bench_pipeline.py (respuestas sintéticas de Open Library y Cultura.gob), sin caché en disco.
+"""
+import os
+import sys
+import threading
+
+import pytest
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path[:0] = [RAIZ, os.path.join(RAIZ, "benchmarks")]
+
+from bench_pipeline import CULTURA_PREFIX, Servidor
+
+servidor_stub = Servidor("reproducir")
+threading.Thread(target=servidor_stub.serve_forever, daemon=True).start()
+os.environ.update(OL_BASE_URL=servidor_stub.url, CULTURA_BASE_URL=servidor_stub.url + CULTURA_PREFIX, OL_CACHE_PATH="",
+                  OL_REQUESTS_PER_SECOND="200", OL_RATE_BURST="200", CULTURA_REQUESTS_PER_SECOND="200", CULTURA_BACKEND="http")
+
+
+@pytest.fixture
+def procesar(tmp_path, monkeypatch):
+    """Ejecuta process_excel_generator hasta el final (diarios y resultados en tmp_path) y devuelve su última salida."""
+    import app
+    monkeypatch.setattr(app, "JOURNAL_DIR", str(tmp_path / "diarios"))
+    def procesar(ruta, **kwargs):
+        ultimo = None
+        for ultimo in app.process_excel_generator(str(ruta), output_dir=str(tmp_path), **kwargs): pass
+        return ultimo
+    return procesar
@@ -0,0 +1,80 @@
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+import requests
+
+import app
+
+
+class Guion(BaseHTTPRequestHandler):
+    """Responde con los estados de server.guion por orden (200 cuando se acaban); "cortada" corta el cuerpo a medias."""
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        estado = self.server.guion.pop(0) if self.server.guion else 200
+        if estado == "cortada":
+            self.send_response(200)
+            self.send_header("Content-Length", "100")
+            self.end_headers()
+            self.wfile.write(b"{}")
+            self.close_connection = True
+            return
+        self.send_response(estado)
+        self.send_header("Content-Length", "2")
+        self.end_headers()
+        self.wfile.write(b"{}")
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def guion():
+    servidor = ThreadingHTTPServer(("127.0.0.1", 0), Guion)
+    servidor.guion = []
+    threading.Thread(target=servidor.serve_forever, daemon=True).start()
+    yield servidor
+    servidor.shutdown(); servidor.server_close()
+
+
+@pytest.fixture
+def backend(monkeypatch):
+    monkeypatch.setattr(app, "backoff_delay", lambda attempt, retry_after=None: 0)
+    backend = app.RemoteBackend("prueba", "Prueba")
+    backend.breaker = app.CircuitBreaker("Prueba", failure_threshold=2, reset_timeout=0.1)
+    return backend
+
+
+def pedir(backend, servidor):
+    url = f"http://127.0.0.1:{servidor.server_address[1]}/x"
+    return app.request_with_retries(backend, lambda: requests.get(url, timeout=5), max_retries=0)
+
+
+def abrir(backend, servidor):
+    servidor.guion.extend([503, 503])
+    assert pedir(backend, servidor).status_code == 503
+    assert pedir(backend, servidor).status_code == 503
+    assert backend.breaker.state == "abierto"
+    with pytest.raises(app.BackendUnavailable): pedir(backend, servidor)
+    time.sleep(0.15)
+
+
+def test_prueba_con_429_deja_pasar_otra_prueba(backend, guion):
+    abrir(backend, guion)
+    guion.guion.append(429)
+    assert pedir(backend, guion).status_code == 429
+    assert backend.breaker.state == "semiabierto"
+    assert pedir(backend, guion).status_code == 200
+    assert backend.breaker.state == "cerrado"
+
+
+def test_prueba_con_error_no_de_red_reabre_y_se_recupera(backend, guion):
+    abrir(backend, guion)
+    guion.guion.append("cortada")
+    with pytest.raises(requests.exceptions.ChunkedEncodingError): pedir(backend, guion)
+    assert backend.breaker.state == "abierto"
+    time.sleep(0.15)
+    assert pedir(backend, guion).status_code == 200
+    assert backend.breaker.state == "cerrado"
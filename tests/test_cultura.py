@@ -0,0 +1,51 @@
+import pytest
+
+import app
+from conftest import servidor_stub
+
+
+@pytest.fixture
+def modo_auto(monkeypatch):
+    """CULTURA_BACKEND="auto" con backends nuevos, sin esperas entre reintentos y Selenium sustituido por un doble que anota las búsquedas."""
+    monkeypatch.setattr(app, "CULTURA_BACKEND", "auto")
+    monkeypatch.setattr(app, "cultura_http_backend_global", app.RemoteBackend("cultura.http", "Cultura.gob (HTTP)"))
+    monkeypatch.setattr(app, "cultura_selenium_backend_global", app.RemoteBackend("cultura.selenium", "Cultura.gob (Selenium)"))
+    monkeypatch.setattr(app, "cultura_driver_pool_global", None)
+    monkeypatch.setattr(app, "backoff_delay", lambda attempt, retry_after=None: 0.0)
+    monkeypatch.setattr(app._cultura_http_local, "form", None, raising=False)
+    selenium = []
+    def search_book_cultura_gob(lease, title, author):
+        selenium.append((title, author))
+        return "OK", "Libro por Selenium", "Autor", "9788400000000", "2001"
+    monkeypatch.setattr(app, "search_book_cultura_gob", search_book_cultura_gob)
+    yield selenium
+    servidor_stub.caidas.clear()
+
+
+def test_auto_no_usa_selenium_si_responde_el_http(modo_auto):
+    resultado = app.search_book_cultura("Cien años de soledad", "Gabriel García Márquez")
+    assert resultado[0] in ("OK", "No hallado")
+    assert resultado[1] != "Libro por Selenium"
+    assert modo_auto == []
+
+
+def test_auto_recurre_a_selenium_si_falla_el_http(modo_auto):
+    servidor_stub.caidas.append(("cultura", 0, float("inf"))) # Todas las peticiones a Cultura.gob devuelven 503
+    resultado = app.search_book_cultura("Rayuela", "Julio Cortázar")
+    assert resultado == ("OK", "Libro por Selenium", "Autor", "9788400000000", "2001")
+    assert modo_auto == [("Rayuela", "Julio Cortázar")]
+    assert app.cultura_http_backend_global.retries == app.BACKEND_MAX_RETRIES
+
+
+def test_auto_recurre_a_selenium_con_el_circuito_http_abierto(modo_auto):
+    breaker = app.cultura_http_backend_global.breaker
+    while breaker.state != "abierto": breaker.failure()
+    resultado = app.search_book_cultura("Rayuela", "Julio Cortázar")
+    assert resultado[1] == "Libro por Selenium" and len(modo_auto) == 1
+
+
+def test_modo_http_no_recurre_a_selenium(modo_auto, monkeypatch):
+    monkeypatch.setattr(app, "CULTURA_BACKEND", "http")
+    servidor_stub.caidas.append(("cultura", 0, float("inf")))
+    assert app.search_book_cultura("Rayuela", "Julio Cortázar")[0] == "Error HTTP"
+    assert modo_auto == []
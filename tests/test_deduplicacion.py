@@ -0,0 +1,53 @@
+import pandas as pd
+import pytest
+
+import app
+
+
+@pytest.fixture
+def hoja(tmp_path):
+    ruta = tmp_path / "repetidas.xlsx"
+    pd.DataFrame({
+        "Title": ["Obra A", "Obra A", "Obra B", "OBRA  A", "Libro C", "Libro C"],
+        "Author": ["Autor X", "Autor X", "Autor Y", "autor x", "Autora Z", "Autora Z"],
+        "Idioma": ["no-es", "no-es", "no-es", "no-es", "es", "es"],
+        "ISBN": ["9780000000001", "9780000000001", "9780000000002", "9780000000001", None, None],
+        "year": [2000, 2000, 2001, 2000, 2002, 2002],
+    }).to_excel(ruta, index=False)
+    return ruta
+
+
+@pytest.fixture
+def consultas(monkeypatch):
+    """Backends sustituidos por dobles que cuentan las consultas que les llegan."""
+    llamadas = {"ol": [], "cultura": [], "estado_cultura": "OK"}
+    def best_edition_ol(isbn, titulo, autor, year=None):
+        llamadas["ol"].append(titulo)
+        return "OK", f"{titulo} (reedición)", autor, "9780000000099", "2020"
+    def search_book_cultura(titulo, autor):
+        llamadas["cultura"].append(titulo)
+        return llamadas["estado_cultura"], f"{titulo} (reedición)", autor, "9788400000099", "2021"
+    monkeypatch.setattr(app, "best_edition_ol", best_edition_ol)
+    monkeypatch.setattr(app, "search_book_cultura", search_book_cultura)
+    return llamadas
+
+
+def test_las_filas_repetidas_comparten_una_sola_consulta(procesar, hoja, consultas):
+    salida, texto = procesar(hoja)
+    assert sorted(consultas["ol"]) == ["Obra A", "Obra B"] # Mayúsculas y espacios no cuentan
+    assert len(consultas["cultura"]) == 1
+    assert "6 filas con búsqueda, 3 consultas únicas" in texto
+    assert "Deduplicación: 6 consultas pedidas, 3 ejecutadas (3 evitadas, 50.0%)" in texto
+    resultado = pd.read_excel(salida)
+    encontrados = resultado[["Título encontrado", "ISBN encontrado", "Año de edición encontrado", "Resultado"]]
+    assert encontrados.loc[1].equals(encontrados.loc[0]) and encontrados.loc[3].equals(encontrados.loc[0])
+    assert encontrados.loc[5].equals(encontrados.loc[4])
+
+
+def test_los_errores_transitorios_no_se_comparten(hoja, consultas):
+    consultas["estado_cultura"] = "Error HTTP"
+    filas = app.prepare_input_frame(pd.read_excel(hoja)).to_dict("index")
+    memo = app.QueryMemo() # Filas una tras otra: en paralelo, la repetida esperaría al resultado de la primera
+    for index in (4, 5): app.process_row(index, filas[index], len(filas), memo)
+    assert len(consultas["cultura"]) == 2 # La fila repetida lo vuelve a intentar
+    assert consultas["ol"].count("Libro C") == 1 # El respaldo en Open Library sí se comparte
@@ -0,0 +1,62 @@
+import os
+
+import pandas as pd
+import pytest
+
+import app
+from bench_pipeline import hoja_sintetica
+
+
+@pytest.fixture
+def buscadas(monkeypatch):
+    indices = []
+    process_row = app.process_row
+    def fila(index, row, total_rows, memo=None):
+        indices.append(index)
+        return process_row(index, row, total_rows, memo)
+    monkeypatch.setattr(app, "process_row", fila)
+    return indices
+
+
+@pytest.fixture
+def anteriores(procesar, tmp_path):
+    """Hoja de 4 filas ya procesada; sus Resultados quedan aparte como los de una ejecución anterior."""
+    ruta = tmp_path / "hoja.xlsx"
+    hoja = hoja_sintetica(4, 0.0)
+    hoja.to_excel(ruta, index=False)
+    salida, _ = procesar(ruta)
+    previos = pd.read_excel(salida)
+    os.remove(salida)
+    return ruta, hoja, previos, tmp_path / "Anteriores.xlsx"
+
+
+def test_reutiliza_solo_los_exitos_recientes_de_filas_sin_cambios(procesar, anteriores, buscadas):
+    ruta, hoja, previos, ruta_previos = anteriores
+    ayer = (pd.Timestamp.now() - pd.Timedelta(days=1)).strftime("%Y-%m-%d")
+    previos.loc[1, "Resultado"] = "Fallo - No hallado"
+    previos.loc[2, app.RESULT_DATE_COL] = "2000-01-01" # Más antiguo que DELTA_MAX_AGE_DAYS
+    previos.loc[3, ["Título encontrado", app.RESULT_DATE_COL]] = ["Marca anterior", ayer]
+    previos.to_excel(ruta_previos, index=False)
+    hoja.loc[0, "Title"] = "Otra obra distinta" # Fila cambiada
+    nueva = hoja_sintetica(5, 0.0).iloc[[4]]
+    pd.concat([hoja, nueva], ignore_index=True).to_excel(ruta, index=False)
+
+    salida, texto = procesar(ruta, previous_results=str(ruta_previos))
+    assert "Modo delta: 1 filas reutilizadas" in texto
+    assert sorted(buscadas) == [0, 1, 2, 4]
+    resultado = pd.read_excel(salida)
+    assert list(resultado[app.RESULT_ORIGIN_COL]) == ["actualizado"] * 3 + ["reutilizado", "actualizado"]
+    assert resultado.loc[3, "Título encontrado"] == "Marca anterior"
+    assert resultado.loc[3, app.RESULT_DATE_COL] == ayer
+    hoy = pd.Timestamp.now().strftime("%Y-%m-%d")
+    assert (resultado.drop(index=3)[app.RESULT_DATE_COL] == hoy).all()
+    assert resultado.loc[1, "Resultado"].startswith("Éxito") # La fila fallida se volvió a buscar
+
+
+def test_sin_resultados_anteriores_validos_se_busca_todo(procesar, anteriores, buscadas):
+    ruta, _, previos, ruta_previos = anteriores
+    previos.drop(columns=["Resultado"]).to_excel(ruta_previos, index=False)
+    salida, texto = procesar(ruta, previous_results=str(ruta_previos))
+    assert "No se pudieron leer los resultados anteriores" in texto
+    assert sorted(buscadas) == [0, 1, 2, 3]
+    assert app.RESULT_ORIGIN_COL not in pd.read_excel(salida).columns
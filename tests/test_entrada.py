@@ -0,0 +1,25 @@
+import pandas as pd
+
+import app
+
+
+def test_csv_conserva_isbn_y_ceros_iniciales(tmp_path):
+    ruta = tmp_path / "catalogo.csv"
+    ruta.write_text("Title;Author;Idioma;ISBN;year\n"
+                    "Uno;Autor, A;no-es;9788401234567;2001\n"
+                    "Dos;Autor, B;no-es;;2002\n"
+                    "Tres;Autor, C;no-es;0123456789;[2003]\n", encoding="utf-8")
+    df = app.prepare_input_frame(app.read_input_table(ruta))
+    assert list(df['ISBN_prioritario_input']) == ["9788401234567", "", "0123456789"]
+    assert list(df['Year_cleaned_from_input']) == [2001, 2002, 2003]
+
+
+def test_csv_y_xlsx_dan_los_mismos_terminos(tmp_path):
+    filas = pd.DataFrame({"Title": ["Cien años de soledad", "Rayuela"], "Author": ["García Márquez, Gabriel", None],
+                          "Idioma": ["es", "es"], "ISBN": ["9788497592208", None], "year": ["1967", "1963"]})
+    filas.to_csv(tmp_path / "h.csv", index=False)
+    filas.to_excel(tmp_path / "h.xlsx", index=False)
+    columnas = ['ISBN_prioritario_input', 'Year_cleaned_from_input'] + app.SEARCH_TERM_COLS
+    csv = app.prepare_input_frame(app.read_input_table(tmp_path / "h.csv"))[columnas]
+    xlsx = app.prepare_input_frame(app.read_input_table(tmp_path / "h.xlsx"))[columnas]
+    assert csv.astype(str).equals(xlsx.astype(str))
@@ -0,0 +1,52 @@
+import pandas as pd
+import pytest
+
+import app
+
+
+@pytest.fixture
+def hoja(tmp_path):
+    ruta = tmp_path / "es.xlsx"
+    pd.DataFrame({"Title": ["Uno", "Dos", "Tres"], "Author": ["Autor"] * 3, "Idioma": ["es"] * 3,
+                  "ISBN": [None] * 3, "year": [2000] * 3}).to_excel(ruta, index=False)
+    return ruta
+
+
+@pytest.fixture
+def especulativa(monkeypatch):
+    """Modo especulativo con dobles: Cultura.gob solo encuentra "Uno" y Open Library solo "Uno" y "Dos"."""
+    monkeypatch.setattr(app, "ES_SPECULATIVE_OL", True)
+    monkeypatch.setattr(app, "ES_SPECULATIVE_DELAY", 0.0)
+    consultas_ol = []
+    def search_book_cultura(titulo, autor):
+        if titulo == "uno": return "OK", "Uno", autor, "9788400000001", "2010" # Cultura.gob busca el título en minúsculas
+        return "No hallado", None, None, None, None
+    def best_edition_ol(isbn, titulo, autor, year=None):
+        consultas_ol.append(titulo)
+        if titulo in ("Uno", "Dos"): return "OK", titulo, autor, "9780000000002", "2012"
+        return "No hallado", None, None, None, None
+    monkeypatch.setattr(app, "search_book_cultura", search_book_cultura)
+    monkeypatch.setattr(app, "best_edition_ol", best_edition_ol)
+    return consultas_ol
+
+
+def test_anota_el_backend_ganador_de_cada_fila(procesar, hoja, especulativa):
+    salida, texto = procesar(hoja)
+    assert "Búsqueda especulativa (filas 'es'): Cultura.gob: 1, Open Library: 1, ninguno: 1" in texto
+    resultado = pd.read_excel(salida, dtype=str)
+    assert list(resultado["ISBN encontrado"].fillna("")) == ["9788400000001", "9780000000002", ""]
+    assert resultado.loc[2, "Resultado"] == "Fallo - No hallado"
+
+
+def test_con_retardo_no_consulta_open_library_si_cultura_encuentra_a_tiempo(procesar, hoja, especulativa, monkeypatch):
+    monkeypatch.setattr(app, "ES_SPECULATIVE_DELAY", 5.0)
+    _, texto = procesar(hoja)
+    assert "Cultura.gob: 1, Open Library: 1, ninguno: 1" in texto
+    assert sorted(especulativa) == ["Dos", "Tres"]
+
+
+def test_sin_modo_especulativo_no_se_anotan_ganadores(procesar, hoja, especulativa, monkeypatch):
+    monkeypatch.setattr(app, "ES_SPECULATIVE_OL", False)
+    _, texto = procesar(hoja)
+    assert "Búsqueda especulativa" not in texto
+    assert sorted(especulativa) == ["Dos", "Tres"]
@@ -0,0 +1,60 @@
+import subprocess
+import sys
+
+import pandas as pd
+import pytest
+
+import app
+from bench_pipeline import hoja_sintetica
+
+FRAGMENTOS = 8 # Más fragmentos que filas: varios quedan vacíos
+
+
+def lanzar(cwd, *argumentos):
+    r = subprocess.run([sys.executable, app.__file__, *argumentos], cwd=cwd, capture_output=True, text=True)
+    assert r.returncode == 0, r.stdout[-2000:] + r.stderr[-2000:]
+
+
+@pytest.fixture
+def hoja(tmp_path):
+    df = hoja_sintetica(6, 0.0)
+    df.loc[1, "Idioma"] = "es" # Una fila también pasa por Cultura.gob
+    df.loc[2, "ISBN"] = None # Con huecos, pandas lee la columna entera como float; un fragmento sin ellos, como int
+    ruta = tmp_path / "hoja.xlsx"
+    df.to_excel(ruta, index=False)
+    return str(ruta), app.shard_of_rows(df, FRAGMENTOS)
+
+
+def test_fragmentos_vacios_y_fusion_en_el_orden_de_la_entrada(hoja, tmp_path):
+    ruta, asignacion = hoja
+    vacios = sorted(set(range(1, FRAGMENTOS + 1)) - set(asignacion))
+    assert vacios and list(asignacion) != sorted(asignacion) # Fusionar por fragmento sin reordenar no daría el orden original
+
+    lanzar(tmp_path, ruta, "--salida", "unico")
+    lanzar(tmp_path, ruta, "--salida", "fragmentos", "--fragmentos", str(FRAGMENTOS))
+    unico = pd.read_excel(tmp_path / "unico" / "Resultados_hoja.xlsx")
+    hojas = pd.read_excel(tmp_path / "fragmentos" / "Resultados_hoja.xlsx", sheet_name=None)
+    fusion, resumen = hojas["Sheet1"], hojas["Resumen"]
+
+    assert app.SHARD_ROW_COL not in fusion.columns
+    assert list(fusion["Title"]) == list(pd.read_excel(ruta)["Title"])
+    pd.testing.assert_frame_equal(fusion, unico)
+
+    por_fragmento = resumen.iloc[:-1]
+    assert list(por_fragmento["Fragmento"]) == [f"{k}/{FRAGMENTOS}" for k in range(1, FRAGMENTOS + 1)]
+    filas = dict(zip(range(1, FRAGMENTOS + 1), por_fragmento["Filas"]))
+    assert all(filas[k] == 0 for k in vacios)
+    assert all(filas[k] == list(asignacion).count(k) for k in filas)
+    exitos = unico["Resultado"].astype(str).str.startswith("Éxito").sum()
+    total = resumen.iloc[-1]
+    assert total["Fragmento"] == "Total" and total["Equipo"] == "1 equipo(s)"
+    assert (total["Filas"], total["Éxitos"], total["Fallos"]) == (6, exitos, 6 - exitos)
+    assert total["Segundos"] >= por_fragmento["Segundos"].max()
+
+
+def test_fusionar_sin_todos_los_fragmentos_falla(hoja, tmp_path):
+    ruta, _ = hoja
+    salida = str(tmp_path / "salida")
+    app.split_input_shards(ruta, FRAGMENTOS, salida)
+    with pytest.raises(RuntimeError, match="Faltan los resultados"):
+        app.merge_shard_results(ruta, FRAGMENTOS, salida)
@@ -0,0 +1,53 @@
+import os
+import sqlite3
+
+import pytest
+
+import app
+import ol_index
+
+FIXTURES = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+VOLCADOS = {tipo: os.path.join(FIXTURES, f"ol_dump_{tipo}.txt.gz") for tipo in ("authors", "works", "editions")}
+
+
+@pytest.fixture(scope="module")
+def indice(tmp_path_factory):
+    ruta = str(tmp_path_factory.mktemp("indice") / "ol_index.sqlite3")
+    ol_index.build_index(ruta, log=lambda *a: None, **VOLCADOS)
+    return ruta
+
+
+@pytest.fixture
+def backend_local(indice, monkeypatch):
+    monkeypatch.setattr(app, "OL_BACKEND", "local")
+    monkeypatch.setattr(app, "OL_LOCAL_INDEX_PATH", indice)
+    monkeypatch.setattr(app, "ol_local_index_global", None)
+    return indice
+
+
+def test_volver_a_cargar_no_duplica_isbn(tmp_path):
+    ruta = str(tmp_path / "ol_index.sqlite3")
+    for _ in range(2): ol_index.build_index(ruta, log=lambda *a: None, **VOLCADOS)
+    conn = sqlite3.connect(ruta)
+    assert conn.execute("SELECT COUNT(*) FROM edition_isbn").fetchone()[0] == 4
+    assert conn.execute("SELECT COUNT(*) FROM works_fts").fetchone()[0] == 2
+
+
+def test_works_from_isbn(backend_local):
+    assert app._works_from_isbn_ol_single("9780307474728") == ["/works/OL1W"]
+    assert app._works_from_isbn_ol_single("843760494X") == ["/works/OL1W"]
+    assert app._works_from_isbn_ol_single("9780000000000") == []
+
+
+def test_editions_of_work(backend_local):
+    assert app.authors_of_work_ol("/works/OL1W") == ["Gabriel García Márquez"]
+    candidatos, completo = app.eds_of_work_ol("/works/OL1W", ["Gabriel García Márquez"])
+    assert completo
+    assert sorted((anio, isbn) for anio, _, isbn, _ in candidatos.items) == [(1967, "843760494X"), (1970, "9780060114183"), (2007, "9780307474728")]
+
+
+def test_search_editions(backend_local):
+    resultados = app.search_editions_ol("Cien anos soledad", "Garcia Marquez")
+    assert [(r["key"], r["publish_date"], r["author_list_resolved"]) for r in resultados] == [("/works/OL1W", "2007", ["Gabriel García Márquez"])]
+    assert app.search_editions_ol("Rayuela", "Garcia Marquez") == []
+    assert [r["key"] for r in app.search_editions_ol("Rayuela")] == ["/works/OL2W"]
@@ -0,0 +1,87 @@
+import pytest
+
+import app
+
+
+@pytest.fixture
+def memo_obras(monkeypatch):
+    memo = app.LRUMemo("Memo obras OL", 16)
+    monkeypatch.setattr(app, "ol_work_memo_global", memo)
+    return memo
+
+
+@pytest.fixture
+def ediciones_cortadas(monkeypatch):
+    """eds_of_work_ol real contra el servidor local, con la lista marcada como incompleta mientras `cortar` sea True."""
+    estado = {"cortar": True, "llamadas": 0}
+    eds_of_work_ol = app.eds_of_work_ol
+    def ediciones(wk, authors, stop=None):
+        estado["llamadas"] += 1
+        candidates, complete = eds_of_work_ol(wk, authors, stop)
+        return candidates, complete and not estado["cortar"]
+    monkeypatch.setattr(app, "eds_of_work_ol", ediciones)
+    return estado
+
+
+def test_no_memoriza_las_ediciones_incompletas_de_una_obra(memo_obras, ediciones_cortadas):
+    _, eds, complete = app.work_editions_ol("/works/OL123W")
+    assert eds.seen and not complete
+    assert "/works/OL123W" not in memo_obras
+    ediciones_cortadas["cortar"] = False
+    assert app.work_editions_ol("/works/OL123W")[2]
+    assert "/works/OL123W" in memo_obras
+    app.work_editions_ol("/works/OL123W")
+    assert ediciones_cortadas["llamadas"] == 2
+
+
+@pytest.fixture
+def prefetch(monkeypatch, tmp_path):
+    """Memoria ISBN->obra y caché en disco nuevas; anota las peticiones a /api/books (lista de lotes) y a /isbn/."""
+    monkeypatch.setattr(app, "ol_isbn_memo_global", app.LRUMemo("Memo ISBN->obra OL", 64))
+    monkeypatch.setattr(app, "OL_CACHE_PATH", str(tmp_path / "cache.sqlite3"))
+    monkeypatch.setattr(app, "ol_cache_global", None)
+    peticiones = {"lotes": [], "isbn": [], "fallar_lotes": False}
+    g_ol = app.g_ol
+    def espia(url, use_cache=True, **kv):
+        if url.endswith("/api/books"):
+            peticiones["lotes"].append(kv["params"]["bibkeys"].split(","))
+            if peticiones["fallar_lotes"]: return None
+        elif "/isbn/" in url:
+            peticiones["isbn"].append(url.rsplit("/", 1)[1])
+        return g_ol(url, use_cache, **kv)
+    monkeypatch.setattr(app, "g_ol", espia)
+    return peticiones
+
+
+ISBNS = ["9780000000001", "9780000000002", "9780000000003", "9780000000004", "978000000000X"]
+
+
+def test_prefetch_por_lotes_y_sin_peticiones_por_isbn(prefetch, monkeypatch):
+    monkeypatch.setattr(app, "OL_ISBN_BATCH_SIZE", 2)
+    texto = app.prefetch_isbn_works_ol(ISBNS + ISBNS[:2])
+    assert [len(lote) for lote in prefetch["lotes"]] == [2, 2, 1]
+    assert sorted(bibkey for lote in prefetch["lotes"] for bibkey in lote) == sorted(f"ISBN:{isbn}" for isbn in ISBNS)
+    assert "5/5 ISBN resueltos" in texto and "4 con obra" in texto and "0 lotes fallidos" in texto
+    assert app.works_from_isbn_ol("9780000000003") == ["/works/OL3W"]
+    assert app.works_from_isbn_ol("978000000000X") == [] # Sin coincidencia en el lote: se memoriza vacío
+    assert prefetch["isbn"] == []
+
+
+def test_prefetch_trocea_el_lote_en_la_cache_por_isbn(prefetch, monkeypatch):
+    app.prefetch_isbn_works_ol(ISBNS, batch_size=10)
+    monkeypatch.setattr(app, "ol_isbn_memo_global", app.LRUMemo("Memo ISBN->obra OL", 64))
+    texto = app.prefetch_isbn_works_ol(ISBNS[1:4] + ["978000000000X"], batch_size=2) # Otro reparto en lotes
+    assert "4/4 ISBN resueltos (4 desde caché, 0 en 0 peticiones" in texto
+    assert len(prefetch["lotes"]) == 1
+    assert app.works_from_isbn_ol("9780000000004") == ["/works/OL4W"]
+    assert app.works_from_isbn_ol("978000000000X") == []
+    assert prefetch["isbn"] == []
+
+
+def test_si_falla_el_lote_se_busca_isbn_a_isbn(prefetch):
+    prefetch["fallar_lotes"] = True
+    texto = app.prefetch_isbn_works_ol(ISBNS[:3], batch_size=2)
+    assert "0/3 ISBN resueltos" in texto and "2 lotes fallidos" in texto
+    assert "9780000000002" not in app.ol_isbn_memo_global
+    assert app.works_from_isbn_ol("9780000000002") == ["/works/OL2W"]
+    assert prefetch["isbn"] == ["9780000000002.json"]
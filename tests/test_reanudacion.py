@@ -0,0 +1,60 @@
+import os
+
+import pandas as pd
+import pytest
+
+import app
+from bench_pipeline import hoja_sintetica
+
+
+@pytest.fixture
+def hoja(tmp_path):
+    ruta = tmp_path / "hoja.xlsx"
+    hoja_sintetica(5, 0.0).to_excel(ruta, index=False)
+    return str(ruta)
+
+
+@pytest.fixture
+def filas(monkeypatch):
+    """process_row real que anota las filas buscadas y, con `romper`, simula una caída en la fila 2."""
+    estado = {"buscadas": [], "romper": False}
+    process_row = app.process_row
+    def fila(index, row, total_rows, memo=None):
+        estado["buscadas"].append(index)
+        if estado["romper"] and index == 2: raise RuntimeError("caída simulada")
+        return process_row(index, row, total_rows, memo)
+    monkeypatch.setattr(app, "process_row", fila)
+    return estado
+
+
+def interrumpir(procesar, hoja, filas):
+    filas["romper"] = True
+    salida, texto = procesar(hoja)
+    assert salida is None and "caída simulada" in texto
+    filas["romper"], filas["buscadas"] = False, []
+    return app.RowJournal.for_input(hoja)
+
+
+def test_reanuda_saltando_las_filas_hechas_y_restaura_sus_valores(procesar, hoja, filas):
+    diario = interrumpir(procesar, hoja, filas)
+    hechas = diario.load()
+    assert sorted(hechas) == [0, 1]
+    # La última entrada de una fila es la que vale: así se distingue lo restaurado de lo buscado de nuevo
+    diario.append(0, hechas[0][:2] + ["Desde el diario"] + hechas[0][3:]); diario.close()
+
+    salida, texto = procesar(hoja, resume=True)
+    assert "Reanudando un procesamiento interrumpido: 2 filas" in texto
+    assert sorted(filas["buscadas"]) == [2, 3, 4]
+    resultado = pd.read_excel(salida)
+    assert resultado.loc[0, "Título encontrado"] == "Desde el diario"
+    assert resultado.loc[1, "Resultado"] == hechas[1][-1]
+    assert resultado["Resultado"].str.startswith("Éxito").all()
+    assert not os.path.exists(diario.path) # Terminado, el diario sobra
+
+
+def test_sin_reanudar_se_descarta_el_diario(procesar, hoja, filas):
+    diario = interrumpir(procesar, hoja, filas)
+    salida, texto = procesar(hoja, resume=False)
+    assert salida and "Reanudando" not in texto
+    assert sorted(filas["buscadas"]) == [0, 1, 2, 3, 4]
+    assert not os.path.exists(diario.path)
@@ -0,0 +1,157 @@
+import os
+import shutil
+import threading
+import time
+
+import pandas as pd
+import pytest
+
+import app
+
+
+@pytest.fixture
+def hoja(tmp_path):
+    ruta = tmp_path / "catalogo.xlsx"
+    pd.DataFrame({"Title": ["Uno"], "Author": ["A"], "Idioma": ["xx"], "ISBN": [None], "year": [2000]}).to_excel(ruta, index=False)
+    return str(ruta)
+
+
+@pytest.fixture
+def generador_retenido(monkeypatch):
+    """process_excel_generator sustituido por uno que no termina hasta que se suelta el evento."""
+    soltar = threading.Event()
+    def generador(path, job_log, output_dir=None, **kwargs):
+        soltar.wait(10)
+        salida = os.path.join(output_dir, "Resultados.xlsx")
+        open(salida, "w").close()
+        yield (salida, "")
+    monkeypatch.setattr(app, "process_excel_generator", generador)
+    yield soltar
+    soltar.set()
+
+
+def esperar(trabajos):
+    for job in trabajos:
+        version = -1
+        while job.active: version = job.wait_update(version, 0.01)
+
+
+def test_deduplica_por_fichero_y_opciones(hoja, tmp_path, generador_retenido):
+    scheduler = app.JobScheduler(max_running=4)
+    primero = scheduler.submit(hoja)
+    assert scheduler.submit(hoja) is primero
+    sin_reanudar = scheduler.submit(hoja, resume=False)
+    anteriores = tmp_path / "Resultados_catalogo.xlsx"
+    anteriores.write_bytes(b"x")
+    delta = scheduler.submit(hoja, previous_results=str(anteriores))
+    assert len({primero.id, sin_reanudar.id, delta.id}) == 3
+    generador_retenido.set()
+    esperar([primero, sin_reanudar, delta])
+
+
+def test_borra_el_directorio_de_los_trabajos_que_salen_del_historial(hoja, generador_retenido):
+    generador_retenido.set()
+    scheduler = app.JobScheduler(max_running=1, history=1)
+    viejo = scheduler.submit(hoja)
+    esperar([viejo])
+    assert os.path.isdir(viejo.workdir)
+    nuevo = scheduler.submit(hoja)
+    esperar([nuevo])
+    assert not os.path.exists(viejo.workdir)
+    assert os.path.isdir(nuevo.workdir) and scheduler.get(nuevo.id) is nuevo
+    nuevo.discard()
+
+
+def test_un_directorio_de_salida_propio_no_se_borra(hoja, tmp_path, generador_retenido):
+    generador_retenido.set()
+    scheduler = app.JobScheduler(max_running=1, history=0)
+    viejo = scheduler.submit(hoja, output_dir=str(tmp_path))
+    esperar([viejo])
+    esperar([scheduler.submit(hoja, output_dir=str(tmp_path))])
+    assert os.path.isdir(tmp_path) and os.path.exists(os.path.join(tmp_path, "Resultados.xlsx"))
+
+
+def test_no_retiene_el_cerrojo_del_pool_mientras_espera_al_consumidor(tmp_path, monkeypatch):
+    class PoolFalso:
+        def __init__(self, *args): pass
+        def prewarm(self): return 1
+    monkeypatch.setattr(app, "CulturaDriverPool", PoolFalso)
+    monkeypatch.setattr(app, "CULTURA_BACKEND", "selenium")
+    monkeypatch.setattr(app, "cultura_driver_pool_global", None)
+    monkeypatch.setattr(app, "JOURNAL_DIR", str(tmp_path / "diarios"))
+    ruta = tmp_path / "es.xlsx"
+    pd.DataFrame({"Title": ["Uno"], "Author": ["A"], "Idioma": ["es"], "ISBN": [None], "year": [2000]}).to_excel(ruta, index=False)
+    generador = app.process_excel_generator(str(ruta), resume=False, output_dir=str(tmp_path))
+    for texto in generador: # Se deja el generador parado justo después de crear el pool, como un consumidor lento
+        if "Pool de Cultura.gob inicializado" in texto: break
+    assert app._cultura_pool_lock.acquire(timeout=1)
+    app._cultura_pool_lock.release()
+    generador.close()
+
+
+def test_los_parciales_van_al_directorio_de_cada_trabajo(tmp_path, generador_retenido, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(app, "JOURNAL_DIR", str(tmp_path / "diarios"))
+    scheduler = app.JobScheduler(max_running=4)
+    rutas = []
+    for usuario, titulo in (("ana", "Uno"), ("luis", "Dos")): # Mismo nombre de fichero, distinto contenido
+        os.makedirs(tmp_path / usuario)
+        ruta = str(tmp_path / usuario / "catalogo.xlsx")
+        pd.DataFrame({"Title": [titulo], "Author": ["A"], "Idioma": ["xx"], "ISBN": [None], "year": [2000]}).to_excel(ruta, index=False)
+        rutas.append(ruta)
+    trabajos = [scheduler.submit(ruta) for ruta in rutas]
+    parciales = [app.export_partial_results(ruta, scheduler.latest_for(ruta).workdir)[0] for ruta in rutas]
+    assert [os.path.dirname(p) for p in parciales] == [t.workdir for t in trabajos]
+    assert [pd.read_excel(p)["Title"][0] for p in parciales] == ["Uno", "Dos"]
+    sin_trabajo, _, _ = app.export_partial_results(rutas[0])
+    assert os.path.dirname(sin_trabajo) != str(tmp_path) and not os.path.exists(tmp_path / "Parcial_catalogo.xlsx")
+    shutil.rmtree(os.path.dirname(sin_trabajo))
+    generador_retenido.set()
+    esperar(trabajos)
+
+
+def test_el_log_de_los_hilos_auxiliares_llega_al_del_trabajo(tmp_path, procesar, monkeypatch):
+    for memo in ("ol_isbn_memo_global", "ol_work_memo_global"):
+        monkeypatch.setattr(app, memo, app.LRUMemo(memo, 64))
+    monkeypatch.setattr(app, "OL_EARLY_STOP_YEARS", 0)
+    isbn_batch_works_ol, editions_page_ol = app._isbn_batch_works_ol, app._editions_page_ol
+    def lote(batch):
+        app.log(f"Lote de {len(batch)} ISBN en {threading.current_thread().name}")
+        return isbn_batch_works_ol(batch)
+    def pagina(url_base, offset):
+        app.log(f"Página {offset} de ediciones en {threading.current_thread().name}")
+        return editions_page_ol(url_base, offset)
+    monkeypatch.setattr(app, "_isbn_batch_works_ol", lote)
+    monkeypatch.setattr(app, "_editions_page_ol", pagina)
+    ruta = tmp_path / "obra.xlsx" # La obra OL59W del servidor local tiene 60 ediciones: dos páginas
+    pd.DataFrame({"Title": ["Obra 59"], "Author": ["A"], "Idioma": ["no-es"], "ISBN": ["9780000000059"], "year": [1970]}).to_excel(ruta, index=False)
+    job_log = app.JobLog(str(tmp_path / "log.txt"))
+    salida, _ = procesar(ruta, job_log=job_log)
+    job_log.close()
+    texto = open(tmp_path / "log.txt", encoding="utf-8").read()
+    assert salida and "Lote de 1 ISBN en ol-isbn" in texto
+    assert "Página 50 de ediciones en ol-ediciones" in texto
+    fila = texto[texto.index("--- Fila Excel 1/1 ---"):]
+    assert "Página 50 de ediciones" in fila.split("Resultado fila 1")[0] # Dentro del log de su fila
+
+
+def test_los_trabajos_con_la_misma_entrada_no_se_solapan(hoja, monkeypatch):
+    """Uno con resume=False borraría el diario en el que aún escribe el otro: se ejecutan uno tras otro."""
+    eventos, soltar = [], threading.Event()
+    def generador(path, job_log, output_dir=None, resume=True, **kwargs):
+        eventos.append(("inicio", resume))
+        soltar.wait(10)
+        eventos.append(("fin", resume))
+        salida = os.path.join(output_dir, f"Resultados_{resume}.xlsx")
+        open(salida, "w").close()
+        yield (salida, "")
+    monkeypatch.setattr(app, "process_excel_generator", generador)
+    scheduler = app.JobScheduler(max_running=4)
+    reanudar, de_cero = scheduler.submit(hoja), scheduler.submit(hoja, resume=False)
+    time.sleep(0.2)
+    assert len(eventos) == 1 and (reanudar.status, de_cero.status).count(app.JOB_QUEUED) == 1
+    soltar.set()
+    esperar([reanudar, de_cero])
+    assert [e[0] for e in eventos] == ["inicio", "fin", "inicio", "fin"]
+    assert scheduler._input_locks == {}
+    for job in (reanudar, de_cero): job.discard()